@@ -5,20 +5,46 @@ Public API exposes:
 - EmbeddingModel: embedding backend (Potion via model2vec or fallback)
 - Preprocessor: OpenRouter-backed preprocessor (with local heuristic fallback)
 - ChromaVectorStore: wrapper around Chroma HTTP client
+- LocalVectorStore: local NumPy/mmap exact top-k index (VECTOR_STORE=local)
 """
 
-from .config import RagSettings
-from .preprocess import Preprocessor
-from .embedding import EmbeddingModel
-from .vector_store import ChromaVectorStore
-from .pipeline import RagPipeline
+from __future__ import annotations
+
+from importlib import import_module
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+  from .config import RagSettings
+  from .preprocess import Preprocessor
+  from .embedding import EmbeddingModel
+  from .vector_store import ChromaVectorStore
+  from .local_store import LocalVectorStore
+  from .pipeline import RagPipeline
+
+# 무거운 의존성(httpx/numpy/chromadb 등)은 실제로 접근할 때 임포트
+_EXPORTS = {
+  "RagSettings": ".config",
+  "Preprocessor": ".preprocess",
+  "EmbeddingModel": ".embedding",
+  "ChromaVectorStore": ".vector_store",
+  "LocalVectorStore": ".local_store",
+  "RagPipeline": ".pipeline",
+}
 
 __all__ = [
   "RagSettings",
   "Preprocessor",
   "EmbeddingModel",
   "ChromaVectorStore",
+  "LocalVectorStore",
   "RagPipeline",
 ]
 
 
+def __getattr__(name: str) -> Any:
+  module = _EXPORTS.get(name)
+  if module is None:
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+  value = getattr(import_module(module, __name__), name)
+  globals()[name] = value
+  return value
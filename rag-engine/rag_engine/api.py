@@ -1,18 +1,33 @@
 from __future__ import annotations
 
+import time
+
+_IMPORT_STARTED = time.perf_counter()
+
+import asyncio
+import base64
+import logging
 import os
-from typing import Any, Dict, List, Optional
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Literal, Optional, Union
 
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from pydantic import BaseModel, Field
 
 from .config import RagSettings
+from .metrics import METRICS, server_timing_header, start_request_timings
 from .pipeline import RagPipeline
+from .results import decode_cursor, encode_cursor, query_key, truncate
 
 
 class EmbedRequest(BaseModel):
   texts: List[str] = Field(default_factory=list)
+  # json: float 리스트, base64: little-endian float32 버퍼(base64), binary: 원시 바이트
+  format: Literal["json", "base64", "binary"] = "json"
+  # int8: 벡터별 스케일 int8 코드, binary: 부호 비트 코드(지정 시 base64 코드로 응답)
+  quantization: Optional[Literal["int8", "binary"]] = None
 
 
 class EmbedResponse(BaseModel):
@@ -20,6 +35,23 @@ class EmbedResponse(BaseModel):
   dimension: Optional[int]
 
 
+class EmbedBase64Response(BaseModel):
+  data: str
+  shape: List[int]
+  dtype: str = "<f4"
+  dimension: Optional[int]
+
+
+class EmbedQuantizedResponse(BaseModel):
+  data: str
+  shape: List[int]
+  dtype: str
+  quantization: str
+  # int8 전용: 벡터별 스케일(복원: codes * scale)
+  scales: Optional[List[float]] = None
+  dimension: Optional[int]
+
+
 class IngestRequest(BaseModel):
   messages: List[str] = Field(default_factory=list)
   metadata: Optional[Dict[str, Any]] = None
@@ -29,14 +61,140 @@ class IngestResponse(BaseModel):
   id: str
   text: str
   vector_dim: Optional[int]
+  # DEDUP_MODE≠off일 때 근접 중복으로 판정된 기존 대화 id(저장하지 않음)
+  duplicate_of: Optional[str] = None
+  # 전처리 경로: openrouter | packed | cache | heuristic | fallback | circuit_open
+  preprocess_path: Optional[str] = None
+
+
+class AppendRequest(BaseModel):
+  messages: List[str] = Field(default_factory=list)
+  metadata: Optional[Dict[str, Any]] = None
+
+
+class AppendResponse(BaseModel):
+  id: str
+  text: str
+  vector_dim: Optional[int]
+  updated_ids: List[str]
+  added_ids: List[str]
+  preprocess_path: Optional[str] = None
+
+
+QueryInclude = Literal["documents", "metadatas", "distances", "embeddings"]
+QueryMode = Literal["vector", "hybrid"]
 
 
 class QueryRequest(BaseModel):
   query_text: str
   top_k: Optional[int] = None
+  # Chroma 형식 필터: 메타데이터(`{"source": "support-logs"}`, `$in`/`$and` 등), 본문(`{"$contains": "환불"}`)
+  where: Optional[Dict[str, Any]] = None
+  where_document: Optional[Dict[str, Any]] = None
+  # 반환 필드(미지정 시 embeddings 제외 전부)
+  include: Optional[List[QueryInclude]] = None
+  # vector | hybrid(BM25 점수 가중합, 미지정 시 QUERY_MODE)
+  mode: Optional[QueryMode] = None
+  # MMR + 용어 겹침 재정렬(미지정 시 RERANK)
+  rerank: Optional[bool] = None
+
+
+class QueryBatchRequest(BaseModel):
+  query_texts: List[str] = Field(default_factory=list)
+  top_k: Optional[int] = None
+  # True면 RRF로 합치고 id 중복 제거
+  fuse: bool = False
+  where: Optional[Dict[str, Any]] = None
+  where_document: Optional[Dict[str, Any]] = None
+  include: Optional[List[QueryInclude]] = None
+  mode: Optional[QueryMode] = None
+  rerank: Optional[bool] = None
+
+
+HitField = Literal["id", "distance", "document", "metadata"]
+
+
+class SearchRequest(BaseModel):
+  query_text: str
+  # 페이지 크기(기본 DEFAULT_TOP_K)
+  limit: Optional[int] = Field(default=None, ge=1)
+  # 이전 응답의 `next_cursor`(다음 페이지)
+  cursor: Optional[str] = None
+  fields: List[HitField] = Field(default_factory=lambda: ["id", "distance"])
+  where: Optional[Dict[str, Any]] = None
+  where_document: Optional[Dict[str, Any]] = None
+  # 거리(작을수록 유사)가 이를 넘는 hit 제외
+  max_distance: Optional[float] = None
+  # 문서 최대 길이(0이면 전체), snippet=True면 쿼리 단어 주변을 잘라냄
+  max_chars: int = Field(default=0, ge=0)
+  snippet: bool = False
+  mode: Optional[QueryMode] = None
+  rerank: Optional[bool] = None
+
+
+class SearchHit(BaseModel):
+  id: str
+  distance: Optional[float] = None
+  document: Optional[str] = None
+  metadata: Optional[Dict[str, Any]] = None
+
+
+class SearchResponse(BaseModel):
+  hits: List[SearchHit]
+  next_cursor: Optional[str] = None
 
 
-app = FastAPI(title="rag-engine-api", version="0.1.0")
+class DocumentsRequest(BaseModel):
+  ids: List[str] = Field(default_factory=list)
+  fields: List[Literal["document", "metadata"]] = Field(default_factory=lambda: ["document"])
+  max_chars: int = Field(default=0, ge=0)
+
+
+class DocumentsResponse(BaseModel):
+  items: List[SearchHit]
+
+
+LOGGER = logging.getLogger("rag_engine.api")
+
+_settings = RagSettings()
+_pipeline = RagPipeline(_settings)
+# 워밍업 상태: /ready 응답에 사용
+_startup: Dict[str, Any] = {"ready": False, "phases": {}, "error": None}
+
+
+async def _warmup() -> None:
+  """모델 로드 → 더미 인코딩 → Chroma 연결 후 ready 전환. 단계별 소요 시간 로깅."""
+  phases = _startup["phases"]
+  started = time.perf_counter()
+  try:
+    phases.update(await asyncio.get_running_loop().run_in_executor(None, _pipeline.warmup))
+  except Exception as e:
+    _startup["error"] = str(e)
+    LOGGER.exception("Warm-up failed; /ready will keep reporting 503")
+    return
+  phases["warmup_total_ms"] = (time.perf_counter() - started) * 1000.0
+  _startup["ready"] = True
+  LOGGER.info("Startup phases (ms): %s", ", ".join(f"{k}={v:.1f}" for k, v in phases.items()))
+
+
+@asynccontextmanager
+async def _lifespan(_app: FastAPI) -> AsyncIterator[None]:
+  """앱 수명주기: 시작 시 백그라운드 워밍업, 종료 시 공유 HTTP 클라이언트 등 리소스 정리."""
+  _startup["phases"]["import_ms"] = (time.perf_counter() - _IMPORT_STARTED) * 1000.0
+  task: asyncio.Task | None = None
+  if _settings.warmup_on_startup:
+    task = asyncio.create_task(_warmup())
+  else:
+    _startup["ready"] = True
+  try:
+    yield
+  finally:
+    if task is not None and not task.done():
+      task.cancel()
+    await _pipeline.aclose()
+
+
+app = FastAPI(title="rag-engine-api", version="0.1.0", lifespan=_lifespan)
 
 # CORS (dev): 허용 오리진을 환경변수로 제어, 기본은 *
 _allow_origins = os.getenv("RAG_CORS_ORIGINS", "*")
@@ -47,11 +205,19 @@ app.add_middleware(
   allow_credentials=True,
   allow_methods=["*"],
   allow_headers=["*"],
+  expose_headers=["Server-Timing"],
 )
 
 
-_settings = RagSettings()
-_pipeline = RagPipeline(_settings)
+if _settings.timing_headers:
+  @app.middleware("http")
+  async def _timing_headers(request: Request, call_next: Any) -> Response:
+    """요청별 단계 소요 시간을 `Server-Timing` 헤더로 반환(TIMING_HEADERS=true)."""
+    started = time.perf_counter()
+    timings = start_request_timings()
+    response = await call_next(request)
+    response.headers["Server-Timing"] = server_timing_header(timings, time.perf_counter() - started)
+    return response
 
 
 @app.get("/health")
@@ -59,25 +225,224 @@ def health() -> Dict[str, str]:
   return {"status": "ok"}
 
 
-@app.post("/rag/embed", response_model=EmbedResponse)
-def rag_embed(req: EmbedRequest) -> EmbedResponse:
-  vectors = _pipeline.embedder.embed(req.texts)
+@app.get("/ready")
+def ready() -> JSONResponse:
+  """워밍업 완료 시 200, 진행 중/실패 시 503."""
+  body = {
+    "status": "ready" if _startup["ready"] else ("error" if _startup["error"] else "starting"),
+    "phases": _startup["phases"],
+    "error": _startup["error"],
+  }
+  return JSONResponse(body, status_code=200 if _startup["ready"] else 503)
+
+
+@app.get("/rag/stats")
+def rag_stats() -> Dict[str, Any]:
+  """튜닝용 내부 통계: 임베딩 요청 병합, 쿼리/전처리 캐시, OpenRouter 브레이커/한도, 인제스트 중복 제거, BM25 역색인, 재정렬."""
+  embedder = _pipeline.embedder
+  cache = _pipeline.preprocessor.cache
+  return {
+    "embed_batcher": embedder.batcher.stats() if embedder.batcher is not None else None,
+    "query_cache": embedder.query_cache.stats(),
+    "preprocess_cache": cache.stats() if cache is not None else None,
+    "openrouter": _pipeline.preprocessor.stats(),
+    "dedup": {"mode": _pipeline.settings.dedup_mode, **_pipeline.dedup_counts},
+    "lexical_index": _pipeline.lexical.stats() if _pipeline.lexical is not None else None,
+    "rerank": {"enabled": _pipeline.settings.rerank, **_pipeline.rerank_counts},
+  }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics() -> PlainTextResponse:
+  """Prometheus 텍스트 형식 메트릭: 단계별 소요 시간, 전처리 경로/폴백/재시도, 브레이커, Chroma 재시도, 배치 크기, 캐시 적중."""
+  embedder = _pipeline.embedder
+  preprocess_cache = _pipeline.preprocessor.cache
+  counters = []
+  for cache_name, stats in (("query", embedder.query_cache.stats()), ("preprocess", preprocess_cache.stats() if preprocess_cache is not None else None)):
+    if stats is None:
+      continue
+    for result, field in (("hit", "hits"), ("miss", "misses")):
+      counters.append(("rag_cache_requests_total", "Cache lookups by result", {"cache": cache_name, "result": result}, stats[field]))
+    counters.append(("rag_cache_evictions_total", "Cache entries evicted", {"cache": cache_name}, stats["evictions"]))
+  breaker = _pipeline.preprocessor.breaker
+  counters.append(("rag_openrouter_breaker_trips_total", "Times the OpenRouter circuit breaker opened", {}, breaker.trips))
+  counters.append(("rag_openrouter_rate_limit_wait_seconds_total", "Time spent waiting on OpenRouter rate limits", {}, _pipeline.preprocessor.limiter.waited_s))
+  for key, value in _pipeline.dedup_counts.items():
+    counters.append(("rag_dedup_total", "Ingest near-duplicate checks and hits", {"kind": key}, value))
+  for key, value in _pipeline.rerank_counts.items():
+    counters.append(("rag_rerank_total", "Reranked queries and budget overruns", {"kind": key}, value))
+  histograms = []
+  if embedder.batcher is not None:
+    histograms.append(("rag_embed_batch_size", "Texts per merged embedding batch", {}, embedder.batcher.batch_sizes))
+    histograms.append(("rag_embed_queue_wait_milliseconds", "Wait before a merged embedding batch ran", {}, embedder.batcher.wait_ms))
+  return PlainTextResponse(
+    METRICS.render(counters, histograms),
+    media_type="text/plain; version=0.0.4; charset=utf-8",
+  )
+
+
+@app.post("/rag/embed", response_model=Union[EmbedResponse, EmbedBase64Response, EmbedQuantizedResponse])
+async def rag_embed(req: EmbedRequest) -> Any:
+  """텍스트 임베딩. `format`에 따라 JSON/base64/원시 float32 바이트로 응답.
+
+  binary 응답은 `X-Embedding-Shape: n,dim`, `X-Embedding-Dtype: <f4` 헤더를 포함합니다.
+  `quantization`을 지정하면 `format`과 무관하게 base64 코드(`EmbedQuantizedResponse`)로 응답합니다.
+  """
+  vectors = await _pipeline.embedder.aembed_array(req.texts)
   dim = _pipeline.embedder.dimension
-  if dim is None and vectors and len(vectors[0]) > 0:
-    dim = len(vectors[0])
-  return EmbedResponse(embeddings=vectors, dimension=dim)
+  if dim is None and vectors.ndim == 2 and vectors.shape[1] > 0:
+    dim = int(vectors.shape[1])
+  if req.quantization is not None:
+    quantized = _pipeline.embedder.quantize(vectors, req.quantization)
+    codes = quantized["codes"]
+    scales = quantized.get("scales")
+    return EmbedQuantizedResponse(
+      data=base64.b64encode(codes.tobytes()).decode("ascii"),
+      shape=[int(x) for x in codes.shape],
+      dtype=codes.dtype.str,
+      quantization=req.quantization,
+      scales=scales.tolist() if scales is not None else None,
+      dimension=dim,
+    )
+  if req.format == "json":
+    return EmbedResponse(embeddings=vectors.tolist(), dimension=dim)
+  buf = vectors.astype("<f4", copy=False).tobytes()
+  shape = [int(x) for x in vectors.shape]
+  if req.format == "base64":
+    return EmbedBase64Response(data=base64.b64encode(buf).decode("ascii"), shape=shape, dimension=dim)
+  return Response(
+    content=buf,
+    media_type="application/octet-stream",
+    headers={"X-Embedding-Shape": ",".join(str(x) for x in shape), "X-Embedding-Dtype": "<f4"},
+  )
 
 
 @app.post("/rag/ingest", response_model=IngestResponse)
 async def rag_ingest(req: IngestRequest) -> IngestResponse:
   result = await _pipeline.ingest_conversation(req.messages, req.metadata)
-  return IngestResponse(id=result["id"], text=result["text"], vector_dim=result.get("vector_dim"))
+  return IngestResponse(
+    id=result["id"],
+    text=result["text"],
+    vector_dim=result.get("vector_dim"),
+    duplicate_of=result.get("duplicate_of"),
+    preprocess_path=result.get("preprocess_path"),
+  )
+
+
+@app.post("/rag/ingest/{doc_id}/append", response_model=AppendResponse)
+async def rag_ingest_append(doc_id: str, req: AppendRequest) -> AppendResponse:
+  """기존 대화에 새 턴만 전처리/임베딩해 추가."""
+  try:
+    result = await _pipeline.append_conversation(doc_id, req.messages, req.metadata)
+  except KeyError:
+    raise HTTPException(status_code=404, detail=f"Conversation not found: {doc_id}")
+  return AppendResponse(**result)
+
+
+def _query_payload(result: Dict[str, Any]) -> Dict[str, Any]:
+  """검색 결과를 JSON 직렬화 가능한 형태로 변환(임베딩 ndarray → 리스트)."""
+  embeddings = result.get("embeddings")
+  if embeddings is None:
+    return result
+  return {**result, "embeddings": [[list(map(float, v)) for v in rows] for rows in embeddings]}
 
 
 @app.post("/rag/query")
-def rag_query(req: QueryRequest) -> Dict[str, Any]:
-  result = _pipeline.similarity_search(req.query_text, req.top_k)
-  return result
+async def rag_query(req: QueryRequest) -> Dict[str, Any]:
+  try:
+    result = await _pipeline.asimilarity_search(
+      req.query_text, req.top_k, where=req.where, where_document=req.where_document, include=req.include, mode=req.mode, rerank=req.rerank
+    )
+  except ValueError as e:
+    raise HTTPException(status_code=400, detail=str(e))
+  return _query_payload(result)
+
+
+@app.post("/rag/query/batch")
+async def rag_query_batch(req: QueryBatchRequest) -> Dict[str, Any]:
+  if not req.query_texts:
+    return {"ids": [], "documents": [], "metadatas": [], "distances": []}
+  try:
+    result = await _pipeline.asimilarity_search_many(
+      req.query_texts,
+      req.top_k,
+      fuse=req.fuse,
+      where=req.where,
+      where_document=req.where_document,
+      include=req.include,
+      mode=req.mode,
+      rerank=req.rerank,
+    )
+  except ValueError as e:
+    raise HTTPException(status_code=400, detail=str(e))
+  return _query_payload(result)
+
+
+@app.post("/rag/search", response_model=SearchResponse, response_model_exclude_unset=True)
+async def rag_search(req: SearchRequest) -> SearchResponse:
+  """가벼운 검색 응답: 선택한 필드만 담은 hit 목록 + 다음 페이지 커서."""
+  key = query_key(
+    req.query_text,
+    req.where,
+    req.where_document,
+    mode=(req.mode or _pipeline.settings.query_mode).lower(),
+    rerank=_pipeline.settings.rerank if req.rerank is None else req.rerank,
+    max_distance=req.max_distance,
+  )
+  try:
+    offset = decode_cursor(req.cursor, key) if req.cursor else 0
+    page = await _pipeline.asearch_page(
+      req.query_text,
+      limit=req.limit,
+      offset=offset,
+      fields=req.fields,
+      where=req.where,
+      where_document=req.where_document,
+      max_distance=req.max_distance,
+      max_chars=req.max_chars,
+      snippet=req.snippet,
+      mode=req.mode,
+      rerank=req.rerank,
+    )
+  except ValueError as e:
+    raise HTTPException(status_code=400, detail=str(e))
+  hits = [SearchHit(**hit) for hit in page["hits"]]
+  next_cursor = encode_cursor(offset + len(hits), key) if page["has_more"] else None
+  return SearchResponse(hits=hits, next_cursor=next_cursor)
+
+
+@app.post("/rag/documents", response_model=DocumentsResponse, response_model_exclude_unset=True)
+async def rag_documents(req: DocumentsRequest) -> DocumentsResponse:
+  """id로 문서/메타데이터 지연 조회(`/rag/search` hit의 본문을 나중에 가져올 때)."""
+  found = await _pipeline.store.aget(ids=req.ids)
+  by_id = {
+    doc_id: (doc, meta)
+    for doc_id, doc, meta in zip(found["ids"], found.get("documents") or [], found.get("metadatas") or [])
+  }
+  missing = [doc_id for doc_id in req.ids if doc_id not in by_id]
+  if missing and _pipeline.settings.chunk_mode != "none":
+    # 청킹된 대화는 부모 id로 청크를 모아 chunk_index 순서로 이어 붙임(겹침 구간 포함)
+    chunks = await _pipeline.store.aget(where={"parent_id": {"$in": missing}})
+    grouped: Dict[str, List[tuple]] = {}
+    for doc, meta in zip(chunks.get("documents") or [], chunks.get("metadatas") or []):
+      meta = meta or {}
+      grouped.setdefault(str(meta.get("parent_id")), []).append((int(meta.get("chunk_index", 0)), doc, meta))
+    for parent, parts in grouped.items():
+      parts.sort(key=lambda p: p[0])
+      base_meta = {k: v for k, v in parts[0][2].items() if k != "chunk_index"}
+      by_id[parent] = ("\n".join(doc or "" for _, doc, _ in parts), base_meta)
+  items: List[SearchHit] = []
+  for doc_id in req.ids:
+    if doc_id not in by_id:
+      continue
+    doc, meta = by_id[doc_id]
+    item: Dict[str, Any] = {"id": doc_id}
+    if "document" in req.fields:
+      item["document"] = truncate(doc, req.max_chars) if doc is not None else None
+    if "metadata" in req.fields:
+      item["metadata"] = meta
+    items.append(SearchHit(**item))
+  return DocumentsResponse(items=items)
 
 
 if __name__ == "__main__":
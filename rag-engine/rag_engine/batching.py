@@ -0,0 +1,113 @@
+"""Dynamic micro-batching for embedding requests.
+
+짧은 시간 창 안에 도착한 여러 임베딩 요청을 모아 한 번의 인코딩 호출로
+처리하고, 결과 행을 각 호출자에게 나누어 돌려줍니다. 배치 크기 분포와
+대기 시간 통계를 제공해 `max_batch_size`/`max_wait_ms` 튜닝에 사용합니다.
+"""
+from __future__ import annotations
+
+from typing import Any, Awaitable, Callable, Dict, List, Set, Tuple
+import asyncio
+import time
+
+import numpy as np
+
+from .metrics import Histogram
+
+# 배치 크기(텍스트 수)와 대기 시간(ms) 히스토그램 상한 경계
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+WAIT_MS_BUCKETS = (0.5, 1, 2, 5, 10, 25, 50, 100)
+
+
+class EmbeddingBatcher:
+  """요청 병합기(단일 이벤트 루프에서 사용).
+
+  - `embed_fn`: 텍스트 목록 → `(n, dim)` float32 행렬을 반환하는 코루틴 함수
+  - `max_batch_size`: 대기 중 텍스트 수가 이 값에 도달하면 즉시 실행
+  - `max_wait_ms`: 첫 요청 도착 후 최대 대기 시간
+  """
+
+  def __init__(self, embed_fn: Callable[[List[str]], Awaitable[np.ndarray]], max_batch_size: int, max_wait_ms: float) -> None:
+    self.embed_fn = embed_fn
+    self.max_batch_size = max(1, max_batch_size)
+    self.max_wait = max(0.0, max_wait_ms) / 1000.0
+    self.batch_sizes = Histogram(BATCH_SIZE_BUCKETS)
+    self.wait_ms = Histogram(WAIT_MS_BUCKETS)
+    self._pending: List[Tuple[List[str], asyncio.Future, float]] = []
+    self._pending_texts = 0
+    self._timer: asyncio.TimerHandle | None = None
+    # 실행 중인 배치 태스크(참조를 잡아 두지 않으면 실행 도중 GC될 수 있음)
+    self._tasks: Set[asyncio.Task] = set()
+
+  async def submit(self, texts: List[str]) -> np.ndarray:
+    """텍스트를 대기열에 넣고, 병합 배치가 끝나면 해당 행들을 반환."""
+    loop = asyncio.get_running_loop()
+    fut: asyncio.Future = loop.create_future()
+    self._pending.append((texts, fut, time.perf_counter()))
+    self._pending_texts += len(texts)
+    if self._pending_texts >= self.max_batch_size:
+      self._flush()
+    elif self._timer is None:
+      self._timer = loop.call_later(self.max_wait, self._flush)
+    return await fut
+
+  def _flush(self) -> None:
+    """대기 중인 요청을 하나의 배치로 떼어내 실행 태스크 생성."""
+    if self._timer is not None:
+      self._timer.cancel()
+      self._timer = None
+    if not self._pending:
+      return
+    batch, self._pending, self._pending_texts = self._pending, [], 0
+    task = asyncio.get_running_loop().create_task(self._run(batch))
+    self._tasks.add(task)
+    task.add_done_callback(self._tasks.discard)
+
+  async def _run(self, batch: List[Tuple[List[str], asyncio.Future, float]]) -> None:
+    """배치 인코딩 후 호출자별로 행을 분배(실패 시 모두에게 예외 전달, 취소되면 모두 취소)."""
+    started = time.perf_counter()
+    texts: List[str] = []
+    for item_texts, _, enqueued in batch:
+      texts.extend(item_texts)
+      self.wait_ms.observe((started - enqueued) * 1000.0)
+    self.batch_sizes.observe(len(texts))
+    try:
+      vectors = await self.embed_fn(texts)
+      offset = 0
+      for item_texts, fut, _ in batch:
+        end = offset + len(item_texts)
+        if not fut.done():
+          fut.set_result(vectors[offset:end])
+        offset = end
+    except Exception as e:
+      for _, fut, _ in batch:
+        if not fut.done():
+          fut.set_exception(e)
+    finally:
+      # CancelledError(종료 중 등)로 끝나도 호출자가 영원히 기다리지 않게
+      for _, fut, _ in batch:
+        if not fut.done():
+          fut.cancel()
+
+  async def aclose(self) -> None:
+    """대기 중인 요청과 실행 중인 배치를 취소하고 배치 태스크가 끝날 때까지 대기."""
+    if self._timer is not None:
+      self._timer.cancel()
+      self._timer = None
+    pending, self._pending, self._pending_texts = self._pending, [], 0
+    for _, fut, _ in pending:
+      if not fut.done():
+        fut.cancel()
+    tasks = list(self._tasks)
+    for task in tasks:
+      task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+  def stats(self) -> Dict[str, Any]:
+    """배치 크기 분포와 대기 시간(ms) 통계."""
+    return {
+      "max_batch_size": self.max_batch_size,
+      "max_wait_ms": self.max_wait * 1000.0,
+      "batch_size": self.batch_sizes.snapshot(),
+      "queue_wait_ms": self.wait_ms.snapshot(),
+    }
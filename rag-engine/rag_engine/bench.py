@@ -0,0 +1,388 @@
+"""Throughput/latency benchmarks.
+
+`examples/`와 같은 모양(Q:/A: 접두어가 붙은 발화 목록)의 한국어/영어 합성 대화로
+임베딩·인제스트·검색을 반복 실행하고, 커밋 간 비교용 JSON 리포트를 만듭니다.
+`normalize` 단계는 오프라인 휴리스틱 정규화를 이전 구현과 비교(출력 동일 여부 + 속도)합니다.
+
+- 전처리: 네트워크 없는 스텁(`StubPreprocessor`, 발화 공백 정리 후 줄 결합)
+- 스토어: 임시 디렉토리의 로컬 인덱스(`local`) 또는 in-memory Chroma(`chroma`)
+- 임베더: 실제 모델(`model`) 또는 해시 기반 가짜 벡터(`hash`, 모델 없이 파이프라인 오버헤드만 측정)
+- 지표: 처리량(건/초), 지연 p50/p95/p99/평균/최대(ms), 단계 종료 시점 최대 RSS(MB)
+"""
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, Iterable, List, Sequence, Tuple
+import asyncio
+import hashlib
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from .chunking import QA_PREFIX_PATTERN
+from .config import RagSettings
+from .embedding import EmbeddingModel
+from .normalize import ensure_qa_prefixes, join_messages, normalize_conversations, normalize_transcript
+from .pipeline import RagPipeline
+
+BENCH_PHASES = ("embed", "ingest", "query", "normalize")
+
+_KO_TOPICS = [
+  ("주문 {n}번 배송 일정이 궁금합니다.", "주문 {n}번은 {d}일 출고 예정입니다."),
+  ("운송장 {n}-{m} 조회가 안 돼요.", "택배사 전산 반영까지 하루 정도 걸립니다."),
+  ("어제 결제 취소했는데 환불은 언제 되나요?", "영업일 기준 {d}일 안에 환불됩니다."),
+  ("상품 {c} 교환 요청하려면 어떻게 해야 하나요?", "영수증과 함께 택배로 반송해 주세요."),
+  ("구독 갱신은 자동으로 되나요?", "네, 설정에서 자동 갱신을 켤 수 있습니다."),
+  ("센터 방문 수리 가능한가요?", "네, 예약 후 방문 가능합니다."),
+  ("설치 매뉴얼 링크 안내 부탁드립니다.", "이메일로 {c} 설치 매뉴얼을 발송드리겠습니다."),
+]
+_EN_TOPICS = [
+  ("When will order #{n} ship?", "Order #{n} is scheduled to ship in {d} days."),
+  ("Tracking number {n}-{m} shows no updates.", "The carrier usually updates within a day."),
+  ("I cancelled my payment yesterday, when is the refund?", "Refunds arrive within {d} business days."),
+  ("How do I exchange product {c}?", "Please send it back with the receipt."),
+  ("Does my subscription renew automatically?", "Yes, you can enable auto-renewal in settings."),
+  ("Can I get an on-site repair?", "Yes, after booking an appointment."),
+  ("Where can I download the {c} manual?", "We will email you the {c} installation guide."),
+]
+_KO_SMALLTALK = [("안녕하세요, 고객지원입니다.", "안녕하세요! 무엇을 도와드릴까요?"), ("감사합니다.", "더 필요하신 점 있으면 말씀해 주세요.")]
+_EN_SMALLTALK = [("Hi, I need some help.", "Hello! How can I help you?"), ("Thanks a lot.", "Let us know if you need anything else.")]
+
+
+def synthetic_conversations(n: int, seed: int = 0, korean_ratio: float = 0.7, max_turns: int = 4) -> List[List[str]]:
+  """Q:/A: 발화 목록 `n`개 생성(같은 `seed`면 같은 결과)."""
+  rng = random.Random(seed)
+  conversations: List[List[str]] = []
+  for _ in range(n):
+    korean = rng.random() < korean_ratio
+    topics, smalltalk = (_KO_TOPICS, _KO_SMALLTALK) if korean else (_EN_TOPICS, _EN_SMALLTALK)
+    pairs = [rng.choice(smalltalk)] if rng.random() < 0.5 else []
+    pairs += [rng.choice(topics) for _ in range(rng.randint(1, max_turns))]
+    messages: List[str] = []
+    for q, a in pairs:
+      fields = {"n": rng.randint(100, 99999), "m": rng.randint(100, 999), "d": rng.randint(1, 7), "c": f"SKU-{rng.randint(1000, 9999)}"}
+      messages.append("Q: " + q.format(**fields))
+      messages.append("A: " + a.format(**fields))
+    conversations.append(messages)
+  return conversations
+
+
+def messy_conversations(conversations: Sequence[Sequence[str]], seed: int = 0) -> List[List[str]]:
+  """정규화 대상이 많은 변형: 접두어 누락/소문자, 연속 공백, 불릿, CRLF, 빈 발화."""
+  rng = random.Random(seed + 2)
+  out: List[List[str]] = []
+  for conv in conversations:
+    messages: List[str] = []
+    for m in conv:
+      if rng.random() < 0.2:
+        m = m[3:] if rng.random() < 0.5 else m[0].lower() + " :" + m[2:]
+      if rng.random() < 0.5:
+        m = m.replace(" ", " " * rng.randint(2, 6), rng.randint(1, 3))
+      if rng.random() < 0.3:
+        m = rng.choice(["- ", "• ", "\t"]) + m + rng.choice(["", "  ", " -", "\t"])
+      if rng.random() < 0.2:
+        m = m.replace(" ", "\r\n - ", 1)
+      messages.append(m)
+      if rng.random() < 0.1:
+        messages.append("  ")
+    out.append(messages)
+  return out
+
+
+def synthetic_queries(conversations: Sequence[Sequence[str]], n: int, seed: int = 0) -> List[str]:
+  """대화의 질문 발화에서 검색 쿼리 `n`개 추출."""
+  rng = random.Random(seed + 1)
+  questions = [m[3:] for conv in conversations for m in conv if m.startswith("Q: ")]
+  return [rng.choice(questions) for _ in range(n)] if questions else []
+
+
+class StubPreprocessor:
+  """OpenRouter 호출 없는 전처리 스텁(`Preprocessor`와 같은 비동기 인터페이스)."""
+
+  cache = None
+
+  async def preprocess(self, messages: Iterable[str]) -> str:
+    return "\n".join(" ".join(m.split()) for m in messages if m and m.strip())
+
+  async def preprocess_with_path(self, messages: Iterable[str]) -> Tuple[str, str]:
+    return await self.preprocess(messages), "heuristic"
+
+  async def preprocess_many(self, conversations: Sequence[Iterable[str]], concurrency: int = 1) -> List[Tuple[str, str]]:
+    return [await self.preprocess_with_path(m) for m in conversations]
+
+  async def aclose(self) -> None:
+    return None
+
+
+class _HashEncoder:
+  """텍스트 해시로 시드한 단위 벡터(모델 없이 결정적)."""
+
+  def __init__(self, dim: int) -> None:
+    self.dim = dim
+
+  def encode(self, texts: List[str], **_: Any) -> np.ndarray:
+    out = np.empty((len(texts), self.dim), dtype=np.float32)
+    for i, text in enumerate(texts):
+      seed = int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+      out[i] = np.random.default_rng(seed).standard_normal(self.dim)
+    return out / np.linalg.norm(out, axis=1, keepdims=True)
+
+
+class HashEmbeddingModel(EmbeddingModel):
+  """`EmbeddingModel`과 같은 경로를 타되 인코딩만 해시 벡터로 바꾼 벤치마크용 임베더."""
+
+  def __init__(self, settings: RagSettings, dim: int = 256) -> None:
+    super().__init__(settings)
+    self._hash_dim = dim
+
+  def _load_backend(self):
+    if self._backend is None:
+      self._backend = _HashEncoder(self._hash_dim)
+      self._backend_id = "hash"
+      self._dimension = self._hash_dim
+
+
+def peak_rss_mb() -> float | None:
+  """프로세스 최대 RSS(MB). `resource` 모듈이 없는 플랫폼은 None."""
+  try:
+    import resource
+  except ImportError:
+    return None
+  peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  # Linux는 KB, macOS는 바이트 단위
+  return peak / (1024.0 * 1024.0) if sys.platform == "darwin" else peak / 1024.0
+
+
+def summarize(latencies_s: Sequence[float], elapsed_s: float, items: int) -> Dict[str, Any]:
+  """지연 목록 → 처리량/백분위 요약(ms)."""
+  ms = np.asarray(latencies_s, dtype=np.float64) * 1000.0
+  if not len(ms):
+    return {"calls": 0, "items": items, "elapsed_s": elapsed_s, "throughput_per_s": 0.0}
+  p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+  return {
+    "calls": int(len(ms)),
+    "items": items,
+    "elapsed_s": round(elapsed_s, 4),
+    "throughput_per_s": round(items / elapsed_s, 2) if elapsed_s > 0 else None,
+    "p50_ms": round(float(p50), 3),
+    "p95_ms": round(float(p95), 3),
+    "p99_ms": round(float(p99), 3),
+    "mean_ms": round(float(ms.mean()), 3),
+    "max_ms": round(float(ms.max()), 3),
+    "peak_rss_mb": peak_rss_mb(),
+  }
+
+
+def _timed(fn: Callable[[], Any]) -> float:
+  started = time.perf_counter()
+  fn()
+  return time.perf_counter() - started
+
+
+def bench_embed(embedder: EmbeddingModel, texts: Sequence[str], batch_size: int, warmup: int = 3) -> Dict[str, Any]:
+  """`embed_array`를 `batch_size`개씩 호출(처리량 단위: 텍스트)."""
+  batches = [list(texts[i:i + batch_size]) for i in range(0, len(texts), batch_size)]
+  for batch in batches[:warmup]:
+    embedder.embed_array(batch)
+  started = time.perf_counter()
+  latencies = [_timed(lambda b=batch: embedder.embed_array(b)) for batch in batches]
+  result = summarize(latencies, time.perf_counter() - started, len(texts))
+  result["batch_size"] = batch_size
+  return result
+
+
+async def bench_ingest(pipeline: RagPipeline, conversations: Sequence[List[str]], concurrency: int = 1) -> Dict[str, Any]:
+  """`ingest_conversation`을 동시 `concurrency`개 워커로 호출(처리량 단위: 대화)."""
+  queue: asyncio.Queue = asyncio.Queue()
+  for conv in conversations:
+    queue.put_nowait(conv)
+  latencies: List[float] = []
+
+  async def _worker() -> None:
+    while not queue.empty():
+      conv = queue.get_nowait()
+      t0 = time.perf_counter()
+      await pipeline.ingest_conversation(conv, {"source": "bench"})
+      latencies.append(time.perf_counter() - t0)
+
+  started = time.perf_counter()
+  await asyncio.gather(*(_worker() for _ in range(max(1, concurrency))))
+  result = summarize(latencies, time.perf_counter() - started, len(conversations))
+  result["concurrency"] = max(1, concurrency)
+  return result
+
+
+def bench_query(pipeline: RagPipeline, queries: Sequence[str], top_k: int, warmup: int = 3) -> Dict[str, Any]:
+  """`similarity_search`를 순차 호출(처리량 단위: 쿼리)."""
+  for q in queries[:warmup]:
+    pipeline.similarity_search(q, top_k=top_k)
+  started = time.perf_counter()
+  latencies = [_timed(lambda q=q: pipeline.similarity_search(q, top_k=top_k)) for q in queries]
+  result = summarize(latencies, time.perf_counter() - started, len(queries))
+  result["top_k"] = top_k
+  return result
+
+
+def _legacy_heuristic(text: str) -> str:
+  """이전 `Preprocessor._fallback_heuristic`(동일 출력 검증/속도 비교 기준)."""
+  text = text.replace("\r", "\n").strip()
+  while "  " in text:
+    text = text.replace("  " , " ")
+  lines = [ln.strip(" -•\t") for ln in text.split("\n")]
+  lines = [ln for ln in lines if ln]
+  return "\n".join(lines)
+
+
+def _legacy_ensure_qa_prefixes(messages: List[str]) -> List[str]:
+  """이전 `cli._ensure_qa_prefixes`(동일 출력 검증/속도 비교 기준)."""
+  normalized: List[str] = []
+  for idx, m in enumerate(messages):
+    text = str(m).strip()
+    if not text:
+      continue
+    if QA_PREFIX_PATTERN.match(text):
+      prefix = text.split(":", 1)[0].strip().upper()
+      rest = text.split(":", 1)[1].lstrip()
+      normalized.append(f"{prefix}: {rest}")
+      continue
+    prefix = "Q" if idx % 2 == 0 else "A"
+    normalized.append(f"{prefix}: {text}")
+  return normalized
+
+
+def _compare(legacy: Callable[[], List[Any]], fast: Callable[[], List[Any]], items: int, repeat: int) -> Dict[str, Any]:
+  """두 구현의 출력 동일 여부와 최선 `repeat`회 소요 시간/처리량/속도 향상 배수."""
+  identical = legacy() == fast()
+  legacy_s = min(_timed(legacy) for _ in range(max(1, repeat)))
+  fast_s = min(_timed(fast) for _ in range(max(1, repeat)))
+  return {
+    "identical": identical,
+    "legacy_s": round(legacy_s, 4),
+    "fast_s": round(fast_s, 4),
+    "legacy_per_s": round(items / legacy_s, 1) if legacy_s > 0 else None,
+    "fast_per_s": round(items / fast_s, 1) if fast_s > 0 else None,
+    "speedup": round(legacy_s / fast_s, 2) if fast_s > 0 else None,
+  }
+
+
+def bench_normalize(conversations: Sequence[List[str]], repeat: int = 5, seed: int = 0) -> Dict[str, Any]:
+  """오프라인 정규화(Q/A 접두어 + 휴리스틱) 이전 구현 대비 비교(처리량 단위: 대화).
+
+  합성 대화 그대로(`clean`)와 정규화할 거리가 많은 변형(`messy`) 각각에 대해 측정합니다.
+  """
+  report: Dict[str, Any] = {}
+  for name, convs in (("clean", [list(c) for c in conversations]), ("messy", messy_conversations(conversations, seed))):
+    prefixed = [ensure_qa_prefixes(m) for m in convs]
+    joined = [join_messages(m) for m in prefixed]
+    n = len(convs)
+    row: Dict[str, Any] = {
+      "qa_prefixes": _compare(lambda: [_legacy_ensure_qa_prefixes(m) for m in convs], lambda: [ensure_qa_prefixes(m) for m in convs], n, repeat),
+      "heuristic": _compare(lambda: [_legacy_heuristic(t) for t in joined], lambda: [normalize_transcript(t) for t in joined], n, repeat),
+      "batch": _compare(
+        lambda: [_legacy_heuristic(join_messages(_legacy_ensure_qa_prefixes(m))) for m in convs],
+        lambda: normalize_conversations([ensure_qa_prefixes(m) for m in convs]),
+        n,
+        repeat,
+      ),
+    }
+    report[name] = row
+  return report
+
+
+def _git_commit() -> str | None:
+  try:
+    out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5)
+  except Exception:
+    return None
+  return out.stdout.strip() or None
+
+
+def build_pipeline(settings: RagSettings, store: str, embedder: str, workdir: str) -> RagPipeline:
+  """스텁 전처리 + 격리된 스토어(임시 경로/in-memory)로 파이프라인 구성."""
+  overrides: Dict[str, Any] = {
+    "vector_store": "local" if store == "local" else "chroma",
+    "local_store_path": workdir,
+    "chroma_collection": "bench",
+    "lexical_index_path": workdir,
+    "preprocess_cache_enabled": False,
+    "warmup_on_startup": False,
+  }
+  s = settings.model_copy(update=overrides)
+  pipeline = RagPipeline(s)
+  pipeline.preprocessor = StubPreprocessor()  # type: ignore[assignment]
+  if embedder == "hash":
+    pipeline.embedder = HashEmbeddingModel(s)
+  if store == "chroma":
+    import chromadb  # type: ignore
+    from .vector_store import ChromaVectorStore
+    pipeline.store = ChromaVectorStore(s, client=chromadb.EphemeralClient())
+  return pipeline
+
+
+def run_benchmarks(
+  settings: RagSettings,
+  phases: Sequence[str] = BENCH_PHASES,
+  conversations: int = 200,
+  queries: int = 200,
+  embed_batch: int = 32,
+  concurrency: int = 1,
+  top_k: int = 5,
+  store: str = "local",
+  embedder: str = "model",
+  seed: int = 0,
+) -> Dict[str, Any]:
+  """선택한 단계를 순서대로 실행해 리포트 dict 반환.
+
+  query 단계는 같은 실행의 ingest 결과(없으면 먼저 인제스트)를 대상으로 검색합니다.
+  normalize 단계만 선택하면 파이프라인/모델을 만들지 않습니다.
+  """
+  unknown = [p for p in phases if p not in BENCH_PHASES]
+  if unknown:
+    raise ValueError(f"Unknown bench phases: {unknown}")
+  convs = synthetic_conversations(conversations, seed)
+  report: Dict[str, Any] = {
+    "meta": {
+      "commit": _git_commit(),
+      "python": platform.python_version(),
+      "numpy": np.__version__,
+      "platform": platform.platform(),
+      "store": store,
+      "embedder": embedder,
+      "conversations": conversations,
+      "queries": queries,
+      "seed": seed,
+      "chunk_mode": settings.chunk_mode,
+      "query_mode": settings.query_mode,
+      "rerank": settings.rerank,
+    },
+    "rss_start_mb": peak_rss_mb(),
+  }
+  if "normalize" in phases:
+    report["normalize"] = bench_normalize(convs, seed=seed)
+  if not any(p in phases for p in ("embed", "ingest", "query")):
+    report["peak_rss_mb"] = peak_rss_mb()
+    return report
+  with tempfile.TemporaryDirectory(prefix="rag-bench-") as workdir:
+    pipeline = build_pipeline(settings, store, embedder, workdir)
+    load_started = time.perf_counter()
+    pipeline.embedder.embed_array(["warmup"])
+    report["meta"]["model_load_s"] = round(time.perf_counter() - load_started, 4)
+    report["meta"]["dimension"] = pipeline.embedder.dimension
+    try:
+      if "embed" in phases:
+        texts = [m for conv in convs for m in conv]
+        report["embed"] = bench_embed(pipeline.embedder, texts, embed_batch)
+      if "ingest" in phases or "query" in phases:
+        ingest = asyncio.run(bench_ingest(pipeline, convs, concurrency))
+        if "ingest" in phases:
+          report["ingest"] = ingest
+      if "query" in phases:
+        report["query"] = bench_query(pipeline, synthetic_queries(convs, queries, seed), top_k)
+    finally:
+      asyncio.run(pipeline.aclose())
+  report["peak_rss_mb"] = peak_rss_mb()
+  return report
@@ -0,0 +1,190 @@
+"""Caches for preprocessing and query embeddings.
+
+- `PreprocessCache`: 동일 입력(대화 + 모델 + 프롬프트)에 대한 OpenRouter 전처리
+  결과를 로컬 SQLite 파일에 저장해 재인제스트 시 네트워크 호출을 건너뜁니다.
+  크기 상한(오래된 항목부터 제거)과 TTL 만료를 지원합니다.
+- `QueryEmbeddingCache`: 반복 쿼리의 임베딩을 float32 행렬 행으로 보관하는
+  프로세스 내 LRU 캐시입니다.
+"""
+from __future__ import annotations
+
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Hashable, Iterable
+import hashlib
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+
+def make_cache_key(parts: Iterable[str]) -> str:
+  """구성 문자열들을 구분자로 이어 SHA-256 16진 다이제스트로 변환."""
+  h = hashlib.sha256()
+  for part in parts:
+    h.update(part.encode("utf-8"))
+    h.update(b"\x00")
+  return h.hexdigest()
+
+
+class PreprocessCache:
+  """SQLite 기반 콘텐츠 주소 캐시.
+
+  - 키: `make_cache_key`로 만든 해시
+  - 값: 전처리 결과 텍스트
+  - 만료: `ttl_seconds`(0 이하면 무기한)
+  - 크기: `max_entries` 초과 시 생성 시각이 오래된 항목부터 90% 수준까지 제거
+  """
+
+  def __init__(self, path: str | Path, max_entries: int = 100_000, ttl_seconds: float = 0) -> None:
+    """DB 파일을 열고 스키마를 준비."""
+    self.path = Path(path).expanduser()
+    self.path.parent.mkdir(parents=True, exist_ok=True)
+    self.max_entries = max(1, max_entries)
+    self.ttl_seconds = ttl_seconds
+    self.hits = 0
+    self.misses = 0
+    self.evictions = 0
+    self._lock = threading.Lock()
+    self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+    self._conn.execute("PRAGMA journal_mode=WAL")
+    self._conn.execute("PRAGMA synchronous=NORMAL")
+    self._conn.execute(
+      "CREATE TABLE IF NOT EXISTS entries ("
+      "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+    )
+    self._conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_created ON entries(created_at)")
+    self._count = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+  def get(self, key: str) -> str | None:
+    """캐시 조회. 없거나 만료되었으면 None."""
+    with self._lock:
+      row = self._conn.execute("SELECT value, created_at FROM entries WHERE key = ?", (key,)).fetchone()
+      if row is not None and self.ttl_seconds > 0 and time.time() - row[1] > self.ttl_seconds:
+        self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+        self._count -= 1
+        self.evictions += 1
+        row = None
+      if row is None:
+        self.misses += 1
+        return None
+      self.hits += 1
+      return row[0]
+
+  def set(self, key: str, value: str) -> None:
+    """캐시 저장(동일 키는 덮어씀) 후 필요 시 용량 정리."""
+    with self._lock:
+      cur = self._conn.execute(
+        "INSERT OR IGNORE INTO entries(key, value, created_at) VALUES (?, ?, ?)",
+        (key, value, time.time()),
+      )
+      if cur.rowcount:
+        self._count += 1
+      else:
+        self._conn.execute(
+          "UPDATE entries SET value = ?, created_at = ? WHERE key = ?",
+          (value, time.time(), key),
+        )
+      if self._count > self.max_entries:
+        self._evict()
+
+  def _evict(self) -> None:
+    """만료 항목과 오래된 항목을 제거(락 보유 상태에서 호출)."""
+    removed = 0
+    if self.ttl_seconds > 0:
+      cutoff = time.time() - self.ttl_seconds
+      removed += self._conn.execute("DELETE FROM entries WHERE created_at < ?", (cutoff,)).rowcount
+    target = int(self.max_entries * 0.9)
+    excess = self._count - removed - target
+    if excess > 0:
+      removed += self._conn.execute(
+        "DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY created_at LIMIT ?)",
+        (excess,),
+      ).rowcount
+    self._count -= removed
+    self.evictions += removed
+
+  def stats(self) -> Dict[str, int]:
+    """적중/미스/제거 카운터와 현재 항목 수."""
+    return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "entries": self._count}
+
+  def close(self) -> None:
+    """DB 연결 종료."""
+    with self._lock:
+      self._conn.close()
+
+
+class QueryEmbeddingCache:
+  """고정 용량 LRU 임베딩 캐시.
+
+  벡터는 `(capacity, dim)` float32 행렬의 행에 저장하고, 키→행 번호 매핑만
+  `OrderedDict`로 관리합니다. 차원이 바뀌면(백엔드 교체) 전체를 비웁니다.
+  """
+
+  def __init__(self, capacity: int) -> None:
+    """용량 설정(0 이하면 비활성)."""
+    self.capacity = max(0, capacity)
+    self.hits = 0
+    self.misses = 0
+    self.evictions = 0
+    self._lock = threading.Lock()
+    self._slots: "OrderedDict[Hashable, int]" = OrderedDict()
+    self._free: list[int] = []
+    self._matrix: np.ndarray | None = None
+
+  def get(self, key: Hashable) -> np.ndarray | None:
+    """키의 임베딩 행 복사본 반환(없으면 None)."""
+    if self.capacity == 0:
+      return None
+    with self._lock:
+      slot = self._slots.get(key)
+      if slot is None:
+        self.misses += 1
+        return None
+      self._slots.move_to_end(key)
+      self.hits += 1
+      return self._matrix[slot].copy()
+
+  def put(self, key: Hashable, vector: np.ndarray) -> None:
+    """임베딩 저장. 가득 차면 가장 오래 사용되지 않은 항목을 제거."""
+    if self.capacity == 0:
+      return
+    vec = np.asarray(vector, dtype=np.float32).reshape(-1)
+    with self._lock:
+      if self._matrix is None or self._matrix.shape[1] != vec.shape[0]:
+        self._reset(vec.shape[0])
+      slot = self._slots.get(key)
+      if slot is None:
+        if self._free:
+          slot = self._free.pop()
+        else:
+          _, slot = self._slots.popitem(last=False)
+          self.evictions += 1
+        self._slots[key] = slot
+      else:
+        self._slots.move_to_end(key)
+      self._matrix[slot] = vec
+
+  def _reset(self, dim: int) -> None:
+    """행렬 재할당 및 매핑 초기화(락 보유 상태에서 호출)."""
+    self._matrix = np.zeros((self.capacity, dim), dtype=np.float32)
+    self._slots.clear()
+    self._free = list(range(self.capacity - 1, -1, -1))
+
+  def clear(self) -> None:
+    """모든 항목 무효화(행렬 메모리도 해제)."""
+    with self._lock:
+      self._slots.clear()
+      self._free = []
+      self._matrix = None
+
+  def stats(self) -> Dict[str, int]:
+    """적중/미스/제거 카운터와 현재 항목 수."""
+    return {
+      "hits": self.hits,
+      "misses": self.misses,
+      "evictions": self.evictions,
+      "entries": len(self._slots),
+      "capacity": self.capacity,
+    }
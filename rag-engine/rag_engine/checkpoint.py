@@ -0,0 +1,50 @@
+"""Batch ingest checkpoints.
+
+입력 소스(파일)별로 업서트까지 완료된 대화 수(offset)를 JSON 파일에 기록해,
+중단된 `ingest-batch`를 `--resume`으로 이어서 실행할 수 있게 합니다.
+"""
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Dict
+import json
+import os
+
+
+class IngestCheckpoint:
+  """소스별 커밋 offset 저장소.
+
+  - `offset(source)`: 해당 소스에서 이미 커밋된 대화 수(다음에 처리할 인덱스)
+  - `advance(source, offset)`: 커밋 offset 갱신(메모리)
+  - `save()`: 임시 파일에 쓰고 원자적으로 교체
+  """
+
+  def __init__(self, path: str | Path, offsets: Dict[str, int] | None = None) -> None:
+    self.path = Path(path).expanduser()
+    self.offsets: Dict[str, int] = dict(offsets or {})
+
+  @classmethod
+  def load(cls, path: str | Path) -> "IngestCheckpoint":
+    """파일이 있으면 읽고, 없으면 빈 체크포인트."""
+    p = Path(path).expanduser()
+    if not p.exists():
+      return cls(p)
+    with open(p, "r", encoding="utf-8") as f:
+      data = json.load(f)
+    return cls(p, {str(k): int(v) for k, v in (data.get("offsets") or {}).items()})
+
+  def offset(self, source: str) -> int:
+    return self.offsets.get(source, 0)
+
+  def advance(self, source: str, offset: int) -> None:
+    if offset > self.offsets.get(source, 0):
+      self.offsets[source] = offset
+
+  def save(self) -> None:
+    self.path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = self.path.with_name(self.path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+      json.dump({"offsets": self.offsets}, f, ensure_ascii=False, indent=2)
+      f.flush()
+      os.fsync(f.fileno())
+    os.replace(tmp, self.path)
@@ -0,0 +1,110 @@
+"""Conversation chunking.
+
+긴 전처리 텍스트를 여러 청크로 나누어 대화당 여러 벡터를 만들고, 검색 시
+청크 적중을 부모 대화 단위로 다시 합칩니다.
+
+- turns: `Q:`로 시작하는 줄마다 새 턴(Q/A 쌍)을 열고, 턴들을 `max_chars` 창에
+  채우며 직전 `overlap_turns`개 턴을 다음 청크에 겹쳐 넣습니다.
+  한 턴이 창보다 길면 문자 창으로 다시 자릅니다.
+- chars: 턴 구분 없이 `max_chars` 문자 창, `overlap_chars` 겹침(최대 창의 절반).
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, List
+import re
+
+QA_PREFIX_PATTERN = re.compile(r"^\s*([QqAa])\s*:")
+
+CHUNK_MODES = ("none", "turns", "chars")
+
+
+def split_turns(text: str) -> List[str]:
+  """줄 단위 텍스트를 Q/A 턴 묶음으로 분할(`Q:` 줄에서 새 턴 시작)."""
+  turns: List[List[str]] = []
+  for line in text.split("\n"):
+    if not line.strip():
+      continue
+    m = QA_PREFIX_PATTERN.match(line)
+    if not turns or (m is not None and m.group(1).upper() == "Q"):
+      turns.append([line])
+    else:
+      turns[-1].append(line)
+  return ["\n".join(t) for t in turns]
+
+
+def char_windows(text: str, max_chars: int, overlap_chars: int) -> List[str]:
+  """고정 길이 문자 창으로 분할(창 사이 `overlap_chars` 겹침).
+
+  겹침은 창 크기의 절반까지만 적용(창보다 크면 한 글자씩 밀리며 청크 수가 글자 수만큼 늘어남).
+  """
+  max_chars = max(1, max_chars)
+  overlap_chars = min(max(0, overlap_chars), max_chars // 2)
+  if len(text) <= max_chars:
+    return [text] if text else []
+  return [text[i:i + max_chars] for i in range(0, len(text) - overlap_chars, max_chars - overlap_chars)]
+
+
+def chunk_text(text: str, mode: str, max_chars: int, overlap_turns: int = 1, overlap_chars: int = 100) -> List[str]:
+  """전처리 텍스트를 청크 목록으로 변환(`mode=none`이면 원문 1개)."""
+  if mode == "none" or len(text) <= max_chars:
+    return [text]
+  if mode == "chars":
+    return char_windows(text, max_chars, overlap_chars)
+  if mode != "turns":
+    raise ValueError(f"Unknown chunk mode: {mode}")
+
+  chunks: List[str] = []
+  window: List[str] = []
+  size = 0
+  for turn in split_turns(text):
+    if len(turn) > max_chars:
+      if window:
+        chunks.append("\n".join(window))
+        window, size = [], 0
+      chunks.extend(char_windows(turn, max_chars, overlap_chars))
+      continue
+    if window and size + 1 + len(turn) > max_chars:
+      chunks.append("\n".join(window))
+      window = window[-overlap_turns:] if overlap_turns > 0 else []
+      size = sum(len(t) + 1 for t in window)
+      # 겹침 턴을 포함하면 창을 넘는 경우 겹침을 포기
+      if window and size + len(turn) > max_chars:
+        window, size = [], 0
+    window.append(turn)
+    size += len(turn) + 1
+  if window:
+    chunks.append("\n".join(window))
+  return chunks
+
+
+def collapse_to_parents(result: Dict[str, Any], top_k: int) -> Dict[str, Any]:
+  """쿼리별 청크 적중을 `parent_id` 기준으로 합쳐 부모 대화 Top-K로 변환.
+
+  결과 순서대로(거리 오름차순) 부모별 첫 적중 청크만 남기고, id는 부모 id로
+  바꿉니다. `parent_id`가 없는 항목은 그대로 하나의 부모로 취급합니다.
+  """
+  ids_lists = result.get("ids") or []
+  out: Dict[str, List[List[Any]]] = {"ids": []}
+  extra_keys = [k for k in ("documents", "metadatas", "distances", "embeddings", "scores") if result.get(k) is not None]
+  for k in extra_keys:
+    out[k] = []
+  for qi, ids in enumerate(ids_lists):
+    metas = (result.get("metadatas") or [None] * len(ids_lists))[qi] or [None] * len(ids)
+    seen: set[str] = set()
+    picked: List[int] = []
+    parents: List[str] = []
+    for rank, doc_id in enumerate(ids):
+      meta = metas[rank] or {}
+      parent = str(meta.get("parent_id") or doc_id)
+      if parent in seen:
+        continue
+      seen.add(parent)
+      picked.append(rank)
+      parents.append(parent)
+      if len(picked) >= top_k:
+        break
+    out["ids"].append(parents)
+    for k in extra_keys:
+      row = result[k][qi]
+      out[k].append([row[r] for r in picked] if row is not None else None)
+  return {**result, **out}
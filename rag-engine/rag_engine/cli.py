@@ -8,17 +8,16 @@ import argparse
 import asyncio
 import json
 import sys
-from typing import List
-import re
+from typing import Any, Deque, Dict, Iterator, List, Tuple
+from collections import deque
 from pathlib import Path
 
+from .checkpoint import IngestCheckpoint
 from .config import RagSettings
+from .normalize import ensure_qa_prefixes as _ensure_qa_prefixes
 from .pipeline import RagPipeline
 
 
-QA_PREFIX_PATTERN = re.compile(r"^\s*([QqAa])\s*:")
-
-
 def _map_role_to_prefix(role: str) -> str:
   """역할 문자열을 Q/A 접두어로 매핑."""
   r = (role or "").strip().lower()
@@ -30,28 +29,6 @@ def _map_role_to_prefix(role: str) -> str:
   return "Q"
 
 
-def _ensure_qa_prefixes(messages: List[str]) -> List[str]:
-  """모든 발화에 Q:/A: 접두어를 강제한다.
-
-  - 이미 Q:/A:로 시작하면 유지
-  - 아니면 0,2,4,... → Q:, 1,3,5,... → A: 로 자동 접두
-  """
-  normalized: List[str] = []
-  for idx, m in enumerate(messages):
-    text = str(m).strip()
-    if not text:
-      continue
-    if QA_PREFIX_PATTERN.match(text):
-      # 접두어 대문자 정규화(Q/A)
-      prefix = text.split(":", 1)[0].strip().upper()
-      rest = text.split(":", 1)[1].lstrip()
-      normalized.append(f"{prefix}: {rest}")
-      continue
-    prefix = "Q" if idx % 2 == 0 else "A"
-    normalized.append(f"{prefix}: {text}")
-  return normalized
-
-
 def _read_messages_from_file(path: str) -> List[str]:
   """파일에서 메시지 목록 로드.
 
@@ -97,51 +74,145 @@ async def _cmd_ingest(args: argparse.Namespace) -> None:
     print("No messages provided. Use --msg or --from-file.")
     sys.exit(1)
 
-  result = await pipeline.ingest_conversation(messages, metadata={"source": args.source or "cli"})
+  try:
+    result = await pipeline.ingest_conversation(messages, metadata={"source": args.source or "cli"})
+  finally:
+    await pipeline.aclose()
   print(json.dumps(result, ensure_ascii=False, indent=2))
 
 
-def _read_conversations_from_file(path: str) -> List[List[str]]:
-  """파일에서 다중 대화 로드 지원.
+# 배치 JSON 배열을 읽을 때 한 번에 읽는 문자 수
+JSON_READ_CHUNK = 1 << 16
+
+
+def _iter_json_array(f: Any) -> Iterator[Any]:
+  """최상위 JSON 배열의 원소를 하나씩 디코드(파일 전체를 메모리에 올리지 않음).
+
+  최상위가 배열이 아니면 ValueError, 배열이 중간에 깨져 있으면 json.JSONDecodeError.
+  """
+  decoder = json.JSONDecoder()
+  buf = ""
+  pos = 0
+  eof = False
+
+  def _fill() -> bool:
+    nonlocal buf, pos, eof
+    chunk = f.read(JSON_READ_CHUNK)
+    if not chunk:
+      eof = True
+      return False
+    buf = buf[pos:] + chunk
+    pos = 0
+    return True
+
+  def _skip(chars: str) -> str:
+    """`chars`에 속한 문자를 건너뛰고 다음 문자를 반환(EOF면 "")."""
+    nonlocal pos
+    while True:
+      while pos < len(buf) and buf[pos] in chars:
+        pos += 1
+      if pos < len(buf) or not _fill():
+        return buf[pos:pos + 1]
+
+  if _skip(" \t\r\n\ufeff") != "[":
+    raise ValueError("top-level value is not a JSON array")
+  pos += 1
+  while True:
+    ch = _skip(" \t\r\n,")
+    if ch == "]":
+      return
+    if not ch:
+      raise json.JSONDecodeError("unterminated array", buf, pos)
+    while True:
+      try:
+        value, end = decoder.raw_decode(buf, pos)
+      except json.JSONDecodeError:
+        # 원소가 청크 경계에 걸렸으면 더 읽어서 재시도
+        if eof or not _fill():
+          raise
+        continue
+      # 숫자/리터럴은 청크 끝에서 잘려도 디코드되므로 경계에 닿았으면 더 읽어서 확인
+      if end == len(buf) and not eof and _fill():
+        continue
+      break
+    pos = end
+    yield value
+
+
+def _role_messages(items: List[Any]) -> List[str]:
+  """역할 객체 배열 [{role, content}, ...] → Q/A 접두 발화 목록."""
+  msgs: List[str] = []
+  for x in items:
+    role = _map_role_to_prefix(str(x.get("role", "")))
+    content = str(x.get("content", "")).strip()
+    if content:
+      msgs.append(f"{role}: {content}")
+  return msgs
+
+
+def _read_conversations_from_file(path: str) -> Iterator[List[str]]:
+  """파일에서 다중 대화를 지연 로드(제너레이터).
 
   지원 형식:
-  - JSON 배열의 배열: [["...", "..."], ["..."], ...]
-  - JSON 배열(단일 대화): ["...", "..."] → 1건으로 래핑
+  - JSON 배열의 배열: [["...", "..."], ["..."], ...] → 원소 단위로 스트리밍
+  - JSON 배열(단일 대화): ["...", "..."] 또는 [{role, content}, ...] → 1건으로 래핑
   - 줄바꿈 분리 텍스트: 각 줄이 한 발화인 단일 대화 → 1건으로 래핑
+
+  배치 배열이 중간에 깨져 있거나 배열이 아닌 원소가 있으면 원소 위치(0부터)를 담은
+  ValueError(그 전 대화는 이미 처리됨).
   """
   with open(path, "r", encoding="utf-8") as f:
-    data = f.read()
-  try:
-    obj = json.loads(data)
-    if isinstance(obj, list):
-      if all(isinstance(x, list) for x in obj):
-        return [_ensure_qa_prefixes([str(xx) for xx in x]) for x in obj]
+    items = _iter_json_array(f)
+    empty = object()
+    try:
+      first = next(items, empty)
+    except ValueError:
+      first = None
+      items = None
+    if first is empty:
+      return
+    if isinstance(first, list):
+      yield _ensure_qa_prefixes([str(x) for x in first])
+      index = 1
+      while True:
+        try:
+          x = next(items, empty)
+        except ValueError as e:
+          raise ValueError(f"{path}: invalid JSON batch array at element {index}: {getattr(e, 'msg', e)}") from e
+        if x is empty:
+          return
+        if not isinstance(x, list):
+          raise ValueError(f"{path}: element {index} of JSON batch array is not a list of messages")
+        yield _ensure_qa_prefixes([str(xx) for xx in x])
+        index += 1
+    obj: List[Any] | None = None
+    if items is not None:
+      # 단일 대화 배열: 어차피 한 건이므로 모아서 판별
+      try:
+        obj = [first, *items]
+      except ValueError:
+        obj = None
+    if obj is not None:
       if all(isinstance(x, str) for x in obj):
-        return [_ensure_qa_prefixes([str(x) for x in obj])]
-      # 역할 기반 객체 배열: 한 파일=한 대화
+        yield _ensure_qa_prefixes([str(x) for x in obj])
+        return
       if all(isinstance(x, dict) and "content" in x for x in obj):
-        msgs: List[str] = []
-        for x in obj:
-          role = _map_role_to_prefix(str(x.get("role", "")))
-          content = str(x.get("content", "")).strip()
-          if content:
-            msgs.append(f"{role}: {content}")
-        return [_ensure_qa_prefixes(msgs)]
-  except Exception:
-    pass
-  # fallback: newline separated file → single conversation
-  msgs = [ln.strip() for ln in data.splitlines() if ln.strip()]
-  return [_ensure_qa_prefixes(msgs)] if msgs else []
+        yield _ensure_qa_prefixes(_role_messages(obj))
+        return
+    # fallback: newline separated file → single conversation
+    f.seek(0)
+    msgs = [ln.strip() for ln in f if ln.strip()]
+  if msgs:
+    yield _ensure_qa_prefixes(msgs)
 
 
-def _read_conversations_from_jsonl(path: str) -> List[List[str]]:
-  """JSONL에서 한 줄당 한 대화.
+def _iter_conversations_from_jsonl(path: str) -> Iterator[List[str]]:
+  """JSONL에서 한 줄당 한 대화를 지연 로드(제너레이터).
 
   각 라인은 다음 중 하나:
   - ["..."] 문자열 배열
   - {"messages": ["..."]}
   """
-  conversations: List[List[str]] = []
   with open(path, "r", encoding="utf-8") as f:
     for line in f:
       line = line.strip()
@@ -150,7 +221,7 @@ def _read_conversations_from_jsonl(path: str) -> List[List[str]]:
       try:
         obj = json.loads(line)
         if isinstance(obj, list) and all(isinstance(x, str) for x in obj):
-          conversations.append(_ensure_qa_prefixes([str(x) for x in obj]))
+          yield _ensure_qa_prefixes([str(x) for x in obj])
           continue
         if isinstance(obj, dict):
           # {"messages": [...]}
@@ -158,7 +229,7 @@ def _read_conversations_from_jsonl(path: str) -> List[List[str]]:
             arr = obj.get("messages")
             # 문자열 배열
             if all(isinstance(x, str) for x in arr):
-              conversations.append(_ensure_qa_prefixes([str(x) for x in arr]))
+              yield _ensure_qa_prefixes([str(x) for x in arr])
               continue
             # 역할 객체 배열
             if all(isinstance(x, dict) and "content" in x for x in arr):
@@ -168,71 +239,243 @@ def _read_conversations_from_jsonl(path: str) -> List[List[str]]:
                 content = str(x.get("content", "")).strip()
                 if content:
                   msgs.append(f"{role}: {content}")
-              conversations.append(_ensure_qa_prefixes(msgs))
+              yield _ensure_qa_prefixes(msgs)
               continue
           # {"q": "..", "a": ".."}
           if isinstance(obj.get("q"), str) and isinstance(obj.get("a"), str):
             q = obj.get("q").strip()
             a = obj.get("a").strip()
-            conversations.append(_ensure_qa_prefixes([f"Q: {q}", f"A: {a}"]))
+            yield _ensure_qa_prefixes([f"Q: {q}", f"A: {a}"])
             continue
       except Exception:
         continue
-  return conversations
 
 
-async def _cmd_ingest_batch(args: argparse.Namespace) -> None:
-  """다중 대화 배치 인제스트."""
-  settings = RagSettings()
-  pipeline = RagPipeline(settings)
-
-  conversations: List[List[str]] = []
-  sources: List[str] = []
+def _iter_batch_inputs(args: argparse.Namespace) -> Iterator[Tuple[List[str], str, str]]:
+  """배치 입력 소스(--from-dir/--from-jsonl/--from-file)에서 (대화, origin, 소스 키)를 지연 생성.
 
+  JSONL은 줄 단위로, JSON 배치 배열은 원소 단위로 스트리밍합니다(텍스트/단일 대화 파일은 파일 단위).
+  소스 키는 체크포인트에 쓰이는 절대 경로입니다.
+  """
   if args.from_dir:
     dir_path = Path(args.from_dir)
     for path in sorted(dir_path.glob("**/*")):
       if path.is_file() and path.suffix.lower() in {".json", ".txt", ".jsonl"}:
+        key = str(path.resolve())
         if path.suffix.lower() == ".jsonl":
-          convs = _read_conversations_from_jsonl(str(path))
-          conversations.extend(convs)
-          sources.extend([f"jsonl:{path.name}"] * len(convs))
+          for conv in _iter_conversations_from_jsonl(str(path)):
+            yield conv, f"jsonl:{path.name}", key
         else:
-          convs = _read_conversations_from_file(str(path))
-          conversations.extend(convs)
-          sources.extend([f"file:{path.name}"] * len(convs))
+          for conv in _read_conversations_from_file(str(path)):
+            yield conv, f"file:{path.name}", key
 
   if args.from_jsonl:
-    convs = _read_conversations_from_jsonl(args.from_jsonl)
-    conversations.extend(convs)
-    sources.extend([f"jsonl:{Path(args.from_jsonl).name}"] * len(convs))
+    key = str(Path(args.from_jsonl).resolve())
+    for conv in _iter_conversations_from_jsonl(args.from_jsonl):
+      yield conv, f"jsonl:{Path(args.from_jsonl).name}", key
 
   if args.from_file:
-    convs = _read_conversations_from_file(args.from_file)
-    conversations.extend(convs)
-    sources.extend([f"file:{Path(args.from_file).name}"] * len(convs))
+    key = str(Path(args.from_file).resolve())
+    for conv in _read_conversations_from_file(args.from_file):
+      yield conv, f"file:{Path(args.from_file).name}", key
+
+
+class _ResultWriter:
+  """인제스트 결과를 완료 즉시 stdout으로 스트리밍.
+
+  - json: 기존과 같은 들여쓰기 JSON 객체(`items` 후 `count`)를 조각 단위로 출력
+  - jsonl: 결과 한 건당 한 줄, 마지막 요약은 stderr
+  - 중복 제거 사용 시(`duplicate_of` 필드) 요약에 `dedup` 통계(중복 수/비율) 추가
+  """
+
+  def __init__(self, fmt: str) -> None:
+    self.fmt = fmt
+    self.count = 0
+    self.dedup_checked = 0
+    self.duplicates = 0
+
+  def write(self, item: Dict[str, Any]) -> None:
+    if "duplicate_of" in item:
+      self.dedup_checked += 1
+      if item["duplicate_of"] is not None:
+        self.duplicates += 1
+    if self.fmt == "jsonl":
+      sys.stdout.write(json.dumps(item, ensure_ascii=False) + "\n")
+    else:
+      body = json.dumps(item, ensure_ascii=False, indent=2).replace("\n", "\n    ")
+      sys.stdout.write(('{\n  "items": [\n' if self.count == 0 else ",\n") + "    " + body)
+    self.count += 1
+    sys.stdout.flush()
+
+  def summary(self) -> Dict[str, Any]:
+    out: Dict[str, Any] = {"count": self.count}
+    if self.dedup_checked:
+      out["dedup"] = {
+        "checked": self.dedup_checked,
+        "duplicates": self.duplicates,
+        "rate": round(self.duplicates / self.dedup_checked, 4),
+      }
+    return out
+
+  def close(self) -> None:
+    if self.count == 0:
+      return
+    if self.fmt == "jsonl":
+      print(json.dumps(self.summary()), file=sys.stderr)
+    else:
+      # 요약 dict를 들여쓰기 JSON으로 만든 뒤 바깥 중괄호만 떼어 이어 붙임
+      tail = json.dumps(self.summary(), indent=2)[1:-2]
+      sys.stdout.write(f'\n  ],{tail}\n}}\n')
+    sys.stdout.flush()
+
+
+async def _cmd_ingest_batch(args: argparse.Namespace) -> None:
+  """다중 대화 배치 인제스트(입력/결과 모두 스트리밍).
+
+  `--checkpoint`가 있으면 소스별 커밋 offset을 배치마다 기록하고,
+  `--resume`이면 기록된 offset 이전 항목을 건너뜁니다.
+  """
+  settings = RagSettings()
+  pipeline = RagPipeline(settings)
+  checkpoint: IngestCheckpoint | None = None
+  if args.checkpoint:
+    checkpoint = IngestCheckpoint.load(args.checkpoint) if args.resume else IngestCheckpoint(args.checkpoint)
+  elif args.resume:
+    print("--resume requires --checkpoint.")
+    sys.exit(2)
+  # 생산자가 넘긴 항목의 (소스 키, 소스 내 offset); 결과는 입력 순서로 돌아온다
+  in_flight: Deque[Tuple[str, int]] = deque()
+  skipped = 0
+
+  def _items() -> Iterator[Tuple[List[str], Dict[str, Any]]]:
+    nonlocal skipped
+    per_source: Dict[str, int] = {}
+    for idx, (msgs, origin, key) in enumerate(_iter_batch_inputs(args)):
+      offset = per_source.get(key, 0)
+      per_source[key] = offset + 1
+      if checkpoint is not None and offset < checkpoint.offset(key):
+        skipped += 1
+        continue
+      in_flight.append((key, offset))
+      yield msgs, {"source": args.source or "cli-batch", "batch_index": idx, "origin": origin}
 
-  if not conversations:
+  batch_size = max(1, args.batch_size or settings.ingest_batch_size)
+  writer = _ResultWriter(args.output)
+  try:
+    async for res in pipeline.iter_ingest(
+      _items(), concurrency=args.concurrency, batch_size=batch_size, id_mode=args.id_mode
+    ):
+      writer.write(res)
+      if checkpoint is not None:
+        key, offset = in_flight.popleft()
+        checkpoint.advance(key, offset + 1)
+        if writer.count % batch_size == 0:
+          checkpoint.save()
+  finally:
+    writer.close()
+    if checkpoint is not None:
+      checkpoint.save()
+    await pipeline.aclose()
+
+  if skipped:
+    print(json.dumps({"resumed_skipped": skipped}), file=sys.stderr)
+  if writer.count == 0 and not skipped:
     print("No conversations found. Use --from-dir, --from-jsonl, or --from-file.")
     sys.exit(1)
 
-  results = []
-  for idx, msgs in enumerate(conversations):
-    meta = {"source": args.source or "cli-batch", "batch_index": idx, "origin": sources[idx] if idx < len(sources) else None}
-    res = await pipeline.ingest_conversation(msgs, metadata=meta)
-    results.append(res)
 
-  print(json.dumps({"count": len(results), "items": results}, ensure_ascii=False, indent=2))
+def _json_arg(value: str | None, flag: str) -> Dict[str, Any] | None:
+  """JSON 객체 문자열 인자 파싱(잘못된 값이면 종료)."""
+  if value is None:
+    return None
+  try:
+    parsed = json.loads(value)
+  except json.JSONDecodeError as e:
+    print(f"{flag}: invalid JSON ({e})")
+    sys.exit(2)
+  if not isinstance(parsed, dict):
+    print(f"{flag}: expected a JSON object")
+    sys.exit(2)
+  return parsed
 
 
 def _cmd_query(args: argparse.Namespace) -> None:
   """유사도 검색 서브커맨드 핸들러."""
   settings = RagSettings()
   pipeline = RagPipeline(settings)
-  res = pipeline.similarity_search(query_text=args.text, top_k=args.k)
+  filters = {
+    "where": _json_arg(args.where, "--where"),
+    "where_document": _json_arg(args.where_document, "--where-document"),
+    "include": [f for f in args.include.split(",") if f] if args.include else None,
+    "mode": args.mode,
+    "rerank": args.rerank,
+  }
+  if len(args.text) == 1 and not args.fuse:
+    res = pipeline.similarity_search(query_text=args.text[0], top_k=args.k, **filters)
+  else:
+    res = pipeline.similarity_search_many(args.text, top_k=args.k, fuse=args.fuse, **filters)
+  if res.get("embeddings") is not None:
+    res = {**res, "embeddings": [[list(map(float, v)) for v in rows] for rows in res["embeddings"]]}
   print(json.dumps(res, ensure_ascii=False, indent=2))
 
 
+def _cmd_lexical_rebuild(args: argparse.Namespace) -> None:
+  """BM25 역색인 재구축 서브커맨드 핸들러."""
+  settings = RagSettings()
+  if not settings.lexical_index:
+    print("LEXICAL_INDEX=true is required.")
+    sys.exit(2)
+  pipeline = RagPipeline(settings)
+  count = pipeline.rebuild_lexical_index()
+  print(json.dumps({"indexed": count}, ensure_ascii=False))
+
+
+def _cmd_quantization_report(args: argparse.Namespace) -> None:
+  """로컬 인덱스 벡터로 양자화 방식별 recall@k/메모리 리포트 출력."""
+  import numpy as np
+
+  from .local_store import LocalVectorStore
+  from .quantization import recall_report
+
+  settings = RagSettings()
+  if settings.vector_store != "local":
+    print("VECTOR_STORE=local is required.")
+    sys.exit(2)
+  vectors = LocalVectorStore(settings).live_vectors(limit=args.max_vectors, seed=args.seed)
+  if not len(vectors):
+    print("Local index is empty.")
+    sys.exit(2)
+  # 저장된 벡터에 작은 잡음을 더해 쿼리로 사용(자기 자신만 찾는 편향 완화)
+  rng = np.random.default_rng(args.seed)
+  queries = vectors[rng.choice(len(vectors), size=min(args.queries, len(vectors)), replace=False)]
+  queries = queries + rng.normal(0.0, args.noise / np.sqrt(vectors.shape[1]), size=queries.shape).astype(np.float32)
+  queries /= np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+  factors = [int(f) for f in args.rescore_factors.split(",") if f]
+  print(json.dumps(recall_report(vectors, queries, k=args.k, rescore_factors=factors), ensure_ascii=False, indent=2))
+
+
+def _cmd_bench(args: argparse.Namespace) -> None:
+  """벤치마크 서브커맨드 핸들러(JSON 리포트 출력)."""
+  from .bench import run_benchmarks
+
+  report = run_benchmarks(
+    RagSettings(),
+    phases=[p for p in args.phases.split(",") if p],
+    conversations=args.conversations,
+    queries=args.queries,
+    embed_batch=args.embed_batch,
+    concurrency=args.concurrency,
+    top_k=args.k,
+    store=args.store,
+    embedder=args.embedder,
+    seed=args.seed,
+  )
+  text = json.dumps(report, ensure_ascii=False, indent=2)
+  if args.output:
+    Path(args.output).write_text(text + "\n", encoding="utf-8")
+  print(text)
+
+
 def build_parser() -> argparse.ArgumentParser:
   """argparse 파서 구성."""
   p = argparse.ArgumentParser(prog="rag-engine", description="RAG Engine CLI")
@@ -249,13 +492,50 @@ def build_parser() -> argparse.ArgumentParser:
   ingb.add_argument("--from-jsonl", help="Path to JSONL file; each line is an array or an object with 'messages'")
   ingb.add_argument("--from-file", help="Path to file; supports nested arrays [[...],[...]] for multiple conversations")
   ingb.add_argument("--source", help="Metadata source tag for all items", default="cli-batch")
+  ingb.add_argument("--concurrency", type=int, default=None, help="Max concurrent preprocessing calls (default INGEST_CONCURRENCY)")
+  ingb.add_argument("--batch-size", type=int, default=None, help="Conversations per embed/upsert batch (default INGEST_BATCH_SIZE)")
+  ingb.add_argument("--id-mode", choices=["random", "content"], default=None, help="Document id: random nanoid or content hash (default INGEST_ID_MODE)")
+  ingb.add_argument("--checkpoint", help="Checkpoint file recording committed offsets per source file")
+  ingb.add_argument("--resume", action="store_true", help="Skip items already committed according to --checkpoint")
+  ingb.add_argument("--output", choices=["json", "jsonl"], default="json", help="Result format streamed to stdout (jsonl: one item per line)")
   ingb.set_defaults(func=lambda a: asyncio.run(_cmd_ingest_batch(a)))
 
   qry = sub.add_parser("query", help="Embed query text → similarity search")
-  qry.add_argument("--text", required=True, help="Query text")
+  qry.add_argument("--text", action="append", required=True, help="Query text (repeatable; embedded and searched in one call)")
+  qry.add_argument("--fuse", action="store_true", help="Merge results of multiple --text queries with reciprocal-rank fusion")
   qry.add_argument("-k", type=int, default=None, help="Top-K results")
+  qry.add_argument("--where", help='Metadata filter as JSON, e.g. \'{"source": "support-logs"}\'')
+  qry.add_argument("--where-document", help='Document text filter as JSON, e.g. \'{"$contains": "환불"}\'')
+  qry.add_argument("--include", help="Comma-separated fields to return: documents,metadatas,distances,embeddings")
+  qry.add_argument("--mode", choices=["vector", "hybrid"], default=None, help="vector, or hybrid BM25+vector fusion (default QUERY_MODE)")
+  qry.add_argument("--rerank", action=argparse.BooleanOptionalAction, default=None, help="MMR + term-overlap rerank of a larger candidate set (default RERANK)")
   qry.set_defaults(func=_cmd_query)
 
+  lex = sub.add_parser("lexical-rebuild", help="Rebuild the BM25 lexical index from all documents in the store")
+  lex.set_defaults(func=_cmd_lexical_rebuild)
+
+  qrep = sub.add_parser("quantization-report", help="Recall@k vs memory of int8/binary codes on the local index vectors")
+  qrep.add_argument("-k", type=int, default=10, help="Top-K used for recall")
+  qrep.add_argument("--queries", type=int, default=200, help="Number of sampled query vectors")
+  qrep.add_argument("--noise", type=float, default=0.5, help="Gaussian noise norm added to sampled queries")
+  qrep.add_argument("--rescore-factors", default="1,2,4,8", help="Comma-separated candidate multipliers to evaluate")
+  qrep.add_argument("--max-vectors", type=int, default=100000, help="Sample at most this many stored vectors")
+  qrep.add_argument("--seed", type=int, default=0)
+  qrep.set_defaults(func=_cmd_quantization_report)
+
+  bench = sub.add_parser("bench", help="Benchmark embed/ingest/query on synthetic conversations (JSON report)")
+  bench.add_argument("--phases", default="embed,ingest,query", help="Comma-separated phases: embed,ingest,query,normalize")
+  bench.add_argument("--conversations", type=int, default=200, help="Synthetic conversations to embed/ingest")
+  bench.add_argument("--queries", type=int, default=200, help="Queries to run against the ingested conversations")
+  bench.add_argument("--embed-batch", type=int, default=32, help="Texts per embed call in the embed phase")
+  bench.add_argument("--concurrency", type=int, default=1, help="Concurrent ingest_conversation calls")
+  bench.add_argument("-k", type=int, default=5, help="Top-K for queries")
+  bench.add_argument("--store", choices=["local", "chroma"], default="local", help="Temporary local index or in-memory Chroma")
+  bench.add_argument("--embedder", choices=["model", "hash"], default="model", help="Real embedding model, or hashed vectors to measure pipeline overhead only")
+  bench.add_argument("--seed", type=int, default=0)
+  bench.add_argument("--output", help="Also write the JSON report to this path")
+  bench.set_defaults(func=_cmd_bench)
+
   return p
 
 
@@ -6,6 +6,8 @@ Chroma 서버 접속 정보를 관리합니다. 코드 전역에서 동일한 
 """
 from __future__ import annotations
 
+from pathlib import Path
+
 from pydantic import BaseModel, Field
 import os
 try:
@@ -18,10 +20,23 @@ except Exception:
 class RagSettings(BaseModel):
   """RAG 엔진 런타임 설정 모델.
 
-  - OpenRouter: 전처리 호출 시 사용되는 API 키/엔드포인트/모델
-  - Embedding: 임베딩 모델 ID 및 디바이스(cpu/gpu)
-  - Chroma: 호스트/포트/컬렉션명
-  - Query: 기본 top-k
+  - OpenRouter: 전처리 호출 시 사용되는 API 키/엔드포인트/모델, HTTP 풀/타임아웃
+  - OpenRouter 보호: 분당 요청/토큰 한도, 재시도 횟수/백오프, 서킷 브레이커 임계값/복구 대기
+  - Embedding: 임베딩 모델 ID 및 디바이스(cpu/gpu), 쿼리 임베딩 LRU 캐시 용량,
+    워커 풀(thread/process) 크기와 대기열 상한, 요청 병합(micro-batching) 창
+  - Chroma: 호스트/포트/컬렉션명, 블로킹 호출용 I/O 스레드 수
+  - Vector store: 백엔드 선택(chroma/local), 로컬 인덱스 경로/압축 임계값,
+    로컬 인덱스 양자화(none/int8/binary)와 재채점 후보 배수
+  - Query: 기본 top-k, 검색 모드(vector/hybrid)와 하이브리드 후보 배수/가중치
+  - Lexical: BM25 역색인 사용 여부/경로
+  - Rerank: CPU 재정렬(MMR + 용어 겹침) 사용 여부, 후보 수, 시간 예산, 가중치
+  - Startup: API 시작 시 모델/Chroma 워밍업 여부
+  - Metrics: API 응답의 요청별 `Server-Timing` 헤더 사용 여부
+  - Ingest: 배치 인제스트 동시성/배치 크기, 문서 id 생성 방식
+  - Chunking: 긴 대화 분할 방식/창 크기/겹침, 검색 시 청크 추가 조회 배수
+  - Dedup: 인제스트 시 근접 중복 처리 방식(off/skip/merge/count)과 코사인 임계값
+  - Preprocess cache: 전처리 결과 SQLite 캐시 경로/용량/TTL
+  - Preprocess packing: 짧은 대화를 한 번의 OpenRouter 호출로 묶는 개수/글자 수 상한
 
   참고: OpenRouter 전처리를 사용하려면 실행 환경에 `OPENROUTER_API_KEY`를
   설정해야 합니다. 미설정 시 휴리스틱 전처리로 자동 폴백됩니다.
@@ -37,19 +52,109 @@ class RagSettings(BaseModel):
   openrouter_model: str = Field(
     default=os.getenv("OPENROUTER_MODEL", "openai/gpt-5-nano")
   )
+  openrouter_timeout: float = Field(default=float(os.getenv("OPENROUTER_TIMEOUT", "60")))
+  openrouter_connect_timeout: float = Field(default=float(os.getenv("OPENROUTER_CONNECT_TIMEOUT", "10")))
+  openrouter_max_connections: int = Field(default=int(os.getenv("OPENROUTER_MAX_CONNECTIONS", "32")))
+  openrouter_max_keepalive: int = Field(default=int(os.getenv("OPENROUTER_MAX_KEEPALIVE", "16")))
+  openrouter_keepalive_expiry: float = Field(default=float(os.getenv("OPENROUTER_KEEPALIVE_EXPIRY", "30")))
+  openrouter_http2: bool = Field(default=os.getenv("OPENROUTER_HTTP2", "true").lower() in {"1", "true", "yes"})
+  # 0이면 무제한
+  openrouter_rpm: float = Field(default=float(os.getenv("OPENROUTER_RPM", "0")))
+  openrouter_tpm: float = Field(default=float(os.getenv("OPENROUTER_TPM", "0")))
+  openrouter_max_retries: int = Field(default=int(os.getenv("OPENROUTER_MAX_RETRIES", "3")))
+  openrouter_retry_base_delay: float = Field(default=float(os.getenv("OPENROUTER_RETRY_BASE_DELAY", "0.5")))
+  openrouter_retry_max_delay: float = Field(default=float(os.getenv("OPENROUTER_RETRY_MAX_DELAY", "20")))
+  openrouter_breaker_threshold: int = Field(default=int(os.getenv("OPENROUTER_BREAKER_THRESHOLD", "5")))
+  openrouter_breaker_reset_s: float = Field(default=float(os.getenv("OPENROUTER_BREAKER_RESET", "30")))
 
   # Embedding model
   embedding_model_id: str = Field(
     default=os.getenv("EMBEDDING_MODEL_ID", "minishlab/potion-multilingual-128M")
   )
   embedding_device: str = Field(default=os.getenv("EMBEDDING_DEVICE", "cpu"))
+  query_cache_size: int = Field(default=int(os.getenv("QUERY_CACHE_SIZE", "1024")))
+  embed_executor: str = Field(default=os.getenv("EMBED_EXECUTOR", "thread"))
+  embed_workers: int = Field(default=int(os.getenv("EMBED_WORKERS", "2")))
+  embed_queue_size: int = Field(default=int(os.getenv("EMBED_QUEUE_SIZE", "64")))
+  embed_batch_max_size: int = Field(default=int(os.getenv("EMBED_BATCH_MAX_SIZE", "64")))
+  embed_batch_max_wait_ms: float = Field(default=float(os.getenv("EMBED_BATCH_MAX_WAIT_MS", "2")))
 
   # Chroma server
   chroma_host: str = Field(default=os.getenv("CHROMA_HOST", "localhost"))
   chroma_port: int = Field(default=int(os.getenv("CHROMA_PORT", "8000")))
   chroma_collection: str = Field(default=os.getenv("CHROMA_COLLECTION", "conversations"))
+  chroma_workers: int = Field(default=int(os.getenv("CHROMA_WORKERS", "4")))
+
+  # Vector store backend: chroma | local (NumPy/mmap index)
+  vector_store: str = Field(default=os.getenv("VECTOR_STORE", "chroma"))
+  local_store_path: str = Field(
+    default=os.getenv("LOCAL_STORE_PATH", str(Path.home() / ".rag_engine" / "local_index"))
+  )
+  local_store_compact_ratio: float = Field(default=float(os.getenv("LOCAL_STORE_COMPACT_RATIO", "0.25")))
+  # none: float32 전수 검색, int8/binary: 양자화 코드로 1차 후보 선별 후 float32로 재채점
+  local_store_quantization: str = Field(default=os.getenv("LOCAL_STORE_QUANTIZATION", "none"))
+  local_store_rescore_factor: int = Field(default=int(os.getenv("LOCAL_STORE_RESCORE_FACTOR", "4")))
 
   # Misc
+  warmup_on_startup: bool = Field(
+    default=os.getenv("WARMUP_ON_STARTUP", "true").lower() in {"1", "true", "yes"}
+  )
   default_top_k: int = Field(default=int(os.getenv("DEFAULT_TOP_K", "5")))
+  # API 응답에 요청별 단계 소요 시간 `Server-Timing` 헤더 추가
+  timing_headers: bool = Field(
+    default=os.getenv("TIMING_HEADERS", "false").lower() in {"1", "true", "yes"}
+  )
+  # vector: 임베딩 검색만, hybrid: 벡터 유사도와 BM25 점수를 `HYBRID_ALPHA` 가중합으로 합침(LEXICAL_INDEX 필요)
+  query_mode: str = Field(default=os.getenv("QUERY_MODE", "vector"))
+  hybrid_overfetch: int = Field(default=int(os.getenv("HYBRID_OVERFETCH", "4")))
+  # 하이브리드 점수에서 벡터 쪽 가중치(나머지는 BM25)
+  hybrid_alpha: float = Field(default=float(os.getenv("HYBRID_ALPHA", "0.5")))
+
+  # Rerank: 후보를 넉넉히 가져와 MMR(다양성) + 용어 겹침으로 재정렬
+  rerank: bool = Field(default=os.getenv("RERANK", "false").lower() in {"1", "true", "yes"})
+  rerank_candidates: int = Field(default=int(os.getenv("RERANK_CANDIDATES", "30")))
+  rerank_budget_ms: float = Field(default=float(os.getenv("RERANK_BUDGET_MS", "5")))
+  # MMR 관련도 가중치(1이면 다양성 무시), 관련도 중 용어 겹침 비중
+  rerank_lambda: float = Field(default=float(os.getenv("RERANK_LAMBDA", "0.7")))
+  rerank_term_weight: float = Field(default=float(os.getenv("RERANK_TERM_WEIGHT", "0.3")))
+
+  # Lexical (BM25) index
+  lexical_index: bool = Field(
+    default=os.getenv("LEXICAL_INDEX", "false").lower() in {"1", "true", "yes"}
+  )
+  lexical_index_path: str = Field(
+    default=os.getenv("LEXICAL_INDEX_PATH", str(Path.home() / ".rag_engine" / "lexical"))
+  )
+
+  # Batch ingest
+  ingest_concurrency: int = Field(default=int(os.getenv("INGEST_CONCURRENCY", "8")))
+  ingest_batch_size: int = Field(default=int(os.getenv("INGEST_BATCH_SIZE", "64")))
+  # random: nanoid, content: 대화 원문 해시(재실행 시 멱등)
+  ingest_id_mode: str = Field(default=os.getenv("INGEST_ID_MODE", "random"))
+
+  # Chunking: none | turns (Q/A 턴 묶음) | chars (문자 창)
+  chunk_mode: str = Field(default=os.getenv("CHUNK_MODE", "none"))
+  chunk_max_chars: int = Field(default=int(os.getenv("CHUNK_MAX_CHARS", "800")))
+  chunk_overlap_turns: int = Field(default=int(os.getenv("CHUNK_OVERLAP_TURNS", "1")))
+  chunk_overlap_chars: int = Field(default=int(os.getenv("CHUNK_OVERLAP_CHARS", "100")))
+  chunk_query_overfetch: int = Field(default=int(os.getenv("CHUNK_QUERY_OVERFETCH", "3")))
+
+  # Dedup: off | skip (저장 안 함) | merge (대상 메타데이터에 병합 + 카운트) | count (대상에 카운트만)
+  dedup_mode: str = Field(default=os.getenv("DEDUP_MODE", "off"))
+  dedup_threshold: float = Field(default=float(os.getenv("DEDUP_THRESHOLD", "0.95")))
+
+  # Preprocess cache
+  preprocess_cache_enabled: bool = Field(
+    default=os.getenv("PREPROCESS_CACHE_ENABLED", "true").lower() in {"1", "true", "yes"}
+  )
+  preprocess_cache_path: str = Field(
+    default=os.getenv("PREPROCESS_CACHE_PATH", str(Path.home() / ".rag_engine" / "preprocess_cache.sqlite3"))
+  )
+  preprocess_cache_max_entries: int = Field(default=int(os.getenv("PREPROCESS_CACHE_MAX_ENTRIES", "100000")))
+  preprocess_cache_ttl_seconds: float = Field(default=float(os.getenv("PREPROCESS_CACHE_TTL_SECONDS", "2592000")))
+
+  # Preprocess packing (1이면 대화마다 개별 호출)
+  preprocess_pack_size: int = Field(default=int(os.getenv("PREPROCESS_PACK_SIZE", "1")))
+  preprocess_pack_max_chars: int = Field(default=int(os.getenv("PREPROCESS_PACK_MAX_CHARS", "6000")))
 
 
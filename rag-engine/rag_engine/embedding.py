@@ -2,19 +2,42 @@
 
 Potion(model2vec)을 우선 시도하고, 가용하지 않으면 sentence-transformers로
 자동 폴백합니다. 각 백엔드의 출력 차원은 상이(256 vs 384)할 수 있으므로
-`dimension` 속성으로 노출합니다.
+`dimension` 속성으로 노출합니다. 검색 쿼리 임베딩은 `embed_queries`를 통해
+프로세스 내 LRU 캐시(`QueryEmbeddingCache`)를 거칩니다. `aembed_*` 메서드는
+이벤트 루프를 막지 않도록 전용 워커 풀(`BoundedExecutor`)에서 인코딩하며,
+작은 요청은 `EmbeddingBatcher`로 병합해 한 번에 인코딩합니다.
+`quantize`는 int8(벡터별 스케일) 또는 부호 비트 코드를 만듭니다.
 """
 from __future__ import annotations
 
-from typing import Iterable, List
+from typing import Any, Dict, Hashable, Iterable, List, Tuple
 import logging
+import time
 
 import numpy as np
 
+from .batching import EmbeddingBatcher
+from .cache import QueryEmbeddingCache
 from .config import RagSettings
+from .executor import BoundedExecutor
+from .quantization import pack_bits, quantize_int8
 
 LOGGER = logging.getLogger(__name__)
 
+# 프로세스 풀 워커별 sentence-transformers 모델 캐시
+_PROCESS_MODELS: Dict[Tuple[str, str], Any] = {}
+
+
+def _encode_in_process(model_id: str, device: str, texts: List[str]) -> np.ndarray:
+  """프로세스 풀 워커에서 sentence-transformers 인코딩(모델은 워커별 1회 로드)."""
+  model = _PROCESS_MODELS.get((model_id, device))
+  if model is None:
+    from sentence_transformers import SentenceTransformer  # type: ignore
+    model = SentenceTransformer(model_id, device=device)
+    _PROCESS_MODELS[(model_id, device)] = model
+  vecs = model.encode(texts, convert_to_numpy=True, normalize_embeddings=True)
+  return np.ascontiguousarray(vecs, dtype=np.float32)
+
 
 class EmbeddingModel:
   """임베딩 백엔드 관리 클래스.
@@ -26,7 +49,16 @@ class EmbeddingModel:
   def __init__(self, settings: RagSettings) -> None:
     self.settings = settings
     self._backend = None
+    self._backend_id: str | None = None
     self._dimension: int | None = None
+    self.query_cache = QueryEmbeddingCache(settings.query_cache_size)
+    self._threads = BoundedExecutor(settings.embed_workers, settings.embed_queue_size, kind="thread", name="rag-embed")
+    self._processes: BoundedExecutor | None = None
+    if settings.embed_executor == "process":
+      self._processes = BoundedExecutor(settings.embed_workers, settings.embed_queue_size, kind="process")
+    self.batcher: EmbeddingBatcher | None = None
+    if settings.embed_batch_max_wait_ms > 0:
+      self.batcher = EmbeddingBatcher(self._aembed_direct, settings.embed_batch_max_size, settings.embed_batch_max_wait_ms)
 
   @property
   def dimension(self) -> int | None:
@@ -43,6 +75,8 @@ class EmbeddingModel:
       self._backend = StaticModel.from_pretrained(self.settings.embedding_model_id)
       # Potion outputs 256-dim
       self._dimension = 256
+      self._backend_id = self.settings.embedding_model_id
+      self.query_cache.clear()
       LOGGER.info("Loaded Potion model via model2vec: %s", self.settings.embedding_model_id)
       return
     except Exception as e:
@@ -62,28 +96,135 @@ class EmbeddingModel:
       self._backend = SentenceTransformer(fallback_id, device=self.settings.embedding_device)
       # Known dim for the fallback model
       self._dimension = 384
+      self._backend_id = fallback_id
+      self.query_cache.clear()
       LOGGER.info("Loaded fallback embedding model: %s", fallback_id)
     except Exception as e:
       raise RuntimeError(f"Failed to initialize any embedding backend: {e}")
 
-  def embed(self, texts: Iterable[str]) -> List[List[float]]:
-    """문자열 Iterable을 임베딩 리스트로 변환(float32 리스트).
+  def embed_array(self, texts: Iterable[str]) -> np.ndarray:
+    """문자열 Iterable을 `(n, dim)` C-연속 float32 행렬로 임베딩.
 
     - Potion: `StaticModel.encode`
     - ST: `SentenceTransformer.encode(normalize_embeddings=True)`
     """
     self._load_backend()
     texts_list = [t if isinstance(t, str) else str(t) for t in texts]
+    if not texts_list:
+      return np.zeros((0, self._dimension or 0), dtype=np.float32)
 
     # Potion
     if self._backend.__class__.__name__ == "StaticModel":
       vecs = self._backend.encode(texts_list)  # type: ignore[attr-defined]
-      if isinstance(vecs, np.ndarray):
-        return vecs.astype(np.float32).tolist()
-      return np.array(vecs, dtype=np.float32).tolist()
+    else:
+      # Sentence-Transformers
+      vecs = self._backend.encode(texts_list, convert_to_numpy=True, normalize_embeddings=True)
+    return np.ascontiguousarray(vecs, dtype=np.float32)
+
+  def embed(self, texts: Iterable[str]) -> List[List[float]]:
+    """문자열 Iterable을 임베딩 리스트로 변환(float32 리스트).
+
+    JSON 직렬화가 필요한 경계에서만 사용하고, 내부 경로는 `embed_array`를 사용합니다.
+    """
+    return self.embed_array(texts).tolist()
+
+  def _lookup_queries(self, texts: Iterable[str]) -> Tuple[List[str], List[Hashable], List[np.ndarray | None], List[int]]:
+    """쿼리 정규화 후 캐시 조회: (정규화 텍스트, 키, 행(미스는 None), 미스 인덱스)."""
+    normalized = [" ".join(str(t).split()) for t in texts]
+    keys: List[Hashable] = [(self._backend_id, t) for t in normalized]
+    rows: List[np.ndarray | None] = [self.query_cache.get(k) for k in keys]
+    missing = [i for i, r in enumerate(rows) if r is None]
+    return normalized, keys, rows, missing
+
+  def _fill_queries(self, keys: List[Hashable], rows: List[np.ndarray | None], missing: List[int], fresh: Iterable[np.ndarray]) -> np.ndarray:
+    """새로 계산한 행을 캐시에 넣고 `(n, dim)` 행렬로 합침."""
+    for i, row in zip(missing, fresh):
+      self.query_cache.put(keys[i], row)
+      rows[i] = row
+    if not rows:
+      return np.zeros((0, self._dimension or 0), dtype=np.float32)
+    return np.ascontiguousarray(np.stack(rows), dtype=np.float32)  # type: ignore[arg-type]
+
+  def embed_queries(self, texts: Iterable[str]) -> np.ndarray:
+    """검색 쿼리 임베딩(LRU 캐시 경유), `(n, dim)` float32 행렬 반환.
+
+    - 키: (백엔드 모델 id, 공백 정규화된 쿼리)
+    - 미스 항목만 모아 한 번의 `embed_array` 호출로 계산 후 캐시에 저장
+    """
+    self._load_backend()
+    normalized, keys, rows, missing = self._lookup_queries(texts)
+    fresh = self.embed_array([normalized[i] for i in missing]) if missing else []
+    return self._fill_queries(keys, rows, missing, fresh)
 
-    # Sentence-Transformers
-    embeddings = self._backend.encode(texts_list, convert_to_numpy=True, normalize_embeddings=True)
-    return embeddings.astype(np.float32).tolist()
+  async def aembed_array(self, texts: Iterable[str]) -> np.ndarray:
+    """`embed_array`의 비동기 버전(워커 풀에서 실행).
 
+    병합기가 켜져 있고 요청이 `EMBED_BATCH_MAX_SIZE`보다 작으면 동시 요청과
+    묶어서 인코딩합니다. 큰 요청은 바로 워커 풀로 보냅니다.
+    """
+    texts_list = [t if isinstance(t, str) else str(t) for t in texts]
+    if self.batcher is not None and 0 < len(texts_list) < self.batcher.max_batch_size:
+      return await self.batcher.submit(texts_list)
+    return await self._aembed_direct(texts_list)
 
+  async def _aembed_direct(self, texts_list: List[str]) -> np.ndarray:
+    """워커 풀에서 즉시 인코딩.
+
+    `EMBED_EXECUTOR=process`이고 백엔드가 sentence-transformers면 프로세스 풀을 사용합니다.
+    """
+    if self._backend is None:
+      await self._threads.run(self._load_backend)
+    if (
+      self._processes is not None
+      and texts_list
+      and self._backend.__class__.__name__ == "SentenceTransformer"
+    ):
+      return await self._processes.run(_encode_in_process, self._backend_id, self.settings.embedding_device, texts_list)
+    return await self._threads.run(self.embed_array, texts_list)
+
+  async def aembed_queries(self, texts: Iterable[str]) -> np.ndarray:
+    """`embed_queries`의 비동기 버전. 캐시 적중은 루프에서 즉시 처리."""
+    if self._backend is None:
+      await self._threads.run(self._load_backend)
+    normalized, keys, rows, missing = self._lookup_queries(texts)
+    fresh = await self.aembed_array([normalized[i] for i in missing]) if missing else []
+    return self._fill_queries(keys, rows, missing, fresh)
+
+  @staticmethod
+  def quantize(vectors: np.ndarray, mode: str) -> Dict[str, np.ndarray]:
+    """float32 임베딩 → 양자화 코드.
+
+    - int8: `{"codes": (n, dim) int8, "scales": (n,) float32}` (복원: `codes * scales[:, None]`)
+    - binary: `{"codes": (n, ceil(dim / 8)) uint8}` (부호 비트, 해밍 거리 1차 필터용)
+    """
+    if mode == "int8":
+      codes, scales = quantize_int8(vectors)
+      return {"codes": codes, "scales": scales}
+    if mode == "binary":
+      return {"codes": pack_bits(vectors)}
+    raise ValueError(f"Unknown quantization mode: {mode}")
+
+  async def aembed_quantized(self, texts: Iterable[str], mode: str) -> Dict[str, np.ndarray]:
+    """`aembed_array` 후 `quantize`."""
+    return self.quantize(await self.aembed_array(texts), mode)
+
+  def warmup(self) -> Dict[str, float]:
+    """모델 로드 + 더미 인코딩으로 첫 요청 지연 제거. 단계별 소요(ms) 반환."""
+    t0 = time.perf_counter()
+    self._load_backend()
+    t1 = time.perf_counter()
+    self.embed_array(["warmup"])
+    t2 = time.perf_counter()
+    return {"model_load_ms": (t1 - t0) * 1000.0, "dummy_encode_ms": (t2 - t1) * 1000.0}
+
+  async def aclose(self) -> None:
+    """병합 대기/실행 중인 임베딩 요청을 취소한 뒤 워커 풀 종료."""
+    if self.batcher is not None:
+      await self.batcher.aclose()
+    self.close()
+
+  def close(self) -> None:
+    """워커 풀 종료(다음 비동기 호출 시 재생성)."""
+    self._threads.shutdown()
+    if self._processes is not None:
+      self._processes.shutdown()
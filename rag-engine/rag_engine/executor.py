@@ -0,0 +1,67 @@
+"""Bounded worker pools for blocking work.
+
+임베딩(CPU)과 Chroma 클라이언트 호출(블로킹 I/O)을 이벤트 루프 밖의 풀에서
+실행합니다. 동시에 대기/실행 중인 작업 수를 제한해, 폭주 시 호출자가
+대기열 자리가 날 때까지 기다리도록(backpressure) 합니다.
+"""
+from __future__ import annotations
+
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+import asyncio
+import threading
+import weakref
+
+T = TypeVar("T")
+
+
+class BoundedExecutor:
+  """대기열 상한을 가진 스레드/프로세스 풀 래퍼.
+
+  - `kind`: "thread" 또는 "process"
+  - `max_pending`: 실행 중 + 대기 중 작업 수 상한(이벤트 루프별 세마포어)
+  - 풀은 첫 사용 시 생성되며 `shutdown()` 후 다시 사용하면 재생성됩니다.
+  """
+
+  def __init__(self, max_workers: int, max_pending: int, kind: str = "thread", name: str = "rag") -> None:
+    """풀 설정 저장(생성은 지연)."""
+    if kind not in {"thread", "process"}:
+      raise ValueError(f"Unknown executor kind: {kind}")
+    self.max_workers = max(1, max_workers)
+    self.max_pending = max(self.max_workers, max_pending)
+    self.kind = kind
+    self.name = name
+    self._pool: Executor | None = None
+    self._lock = threading.Lock()
+    self._slots: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+
+  def _get_pool(self) -> Executor:
+    """풀 지연 생성."""
+    with self._lock:
+      if self._pool is None:
+        if self.kind == "process":
+          self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        else:
+          self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=self.name)
+      return self._pool
+
+  def _get_slots(self, loop: asyncio.AbstractEventLoop) -> asyncio.Semaphore:
+    """현재 이벤트 루프에 묶인 대기열 세마포어."""
+    sem = self._slots.get(loop)
+    if sem is None:
+      sem = asyncio.Semaphore(self.max_pending)
+      self._slots[loop] = sem
+    return sem
+
+  async def run(self, fn: Callable[..., T], *args: Any) -> T:
+    """`fn(*args)`를 풀에서 실행하고 결과를 await."""
+    loop = asyncio.get_running_loop()
+    async with self._get_slots(loop):
+      return await loop.run_in_executor(self._get_pool(), fn, *args)
+
+  def shutdown(self, wait: bool = True) -> None:
+    """풀 종료(다음 사용 시 재생성)."""
+    with self._lock:
+      pool, self._pool = self._pool, None
+    if pool is not None:
+      pool.shutdown(wait=wait)
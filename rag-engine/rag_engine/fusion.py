@@ -0,0 +1,75 @@
+"""Result fusion helpers.
+
+여러 쿼리(또는 여러 검색기)의 Chroma 형태 결과(`ids`/`documents`/`metadatas`/
+`distances`가 쿼리별 리스트로 중첩된 dict)를 하나의 순위로 합칩니다.
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+# RRF 상수(원 논문 기본값)
+RRF_K = 60
+
+
+def reciprocal_rank_fusion(result: Dict[str, Any], top_k: int, k: int = RRF_K) -> Dict[str, Any]:
+  """쿼리별 순위를 Reciprocal Rank Fusion으로 합치고 id 기준으로 중복 제거.
+
+  - 점수: 각 쿼리에서의 순위 r(0부터)에 대해 `1 / (k + r + 1)`의 합
+  - 문서/메타데이터/임베딩은 처음 등장한 항목, 거리는 쿼리 중 최솟값을 사용
+  - 입력에서 None인 필드(`include`로 제외)는 결과에서도 None
+  - 반환: 단일 쿼리 결과와 같은 중첩 형태 + `scores`
+  """
+  ids_lists: List[List[str]] = result.get("ids") or []
+  fields = [k for k in ("documents", "metadatas", "embeddings") if result.get(k) is not None]
+
+  scores: Dict[str, float] = {}
+  first: Dict[str, tuple[int, int]] = {}
+  dist_of: Dict[str, float] = {}
+  dist_lists = result.get("distances")
+  for qi, ids in enumerate(ids_lists):
+    dists = dist_lists[qi] if dist_lists is not None else None
+    for rank, doc_id in enumerate(ids):
+      scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+      first.setdefault(doc_id, (qi, rank))
+      d = dists[rank] if dists is not None else None
+      if d is not None:
+        dist_of[doc_id] = min(d, dist_of.get(doc_id, d))
+
+  ranked = sorted(scores, key=lambda i: scores[i], reverse=True)[:top_k]
+  out: Dict[str, Any] = {"ids": [ranked]}
+  for key in ("documents", "metadatas", "embeddings"):
+    if key in fields:
+      rows = result[key]
+      out[key] = [[rows[first[i][0]][first[i][1]] if rows[first[i][0]] is not None else None for i in ranked]]
+    else:
+      out[key] = None
+  out["distances"] = [[dist_of.get(i) for i in ranked]] if dist_lists is not None else None
+  out["scores"] = [[scores[i] for i in ranked]]
+  return out
+
+
+def weighted_score_fusion(
+  vector_ids: Sequence[str],
+  vector_distances: Sequence[float],
+  lexical_hits: Sequence[Tuple[str, float]],
+  alpha: float,
+) -> List[Tuple[str, float]]:
+  """벡터 유사도와 BM25 점수를 [0, 1] 범위로 맞춰 가중합.
+
+  - 벡터: 제곱 L2 거리 → 코사인 유사도 `1 - d / 2`(임베딩은 단위 벡터), 0~1로 자름
+  - BM25: 후보 중 최고 점수로 나눔
+  - 한쪽 후보에 없는 항목은 그쪽 점수 0
+  - 최종 점수 `alpha * 벡터 + (1 - alpha) * BM25` 내림차순 `(id, score)` 목록
+  """
+  scores: Dict[str, float] = {}
+  if len(vector_ids):
+    sims = np.clip(1.0 - np.asarray(vector_distances, dtype=np.float64) / 2.0, 0.0, 1.0)
+    for doc_id, sim in zip(vector_ids, sims.tolist()):
+      scores[doc_id] = alpha * sim
+  if lexical_hits:
+    top = max(score for _, score in lexical_hits) or 1.0
+    for doc_id, score in lexical_hits:
+      scores[doc_id] = scores.get(doc_id, 0.0) + (1.0 - alpha) * score / top
+  return sorted(scores.items(), key=lambda kv: kv[1], reverse=True)
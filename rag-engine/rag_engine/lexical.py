@@ -0,0 +1,163 @@
+"""Local BM25 lexical index.
+
+벡터 스토어와 나란히 유지되는 역색인입니다. 주문/운송장 번호, 상품 코드처럼
+임베딩이 잘 구분하지 못하는 정확 일치 검색을 보완합니다.
+
+- 토큰화: 소문자 단어 토큰, 한글 2글자 n-gram(조사가 붙어도 일치),
+  `123-456-789` 같은 코드는 원형과 구분자 제거형을 함께 색인
+- 저장: SQLite(`docs` 문서 길이, `postings` 용어별 빈도). 업서트마다 해당 id의
+  포스팅만 교체하므로 시작 시 재구축이 필요 없음
+- 점수: Okapi BM25 (k1=1.2, b=0.75)
+"""
+from __future__ import annotations
+
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Tuple
+import math
+import re
+import sqlite3
+import threading
+
+from .config import RagSettings
+from .executor import BoundedExecutor
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_WORD_PATTERN = re.compile(r"\w+")
+_CODE_PATTERN = re.compile(r"[0-9a-z]+(?:[-_./#:][0-9a-z]+)+")
+_HANGUL_PATTERN = re.compile(r"[가-힣]{2,}")
+_CODE_SEPARATORS = re.compile(r"[-_./#:]")
+
+
+def tokenize(text: str) -> List[str]:
+  """BM25 용어 목록(중복 포함) 생성."""
+  lowered = text.lower()
+  terms: List[str] = []
+  for code in _CODE_PATTERN.findall(lowered):
+    terms.append(code)
+    terms.append(_CODE_SEPARATORS.sub("", code))
+  for word in _WORD_PATTERN.findall(lowered):
+    # `Q`/`A` 접두어 등 한 글자 영문/숫자는 제외
+    if len(word) > 1 or not word.isascii():
+      terms.append(word)
+  for run in _HANGUL_PATTERN.findall(lowered):
+    if len(run) > 2:
+      terms.extend(run[i:i + 2] for i in range(len(run) - 1))
+  return terms
+
+
+class LexicalIndex:
+  """SQLite 기반 BM25 역색인(컬렉션당 파일 1개)."""
+
+  def __init__(self, path: str | Path) -> None:
+    """DB 파일을 열고 스키마/문서 통계를 준비."""
+    self.path = Path(path).expanduser()
+    self.path.parent.mkdir(parents=True, exist_ok=True)
+    self._lock = threading.Lock()
+    self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+    self._conn.execute("PRAGMA journal_mode=WAL")
+    self._conn.execute("PRAGMA synchronous=NORMAL")
+    self._conn.execute("CREATE TABLE IF NOT EXISTS docs (id TEXT PRIMARY KEY, length INTEGER NOT NULL)")
+    self._conn.execute(
+      "CREATE TABLE IF NOT EXISTS postings ("
+      "term TEXT NOT NULL, id TEXT NOT NULL, tf INTEGER NOT NULL, PRIMARY KEY (term, id)) WITHOUT ROWID"
+    )
+    self._conn.execute("CREATE INDEX IF NOT EXISTS idx_postings_id ON postings(id)")
+    n, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(length), 0) FROM docs").fetchone()
+    self._n_docs = int(n)
+    self._total_len = int(total)
+    self._io = BoundedExecutor(1, 64, kind="thread", name="rag-lexical")
+
+  @classmethod
+  def from_settings(cls, settings: RagSettings) -> "LexicalIndex":
+    """`LEXICAL_INDEX_PATH/<컬렉션>.sqlite3` 경로로 생성."""
+    return cls(Path(settings.lexical_index_path).expanduser() / f"{settings.chroma_collection}.sqlite3")
+
+  def __len__(self) -> int:
+    return self._n_docs
+
+  def upsert(self, ids: List[str], documents: Iterable[str]) -> None:
+    """문서 색인(같은 id는 기존 포스팅을 지우고 다시 색인)."""
+    rows = list(zip(ids, documents))
+    with self._lock:
+      self._conn.execute("BEGIN")
+      try:
+        self._delete_locked([doc_id for doc_id, _ in rows])
+        for doc_id, doc in rows:
+          counts = Counter(tokenize(doc or ""))
+          length = sum(counts.values())
+          self._conn.execute("INSERT INTO docs(id, length) VALUES (?, ?)", (doc_id, length))
+          self._conn.executemany(
+            "INSERT INTO postings(term, id, tf) VALUES (?, ?, ?)",
+            [(term, doc_id, tf) for term, tf in counts.items()],
+          )
+          self._n_docs += 1
+          self._total_len += length
+        self._conn.execute("COMMIT")
+      except Exception:
+        self._conn.execute("ROLLBACK")
+        self._reload_stats()
+        raise
+
+  def delete(self, ids: List[str]) -> None:
+    """문서 색인 제거."""
+    with self._lock:
+      self._conn.execute("BEGIN")
+      self._delete_locked(ids)
+      self._conn.execute("COMMIT")
+
+  def _delete_locked(self, ids: List[str]) -> None:
+    for doc_id in dict.fromkeys(ids):
+      row = self._conn.execute("SELECT length FROM docs WHERE id = ?", (doc_id,)).fetchone()
+      if row is None:
+        continue
+      self._conn.execute("DELETE FROM postings WHERE id = ?", (doc_id,))
+      self._conn.execute("DELETE FROM docs WHERE id = ?", (doc_id,))
+      self._n_docs -= 1
+      self._total_len -= int(row[0])
+
+  def _reload_stats(self) -> None:
+    n, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(length), 0) FROM docs").fetchone()
+    self._n_docs, self._total_len = int(n), int(total)
+
+  def search(self, query_text: str, top_k: int) -> List[Tuple[str, float]]:
+    """BM25 점수 내림차순 `(id, score)` 상위 `top_k`개."""
+    terms = Counter(tokenize(query_text))
+    if not terms or top_k <= 0:
+      return []
+    marks = ",".join("?" * len(terms))
+    with self._lock:
+      n_docs = self._n_docs
+      avg_len = self._total_len / n_docs if n_docs else 0.0
+      rows = self._conn.execute(
+        "SELECT p.term, p.id, p.tf, d.length FROM postings p JOIN docs d ON d.id = p.id "
+        f"WHERE p.term IN ({marks})",
+        list(terms),
+      ).fetchall()
+    if not rows or avg_len <= 0:
+      return []
+    df = Counter(term for term, _, _, _ in rows)
+    scores: Dict[str, float] = {}
+    for term, doc_id, tf, length in rows:
+      idf = math.log(1.0 + (n_docs - df[term] + 0.5) / (df[term] + 0.5))
+      norm = tf + BM25_K1 * (1.0 - BM25_B + BM25_B * length / avg_len)
+      scores[doc_id] = scores.get(doc_id, 0.0) + terms[term] * idf * tf * (BM25_K1 + 1.0) / norm
+    return sorted(scores.items(), key=lambda kv: kv[1], reverse=True)[:top_k]
+
+  async def aupsert(self, ids: List[str], documents: Iterable[str]) -> None:
+    """`upsert`의 비동기 버전(전용 스레드에서 실행)."""
+    await self._io.run(self.upsert, ids, list(documents))
+
+  async def asearch(self, query_text: str, top_k: int) -> List[Tuple[str, float]]:
+    """`search`의 비동기 버전(전용 스레드에서 실행)."""
+    return await self._io.run(self.search, query_text, top_k)
+
+  def stats(self) -> Dict[str, Any]:
+    return {"documents": self._n_docs, "avg_length": self._total_len / self._n_docs if self._n_docs else 0.0}
+
+  def close(self) -> None:
+    self._io.shutdown()
+    with self._lock:
+      self._conn.close()
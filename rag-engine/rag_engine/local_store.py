@@ -0,0 +1,615 @@
+"""Local NumPy/mmap vector index.
+
+Chroma 서버 없이 동작하는 로컬 벡터 스토어입니다.
+
+- 벡터: `vectors.f32` 파일에 float32 행을 append-only로 기록하고 `np.memmap`으로 조회
+- 사이드카: `index.sqlite3`에 행 번호 ↔ id/문서/메타데이터 저장
+- 검색: 블록 단위 행렬곱으로 제곱 L2 거리(Chroma 기본값과 동일)를 계산하고
+  `argpartition`으로 정확한 Top-K 선택
+- 갱신: 같은 id 업서트 시 기존 행은 삭제 표시(tombstone), 비율이 임계값을 넘으면 압축
+- 양자화(선택): `LOCAL_STORE_QUANTIZATION=int8|binary`면 `codes.i8`(+`scales.f32`) 또는
+  `codes.bits`를 함께 유지하고, 코드로 `k × LOCAL_STORE_RESCORE_FACTOR`개 후보를 고른 뒤
+  float32 원본으로 재채점. 코드 파일이 없거나 짧으면 시작 시 float32에서 채움
+"""
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List
+import json
+import logging
+import os
+import sqlite3
+import threading
+
+import numpy as np
+
+from .config import RagSettings
+from .executor import BoundedExecutor
+from .quantization import QUANTIZATION_MODES, approx_distances, pack_bits, quantize_int8
+from .vector_store import DEFAULT_INCLUDE, Embeddings
+
+LOGGER = logging.getLogger(__name__)
+
+# 한 번에 행렬곱할 최대 행 수(메모리 상한)
+_QUERY_BLOCK_ROWS = 65536
+
+_COMPARE_OPS = {"$eq": "=", "$ne": "!=", "$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+
+
+def _where_sql(where: Dict[str, Any]) -> tuple[str, List[Any]]:
+  """Chroma `where` 메타데이터 필터 → SQLite 조건식(`json_extract`) 변환.
+
+  지원: 필드 동등(`{"k": v}`), `$eq/$ne/$gt/$gte/$lt/$lte/$in/$nin`, `$and/$or`.
+  """
+  parts: List[str] = []
+  params: List[Any] = []
+  for key, cond in where.items():
+    if key in ("$and", "$or"):
+      subs = [_where_sql(c) for c in cond]
+      joiner = " AND " if key == "$and" else " OR "
+      parts.append("(" + joiner.join(sql for sql, _ in subs) + ")" if subs else "1")
+      for _, p in subs:
+        params.extend(p)
+      continue
+    path = f'$."{key}"'
+    ops = cond if isinstance(cond, dict) else {"$eq": cond}
+    for op, value in ops.items():
+      if op in _COMPARE_OPS:
+        parts.append(f"json_extract(metadata, ?) {_COMPARE_OPS[op]} ?")
+        params.extend([path, value])
+      elif op in ("$in", "$nin"):
+        if not value:
+          parts.append("0" if op == "$in" else "1")
+          continue
+        negate = "NOT " if op == "$nin" else ""
+        parts.append(f"json_extract(metadata, ?) {negate}IN ({','.join('?' * len(value))})")
+        params.extend([path, *value])
+      else:
+        raise ValueError(f"Unsupported where operator: {op}")
+  return " AND ".join(parts) or "1", params
+
+
+def _where_document_sql(where_document: Dict[str, Any]) -> tuple[str, List[Any]]:
+  """Chroma `where_document` 필터 → SQLite 조건식 변환(`$contains/$not_contains`, `$and/$or`)."""
+  parts: List[str] = []
+  params: List[Any] = []
+  for op, value in where_document.items():
+    if op in ("$and", "$or"):
+      subs = [_where_document_sql(c) for c in value]
+      joiner = " AND " if op == "$and" else " OR "
+      parts.append("(" + joiner.join(sql for sql, _ in subs) + ")" if subs else "1")
+      for _, p in subs:
+        params.extend(p)
+    elif op == "$contains":
+      parts.append("instr(document, ?) > 0")
+      params.append(value)
+    elif op == "$not_contains":
+      parts.append("instr(document, ?) = 0")
+      params.append(value)
+    else:
+      raise ValueError(f"Unsupported where_document operator: {op}")
+  return " AND ".join(parts) or "1", params
+
+
+class LocalVectorStore:
+  """memmap 기반 정확 Top-K 벡터 스토어(`ChromaVectorStore`와 동일 인터페이스)."""
+
+  def __init__(self, settings: RagSettings) -> None:
+    """설정 주입(파일 열기는 첫 사용 시 `connect()`에서 수행)."""
+    self.settings = settings
+    self.path = Path(settings.local_store_path).expanduser() / settings.chroma_collection
+    self.compact_ratio = settings.local_store_compact_ratio
+    if settings.local_store_quantization not in QUANTIZATION_MODES:
+      raise ValueError(f"LOCAL_STORE_QUANTIZATION must be one of {QUANTIZATION_MODES}")
+    self.quantization = settings.local_store_quantization
+    self.rescore_factor = max(1, settings.local_store_rescore_factor)
+    self._lock = threading.RLock()
+    self._conn: sqlite3.Connection | None = None
+    self._dim: int | None = None
+    self._vectors: np.ndarray | None = None
+    self._sq_norms = np.zeros(0, dtype=np.float32)
+    self._alive = np.zeros(0, dtype=bool)
+    self._row_of: Dict[str, int] = {}
+    self._codes: np.ndarray | None = None
+    self._scales = np.zeros(0, dtype=np.float32)
+    self._io = BoundedExecutor(settings.chroma_workers, settings.chroma_workers * 4, kind="thread", name="rag-local")
+
+  @property
+  def _vectors_path(self) -> Path:
+    return self.path / "vectors.f32"
+
+  @property
+  def _codes_path(self) -> Path:
+    return self.path / ("codes.i8" if self.quantization == "int8" else "codes.bits")
+
+  @property
+  def _scales_path(self) -> Path:
+    return self.path / "scales.f32"
+
+  @property
+  def _code_width(self) -> int:
+    """코드 1행 바이트 수."""
+    assert self._dim is not None
+    return self._dim if self.quantization == "int8" else (self._dim + 7) // 8
+
+  @property
+  def count(self) -> int:
+    """살아있는(삭제되지 않은) 벡터 수."""
+    self.connect()
+    return len(self._row_of)
+
+  def connect(self) -> None:
+    """사이드카/벡터 파일을 열고 인메모리 인덱스(id→행, 노름, 생존 마스크) 구성."""
+    with self._lock:
+      if self._conn is not None:
+        return
+      self.path.mkdir(parents=True, exist_ok=True)
+      conn = sqlite3.connect(str(self.path / "index.sqlite3"), check_same_thread=False, isolation_level=None)
+      conn.execute("PRAGMA journal_mode=WAL")
+      conn.execute(
+        "CREATE TABLE IF NOT EXISTS rows ("
+        "row INTEGER PRIMARY KEY, id TEXT NOT NULL, document TEXT, metadata TEXT, deleted INTEGER NOT NULL DEFAULT 0)"
+      )
+      conn.execute("CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value TEXT)")
+      self._conn = conn
+      self._finish_compact()
+      dim_row = conn.execute("SELECT value FROM info WHERE key = 'dim'").fetchone()
+      self._dim = int(dim_row[0]) if dim_row else None
+      total = conn.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM rows").fetchone()[0]
+      self._alive = np.zeros(total, dtype=bool)
+      self._row_of = {}
+      for row, doc_id in conn.execute("SELECT row, id FROM rows WHERE deleted = 0"):
+        self._alive[row] = True
+        self._row_of[doc_id] = row
+      # 사이드카 커밋 전에 중단되어 남은 꼬리 벡터는 잘라낸다
+      if self._dim is not None and self._vectors_path.exists():
+        expected = total * self._dim * 4
+        if self._vectors_path.stat().st_size > expected:
+          os.truncate(self._vectors_path, expected)
+      self._remap(total)
+      if self._vectors is not None and len(self._vectors):
+        self._sq_norms = np.einsum("ij,ij->i", self._vectors, self._vectors)
+      self._sync_codes(total)
+
+  def _finish_compact(self) -> None:
+    """중단된 `compact()` 정리: 사이드카 커밋 후였으면 벡터 파일 교체를 마치고, 전이었으면 임시 파일 삭제."""
+    assert self._conn is not None
+    tmp = self._vectors_path.with_suffix(".f32.tmp")
+    if self._conn.execute("SELECT 1 FROM info WHERE key = 'compact_pending'").fetchone():
+      if tmp.exists():
+        os.replace(tmp, self._vectors_path)
+      self._drop_codes()
+      self._conn.execute("DELETE FROM info WHERE key = 'compact_pending'")
+    elif tmp.exists():
+      tmp.unlink()
+
+  def _remap(self, total: int) -> None:
+    """벡터 파일을 `(total, dim)` 읽기 전용 memmap으로 다시 연다."""
+    if self._dim is None or total == 0 or not self._vectors_path.exists():
+      self._vectors = None
+      return
+    self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(total, self._dim))
+
+  def _sync_codes(self, total: int) -> None:
+    """양자화 코드 파일을 벡터 파일과 같은 행 수로 맞춘 뒤 다시 연다.
+
+    남는 꼬리(사이드카 커밋 전 중단)는 잘라내고, 모자란 행(양자화를 새로 켬,
+    압축 직후)은 float32 원본에서 블록 단위로 만들어 덧붙인다.
+    """
+    self._codes = None
+    self._scales = np.zeros(0, dtype=np.float32)
+    if self.quantization == "none" or self._dim is None:
+      return
+    width = self._code_width
+    have = self._codes_path.stat().st_size // width if self._codes_path.exists() else 0
+    if self.quantization == "int8":
+      have = min(have, self._scales_path.stat().st_size // 4 if self._scales_path.exists() else 0)
+    have = min(have, total)
+    self._truncate_codes(have)
+    if have < total and self._vectors is not None:
+      LOGGER.info("Building %s codes for %d local index rows", self.quantization, total - have)
+      for begin in range(have, total, _QUERY_BLOCK_ROWS):
+        self._append_codes(np.ascontiguousarray(self._vectors[begin:min(begin + _QUERY_BLOCK_ROWS, total)]))
+    self._remap_codes(total)
+
+  def _truncate_codes(self, rows: int) -> None:
+    self._codes_path.touch()
+    os.truncate(self._codes_path, rows * self._code_width)
+    if self.quantization == "int8":
+      self._scales_path.touch()
+      os.truncate(self._scales_path, rows * 4)
+
+  def _append_codes(self, vecs: np.ndarray) -> None:
+    """float32 행을 양자화해 코드 파일 끝에 추가."""
+    if self.quantization == "int8":
+      codes, scales = quantize_int8(vecs)
+      with open(self._scales_path, "ab") as f:
+        f.write(scales.tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    else:
+      codes = pack_bits(vecs)
+    with open(self._codes_path, "ab") as f:
+      f.write(codes.tobytes())
+      f.flush()
+      os.fsync(f.fileno())
+
+  def _remap_codes(self, total: int) -> None:
+    """코드 파일을 `(total, width)` 읽기 전용 memmap으로 다시 연다(스케일은 메모리에 적재)."""
+    if self.quantization == "none" or self._dim is None or total == 0 or not self._codes_path.exists():
+      self._codes = None
+      self._scales = np.zeros(0, dtype=np.float32)
+      return
+    dtype = np.int8 if self.quantization == "int8" else np.uint8
+    self._codes = np.memmap(self._codes_path, dtype=dtype, mode="r", shape=(total, self._code_width))
+    if self.quantization == "int8":
+      self._scales = np.fromfile(self._scales_path, dtype=np.float32, count=total)
+
+  def _drop_codes(self) -> None:
+    """모든 양자화 코드 파일 삭제(현재 꺼진 모드의 파일 포함). 다음 `_sync_codes`에서 다시 만든다."""
+    self._codes = None
+    self._scales = np.zeros(0, dtype=np.float32)
+    for path in (self.path / "codes.i8", self.path / "codes.bits", self._scales_path):
+      if path.exists():
+        path.unlink()
+
+  def _reset(self, dim: int) -> None:
+    """모든 데이터 삭제 후 새 차원으로 초기화(락 보유 상태에서 호출)."""
+    assert self._conn is not None
+    self._vectors = None
+    self._drop_codes()
+    if self._vectors_path.exists():
+      self._vectors_path.unlink()
+    self._conn.execute("DELETE FROM rows")
+    self._conn.execute("INSERT OR REPLACE INTO info(key, value) VALUES ('dim', ?)", (str(dim),))
+    self._dim = dim
+    self._alive = np.zeros(0, dtype=bool)
+    self._sq_norms = np.zeros(0, dtype=np.float32)
+    self._row_of = {}
+
+  def upsert(self, ids: List[str], embeddings: Embeddings, documents: Iterable[str], metadatas: Iterable[Dict[str, Any]] | None = None) -> None:
+    """벡터/문서/메타데이터 업서트(append-only).
+
+    - 기존 id는 삭제 표시 후 새 행으로 추가
+    - 차원 불일치 시 Chroma 어댑터와 동일하게 인덱스를 비우고 새 차원으로 재생성
+    """
+    vecs = np.ascontiguousarray(embeddings, dtype=np.float32)
+    if vecs.ndim != 2 or len(vecs) != len(ids):
+      raise ValueError("embeddings must be a (len(ids), dim) matrix")
+    if not len(ids):
+      return
+    docs = list(documents)
+    metas = list(metadatas) if metadatas is not None else [None] * len(ids)
+    self.connect()
+    with self._lock:
+      assert self._conn is not None
+      if self._dim != vecs.shape[1]:
+        if self._dim is not None and len(self._alive):
+          LOGGER.warning("Embedding dimension changed (%s -> %s); resetting local index.", self._dim, vecs.shape[1])
+        self._reset(int(vecs.shape[1]))
+      start = len(self._alive)
+      rows = list(range(start, start + len(ids)))
+      replaced = [self._row_of[i] for i in ids if i in self._row_of]
+      with open(self._vectors_path, "ab") as f:
+        f.write(vecs.tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+      if self.quantization != "none":
+        self._append_codes(vecs)
+      alive = np.ones(len(ids), dtype=bool)
+      # 같은 배치 안에서 중복된 id는 마지막 행만 유지
+      seen: Dict[str, int] = {}
+      for offset, doc_id in enumerate(ids):
+        if doc_id in seen:
+          alive[seen[doc_id]] = False
+        seen[doc_id] = offset
+      self._conn.execute("BEGIN")
+      if replaced:
+        self._conn.executemany("UPDATE rows SET deleted = 1 WHERE row = ?", [(r,) for r in replaced])
+      self._conn.executemany(
+        "INSERT INTO rows(row, id, document, metadata, deleted) VALUES (?, ?, ?, ?, ?)",
+        [
+          (r, doc_id, doc, json.dumps(meta, ensure_ascii=False) if meta is not None else None, int(not live))
+          for r, doc_id, doc, meta, live in zip(rows, ids, docs, metas, alive.tolist())
+        ],
+      )
+      self._conn.execute("COMMIT")
+      self._alive = np.concatenate([self._alive, alive])
+      if replaced:
+        self._alive[replaced] = False
+      for doc_id, offset in seen.items():
+        self._row_of[doc_id] = start + offset
+      self._sq_norms = np.concatenate([self._sq_norms, np.einsum("ij,ij->i", vecs, vecs)])
+      self._remap(len(self._alive))
+      self._remap_codes(len(self._alive))
+      dead = len(self._alive) - len(self._row_of)
+      if dead and dead >= self.compact_ratio * len(self._alive):
+        self.compact()
+
+  def compact(self) -> None:
+    """삭제 표시된 행을 제거하고 벡터 파일/사이드카를 다시 작성."""
+    self.connect()
+    with self._lock:
+      assert self._conn is not None
+      if self._vectors is None:
+        return
+      keep = np.flatnonzero(self._alive)
+      tmp = self._vectors_path.with_suffix(".f32.tmp")
+      with open(tmp, "wb") as f:
+        for begin in range(0, len(keep), _QUERY_BLOCK_ROWS):
+          f.write(np.ascontiguousarray(self._vectors[keep[begin:begin + _QUERY_BLOCK_ROWS]]).tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+      self._vectors = None
+      # 행 번호가 바뀌므로 코드는 먼저 지운다(중단되어도 길이만 맞는 옛 코드가 남지 않고
+      # 다음 `connect()`에서 다시 만든다)
+      self._drop_codes()
+      # 행 재배치와 `compact_pending` 표시를 한 트랜잭션으로 커밋한 뒤 벡터 파일을 교체.
+      # 그 사이에 중단되면 `connect()`가 남은 임시 파일로 교체를 마친다
+      self._conn.execute("BEGIN")
+      self._conn.execute("INSERT OR REPLACE INTO info(key, value) VALUES ('compact_pending', '1')")
+      self._conn.execute("DELETE FROM rows WHERE deleted = 1")
+      self._conn.execute("CREATE TEMP TABLE remap (old INTEGER PRIMARY KEY, new INTEGER)")
+      self._conn.executemany("INSERT INTO remap(old, new) VALUES (?, ?)", [(int(o), n) for n, o in enumerate(keep)])
+      # 행 번호를 음수로 옮겼다가 되돌려 PRIMARY KEY 충돌 방지
+      self._conn.execute("UPDATE rows SET row = -1 - (SELECT new FROM remap WHERE old = rows.row)")
+      self._conn.execute("UPDATE rows SET row = -1 - row")
+      self._conn.execute("DROP TABLE remap")
+      self._conn.execute("COMMIT")
+      os.replace(tmp, self._vectors_path)
+      self._conn.execute("DELETE FROM info WHERE key = 'compact_pending'")
+      new_of = {int(o): n for n, o in enumerate(keep)}
+      self._row_of = {doc_id: new_of[r] for doc_id, r in self._row_of.items()}
+      self._sq_norms = self._sq_norms[keep]
+      self._alive = np.ones(len(keep), dtype=bool)
+      self._remap(len(keep))
+      self._sync_codes(len(keep))
+      LOGGER.info("Compacted local index: %d live rows", len(keep))
+
+  def _top_k(self, queries: np.ndarray, k: int, mask: np.ndarray | None = None) -> tuple[np.ndarray, np.ndarray]:
+    """쿼리별 Top-K (행 번호, 제곱 L2 거리).
+
+    `mask`가 있으면 살아있는 행 대신 마스크가 True인 행만 후보로 사용.
+    양자화가 켜져 있으면 코드로 후보를 고른 뒤 float32로 재채점.
+    """
+    vectors, sq_norms = self._vectors, self._sq_norms
+    alive = self._alive if mask is None else mask
+    n_q = len(queries)
+    if vectors is None or k <= 0:
+      return np.zeros((n_q, 0), dtype=np.int64), np.zeros((n_q, 0), dtype=np.float32)
+    q_norms = np.einsum("ij,ij->i", queries, queries)[:, None]
+    codes, scales = self._codes, self._scales
+
+    def exact(b: int, e: int) -> np.ndarray:
+      return q_norms + sq_norms[b:e][None, :] - 2.0 * (queries @ vectors[b:e].T)
+
+    if codes is None or len(codes) != len(vectors):
+      return self._scan(len(vectors), k, alive, exact)
+    mode = self.quantization
+    q_bits = pack_bits(queries) if mode == "binary" else None
+
+    def approx(b: int, e: int) -> np.ndarray:
+      block_scales = scales[b:e] if mode == "int8" else None
+      return approx_distances(mode, queries, codes[b:e], block_scales, sq_norms[b:e], q_norms=q_norms, query_bits=q_bits)
+
+    cand, cand_dist = self._scan(len(vectors), min(len(vectors), k * self.rescore_factor), alive, approx)
+    # 후보 행만 float32로 읽어(정렬된 고유 행 순서) 정확한 거리로 재채점
+    uniq, inverse = np.unique(cand, return_inverse=True)
+    dots = queries @ np.asarray(vectors[uniq]).T
+    rescored = q_norms + sq_norms[cand] - 2.0 * np.take_along_axis(dots, inverse.reshape(cand.shape), axis=1)
+    rescored[~np.isfinite(cand_dist)] = np.inf
+    kk = min(k, cand.shape[1])
+    sel = np.argpartition(rescored, kk - 1, axis=1)[:, :kk]
+    rows = np.take_along_axis(cand, sel, axis=1)
+    dists = np.take_along_axis(rescored, sel, axis=1)
+    order = np.argsort(dists, axis=1, kind="stable")
+    return np.take_along_axis(rows, order, axis=1), np.take_along_axis(dists, order, axis=1)
+
+  @staticmethod
+  def _scan(n_rows: int, k: int, alive: np.ndarray, score: Callable[[int, int], np.ndarray]) -> tuple[np.ndarray, np.ndarray]:
+    """블록별 `score(begin, end)` 거리 + argpartition으로 쿼리별 Top-K (행 번호, 거리)."""
+    best_rows: np.ndarray | None = None
+    best_dist: np.ndarray | None = None
+    for begin in range(0, n_rows, _QUERY_BLOCK_ROWS):
+      end = min(begin + _QUERY_BLOCK_ROWS, n_rows)
+      dist = score(begin, end)
+      dist[:, ~alive[begin:end]] = np.inf
+      kk = min(k, end - begin)
+      part = np.argpartition(dist, kk - 1, axis=1)[:, :kk]
+      rows = part + begin
+      dists = np.take_along_axis(dist, part, axis=1)
+      if best_rows is not None:
+        rows = np.concatenate([best_rows, rows], axis=1)
+        dists = np.concatenate([best_dist, dists], axis=1)
+      if rows.shape[1] > k:
+        sel = np.argpartition(dists, k - 1, axis=1)[:, :k]
+        rows = np.take_along_axis(rows, sel, axis=1)
+        dists = np.take_along_axis(dists, sel, axis=1)
+      best_rows, best_dist = rows, dists
+    assert best_rows is not None and best_dist is not None
+    order = np.argsort(best_dist, axis=1, kind="stable")
+    return np.take_along_axis(best_rows, order, axis=1), np.take_along_axis(best_dist, order, axis=1)
+
+  def query(
+    self,
+    query_embeddings: Embeddings,
+    top_k: int,
+    include: List[str] | None = None,
+    where: Dict[str, Any] | None = None,
+    where_document: Dict[str, Any] | None = None,
+  ) -> Dict[str, Any]:
+    """Top-K 유사도 검색 결과 반환(Chroma `query`와 같은 형태).
+
+    - `include`: documents/metadatas/distances/embeddings 중 반환할 필드
+      (기본: embeddings 제외 전부). 제외된 필드는 None
+    - `where`/`where_document`: Chroma 형식 필터. 사이드카에서 조건에 맞는 행만
+      골라 그 행들 안에서 Top-K를 계산(사후 필터링이 아님)
+    """
+    include = list(include) if include is not None else list(DEFAULT_INCLUDE)
+    self.connect()
+    queries = np.ascontiguousarray(query_embeddings, dtype=np.float32)
+    with self._lock:
+      assert self._conn is not None
+      mask = self._filter_mask(where, where_document)
+      k = min(top_k, len(self._row_of) if mask is None else int(mask.sum()))
+      rows, dists = self._top_k(queries, k, mask)
+      ids: List[List[str]] = []
+      documents: List[List[str | None]] = []
+      metadatas: List[List[Dict[str, Any] | None]] = []
+      distances: List[List[float]] = []
+      embeddings: List[np.ndarray] = []
+      for row_ids, row_dists in zip(rows.tolist(), dists.tolist()):
+        hits = [(r, d) for r, d in zip(row_ids, row_dists) if d != float("inf")]
+        by_row = self._fetch_rows([r for r, _ in hits], with_documents="documents" in include)
+        ids.append([by_row[r][0] for r, _ in hits])
+        documents.append([by_row[r][1] for r, _ in hits])
+        metadatas.append([by_row[r][2] for r, _ in hits])
+        distances.append([max(d, 0.0) for _, d in hits])
+        if "embeddings" in include:
+          if self._vectors is not None and hits:
+            embeddings.append(np.array(self._vectors[[r for r, _ in hits]]))
+          else:
+            embeddings.append(np.zeros((0, self._dim or 0), dtype=np.float32))
+    return {
+      "ids": ids,
+      "documents": documents if "documents" in include else None,
+      "metadatas": metadatas if "metadatas" in include else None,
+      "distances": distances if "distances" in include else None,
+      "embeddings": embeddings if "embeddings" in include else None,
+    }
+
+  def live_vectors(self, limit: int | None = None, seed: int = 0) -> np.ndarray:
+    """살아있는 행의 float32 벡터(`limit`이 있으면 무작위 표본), 양자화 리포트용."""
+    self.connect()
+    with self._lock:
+      rows = np.flatnonzero(self._alive)
+      if self._vectors is None or not len(rows):
+        return np.zeros((0, self._dim or 0), dtype=np.float32)
+      if limit is not None and len(rows) > limit:
+        rows = np.sort(np.random.default_rng(seed).choice(rows, size=limit, replace=False))
+      return np.array(self._vectors[rows], dtype=np.float32)
+
+  def update_metadata(self, ids: List[str], metadatas: List[Dict[str, Any]]) -> None:
+    """기존 항목 메타데이터에 키 단위로 병합(벡터/문서는 유지, 없는 id는 무시)."""
+    self.connect()
+    with self._lock:
+      assert self._conn is not None
+      self._conn.execute("BEGIN")
+      for doc_id, patch in zip(ids, metadatas):
+        row = self._row_of.get(doc_id)
+        if row is None:
+          continue
+        cur = self._conn.execute("SELECT metadata FROM rows WHERE row = ?", (row,)).fetchone()
+        merged = {**(json.loads(cur[0]) if cur and cur[0] else {}), **patch}
+        self._conn.execute("UPDATE rows SET metadata = ? WHERE row = ?", (json.dumps(merged, ensure_ascii=False), row))
+      self._conn.execute("COMMIT")
+
+  def get(
+    self,
+    ids: List[str] | None = None,
+    where: Dict[str, Any] | None = None,
+    where_document: Dict[str, Any] | None = None,
+    include: List[str] | None = None,
+  ) -> Dict[str, Any]:
+    """id 목록 또는 Chroma 형식 메타데이터/본문 필터로 항목 조회(Chroma `get`과 같은 형태).
+
+    `include`에 `embeddings`가 있으면 float32 벡터(`(n, dim)`)도 반환합니다.
+    """
+    embeddings = include is not None and "embeddings" in include
+    self.connect()
+    with self._lock:
+      assert self._conn is not None
+      sql = "SELECT id, document, metadata, row FROM rows WHERE deleted = 0"
+      params: List[Any] = []
+      if ids is not None:
+        if not ids:
+          return {"ids": [], "documents": [], "metadatas": [], **({"embeddings": []} if embeddings else {})}
+        sql += f" AND id IN ({','.join('?' * len(ids))})"
+        params.extend(ids)
+      if where:
+        clause, args = _where_sql(where)
+        sql += f" AND {clause}"
+        params.extend(args)
+      if where_document:
+        clause, args = _where_document_sql(where_document)
+        sql += f" AND {clause}"
+        params.extend(args)
+      rows = self._conn.execute(sql + " ORDER BY row", params).fetchall()
+      out: Dict[str, Any] = {
+        "ids": [r[0] for r in rows],
+        "documents": [r[1] for r in rows],
+        "metadatas": [json.loads(r[2]) if r[2] is not None else None for r in rows],
+      }
+      if embeddings:
+        out["embeddings"] = self._row_vectors([r[3] for r in rows])
+    return out
+
+  def _filter_mask(self, where: Dict[str, Any] | None, where_document: Dict[str, Any] | None) -> np.ndarray | None:
+    """필터에 맞는 살아있는 행의 불리언 마스크(필터가 없으면 None)."""
+    if not where and not where_document:
+      return None
+    assert self._conn is not None
+    sql = "SELECT row FROM rows WHERE deleted = 0"
+    params: List[Any] = []
+    for clause, args in (_where_sql(where or {}), _where_document_sql(where_document or {})):
+      sql += f" AND {clause}"
+      params.extend(args)
+    mask = np.zeros(len(self._alive), dtype=bool)
+    rows = [r for (r,) in self._conn.execute(sql, params) if r < len(mask)]
+    mask[rows] = True
+    return mask & self._alive
+
+  def _row_vectors(self, rows: List[int]) -> np.ndarray:
+    """행 번호 → `(len(rows), dim)` float32 벡터(락을 잡은 상태에서 호출)."""
+    if self._vectors is None or not rows:
+      return np.zeros((len(rows), self._dim or 0), dtype=np.float32)
+    return np.array(self._vectors[rows], dtype=np.float32)
+
+  def _fetch_rows(self, rows: List[int], with_documents: bool = True) -> Dict[int, tuple]:
+    """행 번호 → (id, 문서, 메타데이터) 조회(`with_documents=False`면 문서는 읽지 않고 None)."""
+    if not rows:
+      return {}
+    assert self._conn is not None
+    marks = ",".join("?" * len(rows))
+    doc_col = "document" if with_documents else "NULL"
+    out: Dict[int, tuple] = {}
+    for row, doc_id, doc, meta in self._conn.execute(
+      f"SELECT row, id, {doc_col}, metadata FROM rows WHERE row IN ({marks})", rows
+    ):
+      out[row] = (doc_id, doc, json.loads(meta) if meta is not None else None)
+    return out
+
+  async def aupsert(self, ids: List[str], embeddings: Embeddings, documents: Iterable[str], metadatas: Iterable[Dict[str, Any]] | None = None) -> None:
+    """`upsert`의 비동기 버전(스레드 풀에서 실행)."""
+    docs = list(documents)
+    metas = list(metadatas) if metadatas is not None else None
+    await self._io.run(self.upsert, ids, embeddings, docs, metas)
+
+  async def aget(
+    self,
+    ids: List[str] | None = None,
+    where: Dict[str, Any] | None = None,
+    where_document: Dict[str, Any] | None = None,
+    include: List[str] | None = None,
+  ) -> Dict[str, Any]:
+    """`get`의 비동기 버전(스레드 풀에서 실행)."""
+    return await self._io.run(self.get, ids, where, where_document, include)
+
+  async def aquery(
+    self,
+    query_embeddings: Embeddings,
+    top_k: int,
+    include: List[str] | None = None,
+    where: Dict[str, Any] | None = None,
+    where_document: Dict[str, Any] | None = None,
+  ) -> Dict[str, Any]:
+    """`query`의 비동기 버전(스레드 풀에서 실행)."""
+    return await self._io.run(self.query, query_embeddings, top_k, include, where, where_document)
+
+  async def aupdate_metadata(self, ids: List[str], metadatas: List[Dict[str, Any]]) -> None:
+    """`update_metadata`의 비동기 버전(스레드 풀에서 실행)."""
+    await self._io.run(self.update_metadata, ids, metadatas)
+
+  def close(self) -> None:
+    """스레드 풀 종료(인덱스 파일은 열어 둠)."""
+    self._io.shutdown()
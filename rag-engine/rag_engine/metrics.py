@@ -0,0 +1,187 @@
+"""In-process metrics and Prometheus exposition.
+
+외부 의존성 없이 카운터/히스토그램을 프로세스 전역 레지스트리(`METRICS`)에 모으고
+`GET /metrics`에서 Prometheus 텍스트 형식(0.0.4)으로 내보냅니다.
+
+- 단계별 소요 시간: `METRICS.stage(op, stage)` 컨텍스트 매니저 →
+  `rag_stage_duration_seconds{op, stage}` 히스토그램
+- 요청별 타이밍: `start_request_timings()`로 수집을 켠 요청 안에서는 같은 단계 시간이
+  요청 로컬 dict에도 기록되어 `Server-Timing` 헤더로 반환 가능
+- 기록 비용은 락 1회 + `bisect` 1회 수준(핫 경로에서 무시 가능)
+"""
+from __future__ import annotations
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+import bisect
+import threading
+import time
+
+# 단계 소요 시간(초) 히스토그램 상한 경계
+STAGE_SECONDS_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# 인제스트/업서트 배치 크기(행 수) 히스토그램 상한 경계
+ROW_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 2048, 4096)
+
+# 레지스트리에 기록되는 메트릭 설명(TYPE, HELP)
+_DESCRIPTIONS = {
+  "rag_stage_duration_seconds": ("histogram", "Time spent per pipeline stage"),
+  "rag_preprocess_total": ("counter", "Preprocess calls by path (openrouter, packed, cache, heuristic, fallback, circuit_open)"),
+  "rag_preprocess_pack_size": ("histogram", "Conversations per packed OpenRouter call"),
+  "rag_preprocess_pack_failures_total": ("counter", "Packed conversations retried individually (call error or unparsable output)"),
+  "rag_openrouter_fallbacks_total": ("counter", "Preprocess calls that fell back to the local heuristic"),
+  "rag_openrouter_retries_total": ("counter", "OpenRouter calls retried after 429, 5xx or a transport error"),
+  "rag_chroma_retries_total": ("counter", "Chroma upsert chunks retried after recovering the collection"),
+  "rag_ingest_batch_size": ("histogram", "Conversations per ingest batch"),
+  "rag_upsert_batch_size": ("histogram", "Rows per vector store upsert"),
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+_REQUEST_TIMINGS: ContextVar[Dict[str, float] | None] = ContextVar("rag_request_timings", default=None)
+
+
+class Histogram:
+  """누적이 아닌 구간별 카운트 히스토그램(+합계/최대)."""
+
+  def __init__(self, bounds: Tuple[float, ...]) -> None:
+    self.bounds = bounds
+    self.counts = [0] * (len(bounds) + 1)
+    self.total = 0.0
+    self.count = 0
+    self.max = 0.0
+
+  def observe(self, value: float) -> None:
+    self.counts[bisect.bisect_left(self.bounds, value)] += 1
+    self.total += value
+    self.count += 1
+    if value > self.max:
+      self.max = value
+
+  def snapshot(self) -> Dict[str, Any]:
+    labels = [f"<={b:g}" for b in self.bounds] + [f">{self.bounds[-1]:g}"]
+    return {
+      "buckets": dict(zip(labels, self.counts)),
+      "count": self.count,
+      "mean": self.total / self.count if self.count else 0.0,
+      "max": self.max,
+    }
+
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+  return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(labels: Labels, extra: Tuple[str, str] | None = None) -> str:
+  pairs = list(labels) + ([extra] if extra is not None else [])
+  if not pairs:
+    return ""
+  escaped = (v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+  return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value: float) -> str:
+  return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class MetricsRegistry:
+  """스레드 안전 카운터/히스토그램 레지스트리."""
+
+  def __init__(self) -> None:
+    self._lock = threading.Lock()
+    self._counters: Dict[Tuple[str, Labels], float] = {}
+    self._histograms: Dict[Tuple[str, Labels], Histogram] = {}
+
+  def inc(self, name: str, value: float = 1.0, **labels: Any) -> None:
+    """카운터 증가."""
+    key = (name, _labels(labels))
+    with self._lock:
+      self._counters[key] = self._counters.get(key, 0.0) + value
+
+  def observe(self, name: str, value: float, buckets: Tuple[float, ...] = STAGE_SECONDS_BUCKETS, **labels: Any) -> None:
+    """히스토그램에 값 기록(첫 기록 시 `buckets` 경계로 생성)."""
+    key = (name, _labels(labels))
+    with self._lock:
+      hist = self._histograms.get(key)
+      if hist is None:
+        hist = self._histograms[key] = Histogram(buckets)
+      hist.observe(value)
+
+  @contextmanager
+  def stage(self, op: str, stage: str) -> Iterator[None]:
+    """블록 소요 시간을 `rag_stage_duration_seconds{op, stage}`(와 요청 타이밍)에 기록."""
+    started = time.perf_counter()
+    try:
+      yield
+    finally:
+      elapsed = time.perf_counter() - started
+      self.observe("rag_stage_duration_seconds", elapsed, op=op, stage=stage)
+      timings = _REQUEST_TIMINGS.get()
+      if timings is not None:
+        name = f"{op}_{stage}"
+        timings[name] = timings.get(name, 0.0) + elapsed
+
+  def reset(self) -> None:
+    with self._lock:
+      self._counters.clear()
+      self._histograms.clear()
+
+  def render(
+    self,
+    extra_counters: Iterable[Tuple[str, str, Dict[str, Any], float]] = (),
+    extra_histograms: Iterable[Tuple[str, str, Dict[str, Any], Histogram]] = (),
+  ) -> str:
+    """Prometheus 텍스트 형식 출력.
+
+    `extra_*`는 다른 구성 요소가 이미 세고 있는 값(캐시 적중 등)을
+    `(이름, 설명, 레이블, 값/히스토그램)`으로 함께 내보낼 때 사용.
+    """
+    with self._lock:
+      counters = [(name, _DESCRIPTIONS.get(name, ("counter", ""))[1], labels, value) for (name, labels), value in self._counters.items()]
+      histograms = [
+        (name, _DESCRIPTIONS.get(name, ("histogram", ""))[1], labels, (list(h.counts), h.bounds, h.total, h.count))
+        for (name, labels), h in self._histograms.items()
+      ]
+    counters += [(name, help_, _labels(labels), value) for name, help_, labels, value in extra_counters]
+    histograms += [
+      (name, help_, _labels(labels), (list(h.counts), h.bounds, h.total, h.count)) for name, help_, labels, h in extra_histograms
+    ]
+    lines: List[str] = []
+    for kind, samples in (("counter", counters), ("histogram", histograms)):
+      by_name: Dict[str, List[Any]] = {}
+      for sample in samples:
+        by_name.setdefault(sample[0], []).append(sample)
+      for name in sorted(by_name):
+        lines.append(f"# HELP {name} {by_name[name][0][1]}")
+        lines.append(f"# TYPE {name} {kind}")
+        for _, _, labels, value in sorted(by_name[name], key=lambda s: s[2]):
+          if kind == "counter":
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+            continue
+          counts, bounds, total, count = value
+          cumulative = 0
+          for bound, n in zip(bounds, counts):
+            cumulative += n
+            lines.append(f"{name}_bucket{_format_labels(labels, ('le', f'{bound:g}'))} {cumulative}")
+          lines.append(f"{name}_bucket{_format_labels(labels, ('le', '+Inf'))} {count}")
+          lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+          lines.append(f"{name}_count{_format_labels(labels)} {count}")
+    return "\n".join(lines) + "\n"
+
+
+METRICS = MetricsRegistry()
+
+
+def start_request_timings() -> Dict[str, float]:
+  """현재 컨텍스트(요청)에서 단계 시간 수집 시작. 수집 dict를 반환."""
+  timings: Dict[str, float] = {}
+  _REQUEST_TIMINGS.set(timings)
+  return timings
+
+
+def server_timing_header(timings: Dict[str, float], total: float | None = None) -> str:
+  """`{단계: 초}` → `Server-Timing` 헤더 값(ms)."""
+  parts = [f"{name};dur={seconds * 1000.0:.2f}" for name, seconds in timings.items()]
+  if total is not None:
+    parts.append(f"total;dur={total * 1000.0:.2f}")
+  return ", ".join(parts)
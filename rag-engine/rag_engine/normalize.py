@@ -0,0 +1,71 @@
+"""Offline transcript normalization.
+
+OpenRouter 키가 없을 때(오프라인 백필) 전처리 비용 전체를 차지하는 휴리스틱
+정규화와 Q/A 접두어 정리를 빠른 경로로 제공합니다. 출력은 기존 구현과 바이트 단위로 같습니다.
+
+- `normalize_transcript`: 공백 연속 축약, 줄 앞뒤 불릿/공백 제거, 빈 줄 제거
+- `ensure_qa_prefixes`: 발화마다 `Q:`/`A:` 접두어 강제(대소문자/공백 정리)
+- `normalize_conversations`: 대화 목록 일괄 처리(발화 결합 + 정규화)
+"""
+from __future__ import annotations
+
+from itertools import repeat
+from typing import Iterable, List, Sequence
+import re
+
+# 줄 앞뒤에서 제거하는 문자(공백, 하이픈/불릿, 탭)
+LINE_STRIP_CHARS = " -•\t"
+
+_SPACE_RUN = re.compile(" {2,}")
+# 이 길이 이상의 공백 연속이 있으면 `replace` 반복(연속 길이의 log2회 전체 스캔) 대신 정규식 1회
+_LONG_SPACE_RUN = " " * 16
+_QA_HEAD = re.compile(r"([QqAa])\s*:\s*")
+
+
+def normalize_transcript(text: str) -> str:
+  """휴리스틱 정규화: 연속 공백 축약, 줄 앞뒤 공백/불릿 제거, 빈 줄 제거.
+
+  짧은 공백 연속은 `str.replace` 반복이 정규식보다 빠르고, 긴 연속이 있을 때만 정규식 1회 치환.
+  """
+  text = text.replace("\r", "\n").strip()
+  if "  " in text:
+    if _LONG_SPACE_RUN in text:
+      text = _SPACE_RUN.sub(" ", text)
+    else:
+      while "  " in text:
+        text = text.replace("  ", " ")
+  # 줄별 strip/빈 줄 제거를 파이썬 루프 없이 map/filter로
+  return "\n".join(filter(None, map(str.strip, text.split("\n"), repeat(LINE_STRIP_CHARS))))
+
+
+def ensure_qa_prefixes(messages: Iterable[str]) -> List[str]:
+  """모든 발화에 Q:/A: 접두어를 강제한다.
+
+  - 이미 Q:/A:로 시작하면 접두어만 대문자 `Q: `/`A: ` 형태로 정리(이미 그 형태면 그대로)
+  - 아니면 0,2,4,... → Q:, 1,3,5,... → A: 로 자동 접두
+  - 빈 발화는 제외(자동 접두 순번은 원래 위치 기준)
+  """
+  normalized: List[str] = []
+  for idx, m in enumerate(messages):
+    text = str(m).strip()
+    if not text:
+      continue
+    if text.startswith(("Q: ", "A: ")) and not text[3:4].isspace():
+      normalized.append(text)
+      continue
+    head = _QA_HEAD.match(text)
+    if head is not None:
+      normalized.append(f"{head.group(1).upper()}: {text[head.end():]}")
+      continue
+    normalized.append(f"{'Q' if idx % 2 == 0 else 'A'}: {text}")
+  return normalized
+
+
+def join_messages(messages: Iterable[str]) -> str:
+  """발화 목록 → 빈 발화를 뺀 줄 단위 텍스트."""
+  return "\n".join(m.strip() for m in messages if m and m.strip())
+
+
+def normalize_conversations(conversations: Iterable[Iterable[str]]) -> List[str]:
+  """대화(발화 목록)들을 결합 + 정규화해 입력 순서대로 반환."""
+  return [normalize_transcript(join_messages(m)) for m in conversations]
@@ -4,7 +4,11 @@
 """
 from __future__ import annotations
 
-from typing import Iterable, Dict, Any, List
+import asyncio
+import time
+from typing import AsyncIterator, Iterable, Dict, Any, List, Sequence, Tuple
+
+import numpy as np
 try:
   from nanoid import generate as nanoid_generate  # type: ignore
 except Exception:  # pragma: no cover
@@ -14,10 +18,42 @@ except Exception:  # pragma: no cover
     alphabet = string.ascii_letters + string.digits + "-_"
     return "".join(random.choice(alphabet) for _ in range(size))
 
+from .cache import make_cache_key
+from .chunking import chunk_text, collapse_to_parents
 from .config import RagSettings
 from .preprocess import Preprocessor
 from .embedding import EmbeddingModel
-from .vector_store import ChromaVectorStore
+from .fusion import reciprocal_rank_fusion, weighted_score_fusion
+from .lexical import LexicalIndex
+from .metrics import METRICS, ROW_BUCKETS
+from .rerank import mmr_rerank, term_overlap
+from .results import include_for, to_hits
+from .vector_store import DEFAULT_INCLUDE, VectorStore, create_vector_store
+
+DEDUP_MODES = ("off", "skip", "merge", "count")
+# 중복 처리 시 병합하지 않는 구조용 메타데이터 키
+_RESERVED_META_KEYS = {"parent_id", "chunk_index", "dup_count"}
+
+
+def content_id(messages: Sequence[str]) -> str:
+  """대화 원문(공백 정리 후 줄 단위 결합)에서 결정적 문서 id 생성."""
+  joined = "\n".join(m.strip() for m in messages if m and m.strip())
+  return make_cache_key(["conversation", joined])[:32]
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+  """행 단위 L2 정규화(코사인 유사도 계산용)."""
+  return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+def _spans(counts: Sequence[int]) -> List[Tuple[int, int]]:
+  """대화별 행 개수 목록 → 평탄화된 행 배열에서의 `(start, end)` 구간."""
+  spans: List[Tuple[int, int]] = []
+  start = 0
+  for n in counts:
+    spans.append((start, start + n))
+    start += n
+  return spans
 
 
 class RagPipeline:
@@ -31,28 +67,669 @@ class RagPipeline:
     self.settings = settings or RagSettings()
     self.preprocessor = Preprocessor(self.settings)
     self.embedder = EmbeddingModel(self.settings)
-    self.store = ChromaVectorStore(self.settings)
+    self.store: VectorStore = create_vector_store(self.settings)
+    self.dedup_counts = {"checked": 0, "duplicates": 0}
+    self.rerank_counts = {"queries": 0, "budget_exceeded": 0}
+    # LEXICAL_INDEX=true면 업서트마다 BM25 역색인도 함께 갱신
+    self.lexical: LexicalIndex | None = LexicalIndex.from_settings(self.settings) if self.settings.lexical_index else None
 
   async def ingest_conversation(self, messages: Iterable[str], metadata: Dict[str, Any] | None = None) -> Dict[str, Any]:
     """대화 인제스트: 전처리→임베딩→업서트.
 
     반환: 업서트된 문서 id/텍스트/임베딩 차원 메타정보
     """
-    preprocessed = await self.preprocessor.preprocess(messages)
-    vectors = self.embedder.embed([preprocessed])
-    doc_id = nanoid_generate()
-    self.store.upsert(
-      ids=[doc_id],
-      embeddings=vectors,
-      documents=[preprocessed],
-      metadatas=[metadata or {}],
-    )
-    return {"id": doc_id, "text": preprocessed, "vector_dim": self.embedder.dimension}
+    results = await self.ingest_conversations([list(messages)], [metadata])
+    return results[0]
+
+  async def ingest_conversations(
+    self,
+    conversations: Iterable[Iterable[str]],
+    metadatas: Sequence[Dict[str, Any] | None] | None = None,
+    concurrency: int | None = None,
+    batch_size: int | None = None,
+    id_mode: str | None = None,
+  ) -> List[Dict[str, Any]]:
+    """다중 대화 일괄 인제스트.
+
+    - 전처리: 세마포어로 동시 호출 수를 `concurrency`로 제한. `PREPROCESS_PACK_SIZE` > 1이면
+      배치 안의 짧은 대화를 묶어 OpenRouter 호출 수를 줄임
+    - 임베딩/업서트: `batch_size` 단위로 묶어 워커 풀에서 한 번에 처리
+    - id: `id_mode`(기본 `INGEST_ID_MODE`)가 random이면 nanoid, content면 원문 해시
+      (같은 대화 재인제스트 시 같은 id로 덮어써 중복이 생기지 않음)
+    - 청킹(`CHUNK_MODE`≠none): 대화당 여러 벡터(`<id>#<n>`), 메타데이터에 `parent_id`/`chunk_index`
+    - 중복 제거(`DEDUP_MODE`≠off): 임베딩 후 스토어와 앞선 배치 항목에서 코사인
+      유사도 `DEDUP_THRESHOLD` 이상인 대화를 찾아 저장하지 않고, 결과에 `duplicate_of` 기록
+    - 단계별 소요 시간은 `rag_stage_duration_seconds{op="ingest"}`에 기록
+    - 결과 항목의 `preprocess_path`: 전처리 경로(openrouter/packed/cache/heuristic/fallback/circuit_open)
+    - 반환: 입력 순서와 동일한 순서의 결과 목록
+    """
+    with METRICS.stage("ingest", "total"):
+      return await self._ingest_conversations(conversations, metadatas, concurrency, batch_size, id_mode)
+
+  async def _ingest_conversations(
+    self,
+    conversations: Iterable[Iterable[str]],
+    metadatas: Sequence[Dict[str, Any] | None] | None,
+    concurrency: int | None,
+    batch_size: int | None,
+    id_mode: str | None,
+  ) -> List[Dict[str, Any]]:
+    """`ingest_conversations` 본체(전체 소요 시간 측정을 위해 분리)."""
+    convs = [list(c) for c in conversations]
+    metas = list(metadatas) if metadatas is not None else []
+    concurrency = max(1, concurrency or self.settings.ingest_concurrency)
+    batch_size = max(1, batch_size or self.settings.ingest_batch_size)
+    id_mode = (id_mode or self.settings.ingest_id_mode).lower()
+    if id_mode not in {"random", "content"}:
+      raise ValueError(f"Unknown id mode: {id_mode}")
+    dedup_mode = self.settings.dedup_mode.lower()
+    if dedup_mode not in DEDUP_MODES:
+      raise ValueError(f"Unknown dedup mode: {dedup_mode}")
+    results: List[Dict[str, Any]] = []
+    chunking = self.settings.chunk_mode != "none"
+    for start in range(0, len(convs), batch_size):
+      chunk = convs[start:start + batch_size]
+      METRICS.observe("rag_ingest_batch_size", len(chunk), ROW_BUCKETS)
+      with METRICS.stage("ingest", "preprocess"):
+        processed = await self.preprocessor.preprocess_many(chunk, concurrency)
+      texts = [text for text, _ in processed]
+      paths = [path for _, path in processed]
+      if id_mode == "content":
+        parent_ids = [content_id(m) for m in chunk]
+      else:
+        parent_ids = [nanoid_generate() for _ in texts]
+      parent_metas = [
+        (metas[start + i] if start + i < len(metas) else None) or {}
+        for i in range(len(texts))
+      ]
+      ids: List[str] = []
+      docs: List[str] = []
+      doc_metas: List[Dict[str, Any]] = []
+      chunk_counts: List[int] = []
+      for parent, text, meta in zip(parent_ids, texts, parent_metas):
+        if not chunking:
+          ids.append(parent)
+          docs.append(text)
+          doc_metas.append(meta)
+          chunk_counts.append(1)
+          continue
+        pieces = self._chunk(text)
+        chunk_counts.append(len(pieces))
+        for ci, piece in enumerate(pieces):
+          ids.append(f"{parent}#{ci}")
+          docs.append(piece)
+          doc_metas.append({**meta, "parent_id": parent, "chunk_index": ci})
+      with METRICS.stage("ingest", "embed"):
+        vectors = await self.embedder.aembed_array(docs)
+      row_parents = [p for p, n in zip(parent_ids, chunk_counts) for _ in range(n)]
+      duplicate_of: List[str | None] = [None] * len(parent_ids)
+      if dedup_mode != "off":
+        with METRICS.stage("ingest", "dedup"):
+          duplicate_of = await self._dedup(ids, row_parents, chunk_counts, vectors, doc_metas, dedup_mode)
+        dup_parents = {p for p, d in zip(parent_ids, duplicate_of) if d is not None}
+        if dup_parents:
+          rows = [i for i, p in enumerate(row_parents) if p not in dup_parents]
+          ids = [ids[i] for i in rows]
+          docs = [docs[i] for i in rows]
+          doc_metas = [doc_metas[i] for i in rows]
+          vectors = vectors[rows]
+      # 배치 안의 중복 id는 마지막 항목만 업서트
+      keep = list({doc_id: i for i, doc_id in enumerate(ids)}.values())
+      if len(keep) != len(ids):
+        ids = [ids[i] for i in keep]
+        docs = [docs[i] for i in keep]
+        doc_metas = [doc_metas[i] for i in keep]
+        vectors = vectors[keep]
+      if ids:
+        METRICS.observe("rag_upsert_batch_size", len(ids), ROW_BUCKETS)
+        with METRICS.stage("ingest", "upsert"):
+          await self.store.aupsert(ids=ids, embeddings=vectors, documents=docs, metadatas=doc_metas)
+        if self.lexical is not None:
+          with METRICS.stage("ingest", "lexical"):
+            await self.lexical.aupsert(ids, docs)
+      dim = self.embedder.dimension
+      for parent, text, path, n, dup in zip(parent_ids, texts, paths, chunk_counts, duplicate_of):
+        item: Dict[str, Any] = {"id": parent, "text": text, "vector_dim": dim, "preprocess_path": path}
+        if chunking:
+          item["chunks"] = n
+        if dedup_mode != "off":
+          item["duplicate_of"] = dup
+        results.append(item)
+    return results
+
+  async def _dedup(
+    self,
+    ids: List[str],
+    row_parents: List[str],
+    chunk_counts: List[int],
+    vectors: np.ndarray,
+    doc_metas: List[Dict[str, Any]],
+    mode: str,
+  ) -> List[str | None]:
+    """배치의 대화별 근접 중복 대상(부모 id) 탐색 및 merge/count 반영.
+
+    - 각 벡터에 대해 스토어 최근접 2개(자기 자신 제외)와 배치 앞쪽에서 저장될
+      다른 대화 벡터 중 코사인 유사도가 임계값 이상인 것을 찾음
+    - 대화의 모든 청크가 중복일 때만 대화를 중복으로 판정(청크 일부만 빠지지 않도록)
+    """
+    threshold = self.settings.dedup_threshold
+    unit = _normalize(vectors)
+    match: List[str | None] = [None] * len(ids)
+    found = await self.store.aquery(query_embeddings=vectors, top_k=2, include=["metadatas", "embeddings"])
+    for i, hit_ids in enumerate(found["ids"] or []):
+      hit_metas = (found.get("metadatas") or [None] * len(ids))[i] or [None] * len(hit_ids)
+      hit_vecs = (found.get("embeddings") or [None] * len(ids))[i]
+      if hit_vecs is None or not len(hit_ids):
+        continue
+      sims = _normalize(np.asarray(hit_vecs, dtype=np.float32)) @ unit[i]
+      for j, hit_id in enumerate(hit_ids):
+        parent = str((hit_metas[j] or {}).get("parent_id") or hit_id)
+        if hit_id != ids[i] and parent != row_parents[i] and sims[j] >= threshold:
+          match[i] = parent
+          break
+
+    duplicate_of: List[str | None] = []
+    kept_rows: List[int] = []
+    for start, end in _spans(chunk_counts):
+      parent = row_parents[start] if end > start else None
+      targets = match[start:end]
+      if kept_rows and None in targets:
+        sims = unit[start:end] @ unit[kept_rows].T
+        for k in range(end - start):
+          if targets[k] is not None:
+            continue
+          for j in np.argsort(-sims[k]):
+            if sims[k, j] < threshold:
+              break
+            other = row_parents[kept_rows[j]]
+            if other != parent:
+              targets[k] = other
+              break
+      dup = targets[0] if targets and None not in targets else None
+      duplicate_of.append(dup)
+      if dup is None:
+        kept_rows.extend(range(start, end))
+
+    self.dedup_counts["checked"] += len(duplicate_of)
+    self.dedup_counts["duplicates"] += sum(d is not None for d in duplicate_of)
+    if mode in {"merge", "count"}:
+      await self._apply_duplicates(row_parents, chunk_counts, doc_metas, duplicate_of, mode)
+    return duplicate_of
+
+  async def _apply_duplicates(
+    self,
+    row_parents: List[str],
+    chunk_counts: List[int],
+    doc_metas: List[Dict[str, Any]],
+    duplicate_of: List[str | None],
+    mode: str,
+  ) -> None:
+    """중복 대상의 메타데이터에 `dup_count`를 더하고, merge면 대상에 없는 키를 채움.
+
+    같은 배치에서 저장될 대상은 업서트 전 메타데이터를, 이미 저장된 대상은
+    스토어 메타데이터(대상 대화의 모든 청크)를 갱신합니다.
+    """
+    spans = _spans(chunk_counts)
+    sources: Dict[str, List[Dict[str, Any]]] = {}
+    for (start, end), target in zip(spans, duplicate_of):
+      if target is not None:
+        sources.setdefault(target, []).append(doc_metas[start] if end > start else {})
+
+    def _patched(meta: Dict[str, Any], srcs: List[Dict[str, Any]]) -> Dict[str, Any]:
+      out = dict(meta)
+      out["dup_count"] = int(out.get("dup_count", 0)) + len(srcs)
+      if mode == "merge":
+        for src in srcs:
+          for key, value in src.items():
+            if key not in _RESERVED_META_KEYS:
+              out.setdefault(key, value)
+      return out
+
+    kept = {row_parents[start] for (start, end), dup in zip(spans, duplicate_of) if dup is None and end > start}
+    for target, srcs in sources.items():
+      if target in kept:
+        for r, p in enumerate(row_parents):
+          if p == target:
+            doc_metas[r] = _patched(doc_metas[r], srcs)
+        continue
+      rows = await self.store.aget(where={"parent_id": target})
+      if not rows["ids"]:
+        rows = await self.store.aget(ids=[target])
+      if rows["ids"]:
+        await self.store.aupdate_metadata(rows["ids"], [_patched(m or {}, srcs) for m in rows["metadatas"]])
+
+  async def append_conversation(self, doc_id: str, messages: Iterable[str], metadata: Dict[str, Any] | None = None) -> Dict[str, Any]:
+    """기존 대화에 새 턴만 추가(새 턴만 전처리).
+
+    - 청킹 사용: 마지막 청크 + 새 텍스트를 다시 청킹해 마지막 청크를 갱신하고
+      넘치는 부분은 새 청크로 추가. 나머지 청크는 건드리지 않음
+    - 청킹 미사용: 기존 문서 텍스트 뒤에 새 텍스트를 붙여 같은 id로 재임베딩
+    - 대화가 없으면 KeyError
+    """
+    with METRICS.stage("append", "preprocess"):
+      new_text, preprocess_path = await self.preprocessor.preprocess_with_path(list(messages))
+    extra = metadata or {}
+    chunks = await self.store.aget(where={"parent_id": doc_id})
+    if chunks["ids"]:
+      last = max(range(len(chunks["ids"])), key=lambda i: (chunks["metadatas"][i] or {}).get("chunk_index", 0))
+      last_meta = dict(chunks["metadatas"][last] or {})
+      last_index = int(last_meta.get("chunk_index", 0))
+      base_meta = {k: v for k, v in last_meta.items() if k != "chunk_index"}
+      base_meta.update(extra)
+      pieces = self._chunk(f"{chunks['documents'][last]}\n{new_text}")
+      ids = [f"{doc_id}#{last_index + i}" for i in range(len(pieces))]
+      metas = [{**base_meta, "chunk_index": last_index + i} for i in range(len(pieces))]
+      updated, added = ids[:1], ids[1:]
+      if len(pieces) > 1 and pieces[0] == chunks["documents"][last]:
+        # 마지막 청크가 그대로면 새 청크만 쓴다
+        pieces, ids, metas, updated = pieces[1:], ids[1:], metas[1:], []
+    else:
+      found = await self.store.aget(ids=[doc_id])
+      if not found["ids"]:
+        raise KeyError(doc_id)
+      pieces = [f"{found['documents'][0]}\n{new_text}"]
+      ids = [doc_id]
+      metas = [{**(found["metadatas"][0] or {}), **extra}]
+      updated, added = ids, []
+    with METRICS.stage("append", "embed"):
+      vectors = await self.embedder.aembed_array(pieces)
+    METRICS.observe("rag_upsert_batch_size", len(ids), ROW_BUCKETS)
+    with METRICS.stage("append", "upsert"):
+      await self.store.aupsert(ids=ids, embeddings=vectors, documents=pieces, metadatas=metas)
+    if self.lexical is not None:
+      await self.lexical.aupsert(ids, pieces)
+    return {
+      "id": doc_id,
+      "text": new_text,
+      "vector_dim": self.embedder.dimension,
+      "updated_ids": updated,
+      "added_ids": added,
+      "preprocess_path": preprocess_path,
+    }
+
+  def _chunk(self, text: str) -> List[str]:
+    """설정된 청킹 방식으로 전처리 텍스트 분할."""
+    s = self.settings
+    return chunk_text(text, s.chunk_mode, s.chunk_max_chars, s.chunk_overlap_turns, s.chunk_overlap_chars) or [text]
+
+  def _shape_results(self, result: Dict[str, Any], top_k: int, fuse: bool, include: Sequence[str] | None = None) -> Dict[str, Any]:
+    """청크 적중을 부모 대화로 합치고(청킹 사용 시), 필요하면 쿼리 간 RRF 병합."""
+    if self.settings.chunk_mode != "none":
+      result = collapse_to_parents(result, top_k)
+    requested = include if include is not None else DEFAULT_INCLUDE
+    # 부모 합치기/하이브리드 점수/재정렬에만 쓰려고 가져온 필드는 돌려주지 않음
+    result = {**result, **{k: None for k in ("documents", "metadatas", "distances", "embeddings") if k not in requested}}
+    return reciprocal_rank_fusion(result, top_k) if fuse else result
+
+  def _store_include(self, include: Sequence[str] | None, hybrid: bool = False, rerank: bool = False) -> List[str] | None:
+    """스토어에 요청할 필드(청킹 시 메타데이터, 하이브리드 시 거리, 재정렬 시 임베딩/문서를 내부용으로 추가)."""
+    extra: List[str] = []
+    if self.settings.chunk_mode != "none":
+      extra.append("metadatas")
+    if hybrid:
+      extra.append("distances")
+    if rerank:
+      extra.extend(["embeddings", "documents"])
+    if include is None and all(k in DEFAULT_INCLUDE for k in extra):
+      return None
+    return list(dict.fromkeys([*(include if include is not None else DEFAULT_INCLUDE), *extra]))
 
-  def similarity_search(self, query_text: str, top_k: int | None = None) -> Dict[str, Any]:
-    """쿼리 텍스트 임베딩 후 Top-K 유사 문서 검색."""
+  def _fetch_k(self, top_k: int) -> int:
+    """청킹 사용 시 부모 단위 Top-K를 채우도록 청크를 더 가져올 개수."""
+    if self.settings.chunk_mode == "none":
+      return top_k
+    return top_k * max(1, self.settings.chunk_query_overfetch)
+
+  async def iter_ingest(
+    self,
+    items: Iterable[Tuple[List[str], Dict[str, Any] | None]],
+    concurrency: int | None = None,
+    batch_size: int | None = None,
+    id_mode: str | None = None,
+  ) -> AsyncIterator[Dict[str, Any]]:
+    """(메시지 목록, 메타데이터) 스트림을 상수 메모리로 인제스트.
+
+    - 입력 이터레이터는 생산자 태스크가 크기 제한 큐(`batch_size * 2`)로 밀어 넣음
+    - 소비자는 `batch_size`개씩 꺼내 `ingest_conversations`로 처리
+    - 결과는 입력 순서대로 완료되는 즉시 yield
+    """
+    batch_size = max(1, batch_size or self.settings.ingest_batch_size)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=batch_size * 2)
+
+    async def _produce() -> None:
+      try:
+        for item in items:
+          await queue.put((True, item))
+      except Exception as e:
+        await queue.put((False, e))
+        return
+      await queue.put((False, None))
+
+    producer = asyncio.create_task(_produce())
+    try:
+      error: Exception | None = None
+      finished = False
+      while not finished:
+        chunk: List[Tuple[List[str], Dict[str, Any] | None]] = []
+        while len(chunk) < batch_size:
+          ok, payload = await queue.get()
+          if not ok:
+            finished, error = True, payload
+            break
+          chunk.append(payload)
+        if chunk:
+          results = await self.ingest_conversations(
+            [msgs for msgs, _ in chunk],
+            [meta for _, meta in chunk],
+            concurrency=concurrency,
+            batch_size=batch_size,
+            id_mode=id_mode,
+          )
+          for res in results:
+            yield res
+      if error is not None:
+        raise error
+    finally:
+      if not producer.done():
+        producer.cancel()
+
+  def rebuild_lexical_index(self, batch_size: int = 1000) -> int:
+    """스토어의 전체 문서로 BM25 역색인을 다시 채움(기존 컬렉션에 역색인을 켤 때). 색인 수 반환."""
+    if self.lexical is None:
+      raise ValueError("LEXICAL_INDEX is disabled")
+    everything = self.store.get()
+    ids, docs = everything["ids"], everything.get("documents") or []
+    for start in range(0, len(ids), batch_size):
+      self.lexical.upsert(ids[start:start + batch_size], docs[start:start + batch_size])
+    return len(ids)
+
+  def warmup(self) -> Dict[str, float]:
+    """임베딩 모델 로드/더미 인코딩, Chroma 컬렉션 연결. 단계별 소요(ms) 반환."""
+    timings = self.embedder.warmup()
+    t0 = time.perf_counter()
+    self.store.connect()
+    timings["chroma_connect_ms"] = (time.perf_counter() - t0) * 1000.0
+    return timings
+
+  async def aclose(self) -> None:
+    """네트워크 리소스(전처리 HTTP 클라이언트)와 워커 풀 정리."""
+    await self.preprocessor.aclose()
+    await self.embedder.aclose()
+    self.store.close()
+    if self.lexical is not None:
+      self.lexical.close()
+
+  def similarity_search(
+    self,
+    query_text: str,
+    top_k: int | None = None,
+    where: Dict[str, Any] | None = None,
+    where_document: Dict[str, Any] | None = None,
+    include: Sequence[str] | None = None,
+    mode: str | None = None,
+    rerank: bool | None = None,
+  ) -> Dict[str, Any]:
+    """쿼리 텍스트 임베딩 후 Top-K 유사 문서 검색.
+
+    - `where`/`where_document`: Chroma 형식 메타데이터/본문 필터(스토어에서 검색 전에 적용)
+    - `include`: 반환 필드(documents/metadatas/distances/embeddings, 기본은 embeddings 제외)
+    - `mode`: vector | hybrid(BM25 점수와 가중합, 기본 `QUERY_MODE`)
+    - `rerank`: 후보 `RERANK_CANDIDATES`개를 MMR + 용어 겹침으로 재정렬(기본 `RERANK`)
+    """
+    return self.similarity_search_many([query_text], top_k, where=where, where_document=where_document, include=include, mode=mode, rerank=rerank)
+
+  def similarity_search_many(
+    self,
+    query_texts: Sequence[str],
+    top_k: int | None = None,
+    fuse: bool = False,
+    where: Dict[str, Any] | None = None,
+    where_document: Dict[str, Any] | None = None,
+    include: Sequence[str] | None = None,
+    mode: str | None = None,
+    rerank: bool | None = None,
+  ) -> Dict[str, Any]:
+    """여러 쿼리를 한 번에 임베딩하고 한 번의 스토어 쿼리로 검색.
+
+    - `fuse=False`: 쿼리별 결과(중첩 리스트) 그대로 반환
+    - `fuse=True`: Reciprocal Rank Fusion으로 합치고 id 중복 제거한 단일 결과
+    - 청킹 사용 시 청크를 더 가져와 부모 대화 단위로 합친 뒤 Top-K 반환
+    - 필터/`include`/`mode`/`rerank`는 `similarity_search`와 같음(모든 쿼리에 공통 적용)
+    """
     top_k = top_k or self.settings.default_top_k
-    qv = self.embedder.embed([query_text])
-    return self.store.query(query_embeddings=qv, top_k=top_k)
+    hybrid = self._hybrid(mode)
+    rerank = self.settings.rerank if rerank is None else rerank
+    fetch_k = self._fetch_k(top_k)
+    pool = max(fetch_k, self.settings.rerank_candidates) if rerank else fetch_k
+    candidates = max(pool, fetch_k * self.settings.hybrid_overfetch) if hybrid else pool
+    with METRICS.stage("query", "total"):
+      with METRICS.stage("query", "embed"):
+        qv = self.embedder.embed_queries(query_texts)
+      with METRICS.stage("query", "store"):
+        result = self.store.query(
+          query_embeddings=qv,
+          top_k=candidates,
+          include=self._store_include(include, hybrid, rerank),
+          where=where,
+          where_document=where_document,
+        )
+      if hybrid:
+        assert self.lexical is not None
+        with METRICS.stage("query", "lexical"):
+          lexical = [self.lexical.search(q, candidates) for q in query_texts]
+          missing = self._lexical_only_ids(result, lexical)
+          extra = self.store.get(
+            ids=missing, where=where, where_document=where_document, include=["embeddings"] if rerank else None
+          ) if missing else None
+          result = self._hybrid_fuse(result, lexical, extra, pool)
+      if rerank:
+        with METRICS.stage("query", "rerank"):
+          result = self._rerank(result, qv, query_texts, fetch_k)
+      return self._shape_results(result, top_k, fuse, include)
 
+  async def asimilarity_search(
+    self,
+    query_text: str,
+    top_k: int | None = None,
+    where: Dict[str, Any] | None = None,
+    where_document: Dict[str, Any] | None = None,
+    include: Sequence[str] | None = None,
+    mode: str | None = None,
+    rerank: bool | None = None,
+  ) -> Dict[str, Any]:
+    """`similarity_search`의 비동기 버전(임베딩/검색을 워커 풀에서 실행)."""
+    return await self.asimilarity_search_many([query_text], top_k, where=where, where_document=where_document, include=include, mode=mode, rerank=rerank)
 
+  async def asimilarity_search_many(
+    self,
+    query_texts: Sequence[str],
+    top_k: int | None = None,
+    fuse: bool = False,
+    where: Dict[str, Any] | None = None,
+    where_document: Dict[str, Any] | None = None,
+    include: Sequence[str] | None = None,
+    mode: str | None = None,
+    rerank: bool | None = None,
+  ) -> Dict[str, Any]:
+    """`similarity_search_many`의 비동기 버전(하이브리드면 BM25 검색을 벡터 검색과 동시에 실행)."""
+    top_k = top_k or self.settings.default_top_k
+    hybrid = self._hybrid(mode)
+    rerank = self.settings.rerank if rerank is None else rerank
+    fetch_k = self._fetch_k(top_k)
+    pool = max(fetch_k, self.settings.rerank_candidates) if rerank else fetch_k
+    candidates = max(pool, fetch_k * self.settings.hybrid_overfetch) if hybrid else pool
+    with METRICS.stage("query", "total"):
+      lexical_task = None
+      if hybrid:
+        assert self.lexical is not None
+        lexical_task = asyncio.gather(*(self.lexical.asearch(q, candidates) for q in query_texts))
+      with METRICS.stage("query", "embed"):
+        qv = await self.embedder.aembed_queries(query_texts)
+      with METRICS.stage("query", "store"):
+        result = await self.store.aquery(
+          query_embeddings=qv,
+          top_k=candidates,
+          include=self._store_include(include, hybrid, rerank),
+          where=where,
+          where_document=where_document,
+        )
+      if lexical_task is not None:
+        # BM25 검색은 임베딩/벡터 검색과 동시에 돌았으므로 남은 대기 + 병합 시간만 기록
+        with METRICS.stage("query", "lexical"):
+          lexical = list(await lexical_task)
+          missing = self._lexical_only_ids(result, lexical)
+          extra = await self.store.aget(
+            ids=missing, where=where, where_document=where_document, include=["embeddings"] if rerank else None
+          ) if missing else None
+          result = self._hybrid_fuse(result, lexical, extra, pool)
+      if rerank:
+        with METRICS.stage("query", "rerank"):
+          result = self._rerank(result, qv, query_texts, fetch_k)
+      return self._shape_results(result, top_k, fuse, include)
+
+  def _rerank(self, result: Dict[str, Any], qv: np.ndarray, query_texts: Sequence[str], top_k: int) -> Dict[str, Any]:
+    """쿼리별 후보를 MMR + 용어 겹침으로 재정렬해 Top-K만 남김(`scores`는 재정렬 관련도).
+
+    하이브리드 결과(`scores` = 벡터+BM25 융합 점수)면 코사인 유사도 대신 융합 점수로 관련도를
+    계산해 BM25 적중(정확한 코드/식별자 일치)을 유지합니다. 임베딩이 없는 후보는 0 벡터로 취급합니다.
+    """
+    s = self.settings
+    fields = [k for k in ("documents", "metadatas", "distances", "embeddings", "scores") if result.get(k) is not None]
+    out: Dict[str, List[Any]] = {"ids": [], "scores": []}
+    for k in fields:
+      out.setdefault(k, [])
+    dim = qv.shape[1]
+    for qi, ids in enumerate(result.get("ids") or []):
+      embeddings, documents = result.get("embeddings"), result.get("documents")
+      rows = embeddings[qi] if embeddings is not None else None
+      vecs = np.zeros((len(ids), dim), dtype=np.float32)
+      if rows is not None:
+        for r, v in enumerate(rows):
+          if v is not None:
+            vecs[r] = v
+      docs = documents[qi] if documents is not None and documents[qi] is not None else [None] * len(ids)
+      fused = result.get("scores")
+      picked, relevance, exceeded = mmr_rerank(
+        qv[qi],
+        vecs,
+        term_overlap(query_texts[qi], docs),
+        top_k,
+        lambda_=s.rerank_lambda,
+        term_weight=s.rerank_term_weight,
+        budget_ms=s.rerank_budget_ms,
+        base_scores=np.asarray(fused[qi], dtype=np.float32) if fused is not None else None,
+      )
+      self.rerank_counts["queries"] += 1
+      self.rerank_counts["budget_exceeded"] += int(exceeded)
+      out["ids"].append([ids[i] for i in picked])
+      for k in fields:
+        if k != "scores":
+          row = result[k][qi]
+          out[k].append([row[i] for i in picked] if row is not None else None)
+      out["scores"].append(relevance)
+    return {**result, **out}
+
+  def _hybrid(self, mode: str | None) -> bool:
+    """검색 모드 확인(hybrid인데 역색인이 꺼져 있으면 ValueError)."""
+    mode = (mode or self.settings.query_mode).lower()
+    if mode not in {"vector", "hybrid"}:
+      raise ValueError(f"Unknown query mode: {mode}")
+    if mode == "hybrid" and self.lexical is None:
+      raise ValueError("Hybrid query mode requires LEXICAL_INDEX=true")
+    return mode == "hybrid"
+
+  @staticmethod
+  def _lexical_only_ids(result: Dict[str, Any], lexical: List[List[Tuple[str, float]]]) -> List[str]:
+    """BM25 후보 중 벡터 결과에 없는 id(문서/메타데이터 조회 및 필터 확인 대상)."""
+    seen = {doc_id for ids in result.get("ids") or [] for doc_id in ids}
+    return list(dict.fromkeys(doc_id for hits in lexical for doc_id, _ in hits if doc_id not in seen))
+
+  def _hybrid_fuse(
+    self,
+    result: Dict[str, Any],
+    lexical: List[List[Tuple[str, float]]],
+    extra: Dict[str, Any] | None,
+    top_k: int,
+  ) -> Dict[str, Any]:
+    """쿼리별 벡터 거리와 BM25 점수를 `HYBRID_ALPHA` 가중합으로 합쳐 Top-K 결과로 변환.
+
+    BM25에만 있는 항목은 `extra`(필터를 통과한 스토어 조회 결과)에 있을 때만
+    포함되며, 거리는 None, 임베딩은 `extra`에 있으면(재정렬용) 그 값입니다.
+    결과에 `scores`(융합 점수)를 추가합니다.
+    """
+    found: Dict[str, Tuple[Any, Any, Any]] = {}
+    if extra is not None:
+      n = len(extra["ids"])
+      extra_vecs = extra.get("embeddings")
+      for i, doc_id in enumerate(extra["ids"]):
+        found[doc_id] = (
+          (extra.get("documents") or [None] * n)[i],
+          (extra.get("metadatas") or [None] * n)[i],
+          extra_vecs[i] if extra_vecs is not None and len(extra_vecs) > i else None,
+        )
+    fields = [k for k in ("documents", "metadatas", "distances", "embeddings") if result.get(k) is not None]
+    out: Dict[str, List[Any]] = {"ids": [], "scores": []}
+    for k in fields:
+      out[k] = []
+    for qi, ids in enumerate(result.get("ids") or []):
+      vec_pos = {doc_id: r for r, doc_id in enumerate(ids)}
+      hits = [(doc_id, score) for doc_id, score in lexical[qi] if doc_id in vec_pos or doc_id in found]
+      ranked = weighted_score_fusion(ids, result["distances"][qi], hits, self.settings.hybrid_alpha)[:top_k]
+      out["ids"].append([doc_id for doc_id, _ in ranked])
+      out["scores"].append([score for _, score in ranked])
+      for k in fields:
+        row = result[k][qi]
+        fallback = {"documents": 0, "metadatas": 1, "embeddings": 2}.get(k)
+        out[k].append([
+          row[vec_pos[doc_id]] if doc_id in vec_pos
+          else (found[doc_id][fallback] if fallback is not None else None)
+          for doc_id, _ in ranked
+        ])
+    return {**result, **out}
+
+  async def asearch_page(
+    self,
+    query_text: str,
+    limit: int | None = None,
+    offset: int = 0,
+    fields: Sequence[str] = ("id", "distance"),
+    where: Dict[str, Any] | None = None,
+    where_document: Dict[str, Any] | None = None,
+    max_distance: float | None = None,
+    max_chars: int = 0,
+    snippet: bool = False,
+    mode: str | None = None,
+    rerank: bool | None = None,
+  ) -> Dict[str, Any]:
+    """단일 쿼리 검색 결과를 평탄한 hit 페이지로 반환.
+
+    - `offset`부터 `limit`개(기본 `DEFAULT_TOP_K`). 다음 페이지 존재 여부를 알기 위해
+      스토어에서 `offset + limit + 1`개를 가져옴
+    - `fields`: id/distance/document/metadata 중 반환 필드(필요한 것만 스토어에 요청)
+    - `max_distance`: 거리 임계값. 거리순 결과는 넘는 hit부터 잘라내고, 하이브리드/재정렬은
+      거리순이 아니므로 넘는 hit만 걸러낸 뒤 페이지를 자름(offset은 걸러낸 목록 기준)
+    - `max_chars`/`snippet`: 문서 길이 제한(스니펫이면 쿼리 단어 주변)
+    - 반환: `{"hits": [...], "has_more": bool}`
+    """
+    limit = max(1, limit or self.settings.default_top_k)
+    offset = max(0, offset)
+    result = await self.asimilarity_search(
+      query_text,
+      offset + limit + 1,
+      where=where,
+      where_document=where_document,
+      include=include_for(fields, need_distance=max_distance is not None),
+      mode=mode,
+      rerank=rerank,
+    )
+    hits, has_more = to_hits(
+      result,
+      fields,
+      offset=offset,
+      limit=limit,
+      max_distance=max_distance,
+      max_chars=max_chars,
+      snippet_query=query_text if snippet else None,
+      by_distance=not self._hybrid(mode) and not (self.settings.rerank if rerank is None else rerank),
+    )
+    return {"hits": hits, "has_more": has_more}
@@ -2,14 +2,27 @@
 
 대화(다중 발화)를 임베딩 친화적인 단일 텍스트로 변환합니다.
 OpenRouter가 사용 가능하면 LLM 기반 전처리를 수행하고, 그렇지 않으면
-로컬 휴리스틱 정규화로 폴백합니다.
+로컬 휴리스틱 정규화로 폴백합니다. OpenRouter 호출은 분당 요청/토큰 한도,
+429/5xx 재시도(`Retry-After` 우선), 서킷 브레이커를 거칩니다.
+짧은 대화 여러 개는 한 번의 호출로 묶어(packing) JSON으로 돌려받을 수 있습니다.
 """
 from __future__ import annotations
 
-from typing import Iterable
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+import asyncio
+import importlib.util
+import json
+import logging
+
 import httpx
 
+from .cache import PreprocessCache, make_cache_key
 from .config import RagSettings
+from .metrics import METRICS, ROW_BUCKETS
+from .normalize import join_messages, normalize_conversations, normalize_transcript
+from .resilience import CircuitBreaker, RateLimiter, parse_retry_after, retry_delay
+
+LOGGER = logging.getLogger(__name__)
 
 
 SYSTEM_PROMPT = (
@@ -21,48 +34,358 @@ SYSTEM_PROMPT = (
   "Output Korean if input is Korean; otherwise keep the original language."
 )
 
+USER_INSTRUCTION = (
+  "아래는 다중 화자의 대화 기록입니다(Q/A 접두어 포함). "
+  "각 발화의 'Q:' 또는 'A:' 접두어를 반드시 유지하면서, 벡터 임베딩에 최적인 한국어 요약/정규화 텍스트를 생성하세요. "
+  "불필요한 군더더기는 제거하되, 사실과 의미, 엔티티·날짜·금액·작업 항목은 보존하세요.\n\n"
+)
+
+PACK_HEADER = "### CONVERSATION "
+
+PACKED_SYSTEM_PROMPT = SYSTEM_PROMPT + (
+  " You will receive several independent transcripts, each starting with a line '"
+  + PACK_HEADER + "<n>'. Process each one separately with the rules above and never mix content between them. "
+  'Respond with only a JSON object of the form {"results": [{"id": <n>, "text": "<processed transcript>"}]} '
+  "containing exactly one entry per transcript."
+)
+
+PACKED_USER_INSTRUCTION = (
+  "아래는 서로 독립된 여러 대화 기록입니다. 각 대화를 위 규칙대로 따로 정규화하고, "
+  "지정된 JSON 형식으로만 답하세요.\n\n"
+)
+
+MAX_COMPLETION_TOKENS = 800
+
+# 전처리 경로: openrouter(LLM 호출), packed(묶음 호출), cache(캐시 적중), heuristic(API 키 없음),
+# fallback(재시도 후에도 실패), circuit_open(브레이커가 열려 호출 생략)
+PREPROCESS_PATHS = ("openrouter", "packed", "cache", "heuristic", "fallback", "circuit_open")
+
+
+def estimate_tokens(text: str, system: str = SYSTEM_PROMPT, instruction: str = USER_INSTRUCTION, max_tokens: int = MAX_COMPLETION_TOKENS) -> int:
+  """토큰 한도 예약용 대략적 토큰 수(프롬프트 + 최대 출력). 실제 사용량으로 나중에 보정."""
+  prompt_chars = len(system) + len(instruction) + len(text)
+  return prompt_chars // 2 + max_tokens
+
+
+def pack_groups(lengths: Sequence[int], max_items: int, max_chars: int) -> List[List[int]]:
+  """입력 순서를 유지하며 항목 수 `max_items`, 글자 수 합 `max_chars` 이하로 인덱스를 묶음.
+
+  혼자서 `max_chars`를 넘는 항목은 단독 그룹이 됩니다.
+  """
+  groups: List[List[int]] = []
+  current: List[int] = []
+  chars = 0
+  for i, n in enumerate(lengths):
+    if current and (len(current) >= max_items or chars + n > max_chars):
+      groups.append(current)
+      current, chars = [], 0
+    current.append(i)
+    chars += n
+  if current:
+    groups.append(current)
+  return groups
+
+
+def build_packed_prompt(texts: Sequence[str]) -> str:
+  """대화들을 `### CONVERSATION <n>`(1부터) 구획으로 이어 붙임."""
+  return "\n\n".join(f"{PACK_HEADER}{i}\n{text}" for i, text in enumerate(texts, start=1))
+
+
+def parse_packed_response(content: str, count: int) -> List[str | None]:
+  """묶음 응답 JSON → 대화별 텍스트(누락/빈 항목/해석 실패는 None).
+
+  `{"results": [{"id", "text"}]}` 외에 코드 펜스로 감싼 응답이나 최상위 배열도 허용합니다.
+  """
+  out: List[str | None] = [None] * count
+  start, end = content.find("{"), content.rfind("}")
+  if content.lstrip().startswith("[") or start < 0:
+    start, end = content.find("["), content.rfind("]")
+  if start < 0 or end <= start:
+    return out
+  try:
+    data = json.loads(content[start:end + 1])
+  except ValueError:
+    return out
+  items = data.get("results") if isinstance(data, dict) else data
+  if not isinstance(items, list):
+    return out
+  for item in items:
+    if not isinstance(item, dict) or not isinstance(item.get("text"), str):
+      continue
+    try:
+      idx = int(item.get("id")) - 1
+    except (TypeError, ValueError):
+      continue
+    text = item["text"].strip()
+    if 0 <= idx < count and text and out[idx] is None:
+      out[idx] = text
+  return out
+
+
+def _classify_error(e: Exception) -> Tuple[bool, bool, float | None]:
+  """예외 → (재시도 여부, 업스트림 장애로 볼지, Retry-After 초).
+
+  - 429: 재시도(한도 초과일 뿐 장애는 아님)
+  - 5xx / 연결 오류: 재시도 + 장애
+  - 타임아웃: 장애지만 재시도하지 않음(멈춘 업스트림을 타임아웃만큼 또 기다리지 않도록)
+  - 그 외(4xx, 응답 파싱 실패): 재시도하지 않음
+  """
+  if isinstance(e, httpx.HTTPStatusError):
+    status = e.response.status_code
+    retry_after = parse_retry_after(e.response.headers.get("Retry-After"))
+    if status == 429:
+      return True, False, retry_after
+    if status >= 500:
+      return True, True, retry_after
+    return False, False, None
+  if isinstance(e, httpx.TimeoutException):
+    return False, True, None
+  if isinstance(e, httpx.TransportError):
+    return True, True, None
+  return False, False, None
+
 
 class Preprocessor:
   """대화 전처리기.
 
   - 입력: 발화 목록(문자열 Iterable)
   - 출력: 사실 유지, 중복/군더더기 제거, 임베딩 친화적 단일 텍스트
-  - 전략: OpenRouter 우선 → 실패 시 휴리스틱
+  - 전략: OpenRouter 우선 → 실패 시 휴리스틱(어느 경로였는지는 `preprocess_with_path`로 확인)
+  - 보호: 요청/토큰 버킷(`OPENROUTER_RPM`/`OPENROUTER_TPM`), 지터 지수 백오프 재시도,
+    서킷 브레이커(열려 있으면 호출 없이 즉시 휴리스틱)
+  - HTTP: 커넥션 풀을 가진 장수명 `httpx.AsyncClient`를 재사용(`aclose()`로 종료)
+  - 캐시: 동일 입력의 OpenRouter 결과는 `PreprocessCache`에서 재사용(묶음 호출 결과도 대화별 키로 저장)
+  - 묶음: `preprocess_many`는 짧은 대화 여러 개를 한 요청으로 묶어 고정 프롬프트/요청 비용을 나눔
   """
 
   def __init__(self, settings: RagSettings) -> None:
-    """설정 주입."""
+    """설정 주입 및 전처리 캐시 준비."""
     self.settings = settings
+    self._client: httpx.AsyncClient | None = None
+    self.limiter = RateLimiter(settings.openrouter_rpm, settings.openrouter_tpm)
+    self.breaker = CircuitBreaker(settings.openrouter_breaker_threshold, settings.openrouter_breaker_reset_s)
+    self.cache: PreprocessCache | None = None
+    if settings.preprocess_cache_enabled:
+      try:
+        self.cache = PreprocessCache(
+          settings.preprocess_cache_path,
+          max_entries=settings.preprocess_cache_max_entries,
+          ttl_seconds=settings.preprocess_cache_ttl_seconds,
+        )
+      except Exception as e:
+        LOGGER.warning("Preprocess cache unavailable (%s). Continuing without cache.", e)
+
+  def _get_client(self) -> httpx.AsyncClient:
+    """공유 HTTP 클라이언트 지연 생성.
+
+    h2 패키지가 설치되어 있고 `openrouter_http2`가 켜져 있으면 HTTP/2를 사용합니다.
+    """
+    if self._client is None or self._client.is_closed:
+      s = self.settings
+      http2 = s.openrouter_http2 and importlib.util.find_spec("h2") is not None
+      self._client = httpx.AsyncClient(
+        timeout=httpx.Timeout(s.openrouter_timeout, connect=s.openrouter_connect_timeout),
+        limits=httpx.Limits(
+          max_connections=s.openrouter_max_connections,
+          max_keepalive_connections=s.openrouter_max_keepalive,
+          keepalive_expiry=s.openrouter_keepalive_expiry,
+        ),
+        http2=http2,
+      )
+    return self._client
+
+  async def aclose(self) -> None:
+    """공유 HTTP 클라이언트 종료(열려 있지 않으면 no-op)."""
+    if self._client is not None:
+      await self._client.aclose()
+      self._client = None
 
   async def preprocess(self, messages: Iterable[str]) -> str:
-    """발화 목록을 하나의 임베딩 최적 텍스트로 변환.
+    """발화 목록을 하나의 임베딩 최적 텍스트로 변환(`preprocess_with_path`의 텍스트만 반환)."""
+    text, _ = await self.preprocess_with_path(messages)
+    return text
+
+  async def preprocess_with_path(self, messages: Iterable[str]) -> Tuple[str, str]:
+    """발화 목록 → (전처리 텍스트, 사용한 경로).
+
+    - OpenRouter 키가 없으면 휴리스틱 폴백(`heuristic`)
+    - 키가 있으면 캐시 조회(`cache`) 후, 미스일 때만 OpenAI 호환 Chat Completions로 생성(`openrouter`)
+    - 브레이커가 열려 있으면 호출 없이 휴리스틱(`circuit_open`), 재시도 후에도 실패하면 휴리스틱(`fallback`)
+    - 휴리스틱 폴백 결과는 캐시하지 않음
+    """
+    joined = join_messages(messages)
+    if not self.settings.openrouter_api_key:
+      return self._heuristic(joined, "heuristic", "no_api_key")
+    key, cached = self._lookup(joined)
+    if cached is not None:
+      return cached, "cache"
+    return await self._generate(joined, key)
+
+  async def preprocess_many(self, conversations: Sequence[Iterable[str]], concurrency: int = 1) -> List[Tuple[str, str]]:
+    """여러 대화를 전처리해 입력 순서대로 (텍스트, 경로) 목록 반환.
 
-    - OpenRouter 키가 없으면 휴리스틱 폴백 사용
-    - 키가 있으면 OpenAI 호환 Chat Completions로 전처리 텍스트 생성
+    - 호출은 최대 `concurrency`개까지 동시에 실행
+    - `PREPROCESS_PACK_SIZE` > 1이면 캐시 미스 대화를 `PREPROCESS_PACK_MAX_CHARS` 안에서 묶어
+      한 번의 호출로 처리(`packed`). 응답 해석에 실패한 대화는 개별 호출로 다시 처리
     """
-    joined = "\n".join(m.strip() for m in messages if m and m.strip())
     if not self.settings.openrouter_api_key:
-      return self._fallback_heuristic(joined)
+      METRICS.inc("rag_preprocess_total", len(conversations), path="heuristic")
+      METRICS.inc("rag_openrouter_fallbacks_total", len(conversations), reason="no_api_key")
+      return [(text, "heuristic") for text in normalize_conversations(conversations)]
+    joined_all = [join_messages(m) for m in conversations]
+    sem = asyncio.Semaphore(max(1, concurrency))
+    out: List[Tuple[str, str] | None] = [None] * len(joined_all)
+    keys: List[str | None] = [None] * len(joined_all)
+    pending: List[int] = []
+    for i, joined in enumerate(joined_all):
+      keys[i], cached = self._lookup(joined)
+      if cached is not None:
+        out[i] = (cached, "cache")
+      else:
+        pending.append(i)
 
+    async def _single(i: int) -> None:
+      async with sem:
+        out[i] = await self._generate(joined_all[i], keys[i])
+
+    async def _packed(group: List[int]) -> None:
+      async with sem:
+        texts = await self._call_packed([joined_all[i] for i in group])
+      for i, text in zip(group, texts):
+        if text is None:
+          continue
+        METRICS.inc("rag_preprocess_total", path="packed")
+        if keys[i] is not None:
+          self.cache.set(keys[i], text)
+        out[i] = (text, "packed")
+      await asyncio.gather(*(_single(i) for i, text in zip(group, texts) if text is None))
+
+    s = self.settings
+    if s.preprocess_pack_size > 1:
+      groups = pack_groups([len(joined_all[i]) for i in pending], s.preprocess_pack_size, s.preprocess_pack_max_chars)
+      groups = [[pending[j] for j in group] for group in groups]
+    else:
+      groups = [[i] for i in pending]
+    await asyncio.gather(*(_single(g[0]) if len(g) == 1 else _packed(g) for g in groups))
+    return [item for item in out if item is not None]
+
+  def _lookup(self, joined: str) -> Tuple[str | None, str | None]:
+    """캐시 키와 캐시된 결과(없으면 None)."""
+    if self.cache is None:
+      return None, None
+    key = self._cache_key(joined)
+    cached = self.cache.get(key)
+    if cached is not None:
+      METRICS.inc("rag_preprocess_total", path="cache")
+    return key, cached
+
+  async def _generate(self, joined: str, key: str | None) -> Tuple[str, str]:
+    """캐시 미스 대화 1건을 OpenRouter로 생성(브레이커/재시도 포함, 실패 시 휴리스틱)."""
+    if not self.breaker.allow():
+      return self._heuristic(joined, "circuit_open", "circuit_open")
+    probe = self.breaker.state == "half_open"
+    try:
+      result = await self._call_with_retry(joined)
+    except Exception as e:
+      LOGGER.debug("OpenRouter preprocessing failed (%s: %s). Using heuristic.", type(e).__name__, e)
+      return self._heuristic(joined, "fallback", type(e).__name__)
+    finally:
+      # 시험 호출이 취소(CancelledError)로 끝나도 half-open 슬롯이 묶이지 않게
+      if probe:
+        self.breaker.release()
+    METRICS.inc("rag_preprocess_total", path="openrouter")
+    if key is not None:
+      self.cache.set(key, result)
+    return result, "openrouter"
+
+  async def _call_packed(self, texts: List[str]) -> List[str | None]:
+    """대화 묶음을 한 번에 호출해 대화별 결과 반환(호출/해석 실패 항목은 None)."""
+    METRICS.observe("rag_preprocess_pack_size", len(texts), ROW_BUCKETS)
+    if not self.breaker.allow():
+      return [None] * len(texts)
+    probe = self.breaker.state == "half_open"
     try:
-      return await self._call_openrouter(joined)
-    except Exception:
-      return self._fallback_heuristic(joined)
+      content = await self._call_with_retry(
+        build_packed_prompt(texts),
+        system=PACKED_SYSTEM_PROMPT,
+        instruction=PACKED_USER_INSTRUCTION,
+        max_tokens=MAX_COMPLETION_TOKENS * len(texts),
+      )
+    except Exception as e:
+      LOGGER.debug("Packed OpenRouter call failed (%s: %s). Retrying items individually.", type(e).__name__, e)
+      METRICS.inc("rag_preprocess_pack_failures_total", len(texts), reason=type(e).__name__)
+      return [None] * len(texts)
+    finally:
+      if probe:
+        self.breaker.release()
+    results = parse_packed_response(content, len(texts))
+    missing = sum(r is None for r in results)
+    if missing:
+      METRICS.inc("rag_preprocess_pack_failures_total", missing, reason="parse")
+    return results
+
+  def _heuristic(self, joined: str, path: str, reason: str) -> Tuple[str, str]:
+    """휴리스틱 폴백 + 경로/사유 카운트."""
+    METRICS.inc("rag_preprocess_total", path=path)
+    METRICS.inc("rag_openrouter_fallbacks_total", reason=reason)
+    return self._fallback_heuristic(joined), path
+
+  async def _call_with_retry(
+    self,
+    text: str,
+    system: str = SYSTEM_PROMPT,
+    instruction: str = USER_INSTRUCTION,
+    max_tokens: int = MAX_COMPLETION_TOKENS,
+  ) -> str:
+    """한도 확보 후 호출. 재시도 가능한 오류는 `openrouter_max_retries`회까지 백오프 후 재시도."""
+    s = self.settings
+    estimated = estimate_tokens(text, system, instruction, max_tokens)
+    attempt = 0
+    while True:
+      await self.limiter.acquire(estimated)
+      try:
+        result, used = await self._call_openrouter(text, system, instruction, max_tokens)
+      except Exception as e:
+        retryable, upstream_down, retry_after = _classify_error(e)
+        exhausted = retryable and attempt >= s.openrouter_max_retries
+        # 장애(5xx/연결/타임아웃)와 재시도를 다 쓴 429는 실패로 집계. 4xx/파싱 실패와 재시도 중인
+        # 429는 호출이 성공한 것도 아니므로 브레이커를 그대로 둔다(half-open 시험 호출도 닫지 않음)
+        if upstream_down or exhausted:
+          self.breaker.record_failure()
+        if not retryable or exhausted or self.breaker.state == "open":
+          raise
+        reason = str(e.response.status_code) if isinstance(e, httpx.HTTPStatusError) else type(e).__name__
+        METRICS.inc("rag_openrouter_retries_total", reason=reason)
+        await asyncio.sleep(retry_delay(attempt, s.openrouter_retry_base_delay, s.openrouter_retry_max_delay, retry_after))
+        attempt += 1
+        continue
+      self.breaker.record_success()
+      self.limiter.settle(estimated, used)
+      return result
+
+  def stats(self) -> Dict[str, Any]:
+    """서킷 브레이커 상태와 한도 대기 누적 시간."""
+    return {"breaker": self.breaker.stats(), "rate_limit_wait_s": round(self.limiter.waited_s, 3)}
+
+  def _cache_key(self, joined: str) -> str:
+    """입력 대화 + 모델 + 프롬프트 기반 캐시 키."""
+    return make_cache_key([self.settings.openrouter_model, SYSTEM_PROMPT, USER_INSTRUCTION, joined])
 
   def _fallback_heuristic(self, text: str) -> str:
-    """간단 정규화 폴백: 공백/불릿 제거, 빈 줄 제거."""
-    text = text.replace("\r", "\n").strip()
-    while "  " in text:
-      text = text.replace("  " , " ")
-    lines = [ln.strip(" -•\t") for ln in text.split("\n")]
-    lines = [ln for ln in lines if ln]
-    return "\n".join(lines)
-
-  async def _call_openrouter(self, text: str) -> str:
-    """OpenRouter Chat Completions 호출로 전처리 텍스트 생성.
-
-    OpenAI 호환 스키마(`choices[0].message.content`)를 파싱합니다.
-    예외 발생 시 상위에서 휴리스틱으로 폴백됩니다.
+    """간단 정규화 폴백: 공백/불릿 제거, 빈 줄 제거(`normalize.normalize_transcript`)."""
+    return normalize_transcript(text)
+
+  async def _call_openrouter(
+    self,
+    text: str,
+    system: str = SYSTEM_PROMPT,
+    instruction: str = USER_INSTRUCTION,
+    max_tokens: int = MAX_COMPLETION_TOKENS,
+  ) -> Tuple[str, int | None]:
+    """OpenRouter Chat Completions 호출로 (전처리 텍스트, 사용 토큰 수) 생성.
+
+    OpenAI 호환 스키마(`choices[0].message.content`, `usage.total_tokens`)를 파싱합니다.
+    예외 발생 시 상위에서 재시도하거나 휴리스틱으로 폴백됩니다.
     """
     url = f"{self.settings.openrouter_base_url}/chat/completions"
     headers = {
@@ -74,24 +397,20 @@ class Preprocessor:
     payload = {
       "model": self.settings.openrouter_model,
       "messages": [
-        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "system", "content": system},
         {
           "role": "user",
-          "content": (
-            "아래는 다중 화자의 대화 기록입니다(Q/A 접두어 포함). "
-            "각 발화의 'Q:' 또는 'A:' 접두어를 반드시 유지하면서, 벡터 임베딩에 최적인 한국어 요약/정규화 텍스트를 생성하세요. "
-            "불필요한 군더더기는 제거하되, 사실과 의미, 엔티티·날짜·금액·작업 항목은 보존하세요.\n\n" + text
-          ),
+          "content": instruction + text,
         },
       ],
       "temperature": 0.2,
-      "max_tokens": 800,
+      "max_tokens": max_tokens,
     }
-    async with httpx.AsyncClient(timeout=60) as client:
-      resp = await client.post(url, headers=headers, json=payload)
-      resp.raise_for_status()
-      data = resp.json()
-      # OpenAI-compatible schema
-      return data["choices"][0]["message"]["content"].strip()
+    resp = await self._get_client().post(url, headers=headers, json=payload)
+    resp.raise_for_status()
+    data = resp.json()
+    # OpenAI-compatible schema
+    usage = (data.get("usage") or {}).get("total_tokens")
+    return data["choices"][0]["message"]["content"].strip(), (int(usage) if usage is not None else None)
 
 
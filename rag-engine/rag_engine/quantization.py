@@ -0,0 +1,140 @@
+"""Embedding quantization.
+
+float32 임베딩을 작은 코드로 바꿔 저장/전송 크기와 검색 시 스캔 메모리를 줄입니다.
+
+- int8: 벡터별 대칭 스케일(`max|x| / 127`)로 스칼라 양자화. 차원당 1바이트 + 스케일 4바이트
+- binary: 부호 비트(`x > 0`)를 8개씩 묶은 코드. 차원당 1비트, 해밍 거리로 1차 후보 선별
+- 검색은 코드로 후보를 `k × rescore_factor`개 고른 뒤 float32 원본으로 다시 채점(rescoring)
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+QUANTIZATION_MODES = ("none", "int8", "binary")
+
+# 바이트 값별 1비트 개수(해밍 거리 계산용)
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def quantize_int8(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+  """`(n, dim)` float32 → (`(n, dim)` int8 코드, `(n,)` float32 스케일)."""
+  vecs = np.asarray(vectors, dtype=np.float32)
+  scales = np.abs(vecs).max(axis=1) / 127.0 if len(vecs) else np.zeros(0, dtype=np.float32)
+  scales = np.where(scales > 0, scales, 1.0).astype(np.float32)
+  codes = np.clip(np.rint(vecs / scales[:, None]), -127, 127).astype(np.int8)
+  return np.ascontiguousarray(codes), scales
+
+
+def dequantize_int8(codes: np.ndarray, scales: np.ndarray) -> np.ndarray:
+  """int8 코드 → 근사 float32 벡터."""
+  return codes.astype(np.float32) * np.asarray(scales, dtype=np.float32)[:, None]
+
+
+def pack_bits(vectors: np.ndarray) -> np.ndarray:
+  """`(n, dim)` float32 → `(n, ceil(dim / 8))` uint8 부호 비트 코드."""
+  return np.ascontiguousarray(np.packbits(np.asarray(vectors) > 0, axis=1))
+
+
+def hamming_distances(query_bits: np.ndarray, codes: np.ndarray) -> np.ndarray:
+  """`(q, b)` 쿼리 비트와 `(n, b)` 코드 사이 해밍 거리 `(q, n)`."""
+  out = np.empty((len(query_bits), len(codes)), dtype=np.int32)
+  for i, bits in enumerate(query_bits):
+    xor = np.bitwise_xor(codes, bits[None, :])
+    # NumPy 2.0+ 는 `bitwise_count`, 그 이전은 바이트 popcount 표
+    counts = np.bitwise_count(xor) if hasattr(np, "bitwise_count") else _POPCOUNT[xor]
+    out[i] = counts.sum(axis=1, dtype=np.int32)
+  return out
+
+
+def code_bytes(dim: int, mode: str) -> int:
+  """벡터 1개당 저장 바이트(float32 원본 제외)."""
+  if mode == "int8":
+    return dim + 4
+  if mode == "binary":
+    return (dim + 7) // 8
+  if mode == "none":
+    return dim * 4
+  raise ValueError(f"Unknown quantization mode: {mode}")
+
+
+def approx_distances(
+  mode: str,
+  queries: np.ndarray,
+  codes: Any,
+  scales: Any = None,
+  sq_norms: np.ndarray | None = None,
+  q_norms: np.ndarray | None = None,
+  query_bits: np.ndarray | None = None,
+) -> np.ndarray:
+  """코드 블록에 대한 근사 거리 `(q, n)`(작을수록 가까움). 로컬 스토어 검색과 recall 리포트가 공유.
+
+  - int8: 역양자화 내적으로 만든 제곱 L2 근사(`sq_norms`는 원본 노름)
+  - binary: 해밍 거리
+  - `q_norms`(`(q, 1)` 쿼리 제곱 노름)/`query_bits`(`pack_bits(queries)`): 블록마다 다시
+    계산하지 않도록 미리 구한 값(없으면 여기서 계산)
+  """
+  if mode == "int8":
+    dots = (queries @ np.asarray(codes, dtype=np.float32).T) * np.asarray(scales, dtype=np.float32)[None, :]
+    if q_norms is None:
+      q_norms = np.einsum("ij,ij->i", queries, queries)[:, None]
+    return q_norms + np.asarray(sq_norms)[None, :] - 2.0 * dots
+  if mode == "binary":
+    bits = pack_bits(queries) if query_bits is None else query_bits
+    return hamming_distances(bits, np.asarray(codes)).astype(np.float32)
+  raise ValueError(f"Unknown quantization mode: {mode}")
+
+
+def _exact_top_k(vectors: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+  sq = np.einsum("ij,ij->i", vectors, vectors)
+  dist = sq[None, :] - 2.0 * (queries @ vectors.T)
+  return np.argsort(dist, axis=1, kind="stable")[:, :k]
+
+
+def recall_report(
+  vectors: np.ndarray,
+  queries: np.ndarray,
+  k: int = 10,
+  rescore_factors: Sequence[int] = (1, 2, 4, 8),
+) -> Dict[str, Any]:
+  """양자화 방식/재채점 배수별 recall@k(정확 검색 대비)와 메모리 사용량.
+
+  - `rescore_factor=1`: 코드 근사 순위의 상위 k개를 그대로 사용(재채점 효과 없음)
+  - 메모리: 스캔 대상 코드 크기(float32 원본은 재채점용으로 디스크에 유지)
+  """
+  vecs = np.ascontiguousarray(vectors, dtype=np.float32)
+  qs = np.ascontiguousarray(queries, dtype=np.float32)
+  n, dim = vecs.shape
+  k = min(k, n)
+  truth = _exact_top_k(vecs, qs, k)
+  sq_norms = np.einsum("ij,ij->i", vecs, vecs)
+  modes: List[Dict[str, Any]] = [{
+    "mode": "none",
+    "bytes_per_vector": code_bytes(dim, "none"),
+    "total_mb": n * code_bytes(dim, "none") / 1e6,
+    "recall": {"exact": 1.0},
+  }]
+  for mode in ("int8", "binary"):
+    if mode == "int8":
+      codes, scales = quantize_int8(vecs)
+    else:
+      codes, scales = pack_bits(vecs), None
+    approx = approx_distances(mode, qs, codes, scales, sq_norms)
+    order = np.argsort(approx, axis=1, kind="stable")
+    recalls: Dict[str, float] = {}
+    for factor in rescore_factors:
+      cand = order[:, :min(n, k * max(1, factor))]
+      hits = 0
+      for qi in range(len(qs)):
+        exact = sq_norms[cand[qi]] - 2.0 * (vecs[cand[qi]] @ qs[qi])
+        top = cand[qi][np.argsort(exact, kind="stable")[:k]]
+        hits += len(set(top.tolist()) & set(truth[qi].tolist()))
+      recalls[f"rescore_x{factor}"] = hits / float(len(qs) * k) if len(qs) else 0.0
+    modes.append({
+      "mode": mode,
+      "bytes_per_vector": code_bytes(dim, mode),
+      "total_mb": n * code_bytes(dim, mode) / 1e6,
+      "recall": recalls,
+    })
+  return {"vectors": n, "dim": dim, "queries": len(qs), "k": k, "modes": modes}
@@ -0,0 +1,79 @@
+"""Lightweight CPU reranking.
+
+벡터 검색으로 넉넉히 가져온 후보를 교차 인코더 없이 재정렬합니다.
+
+- 관련도: 쿼리-후보 코사인 유사도(하이브리드 검색이면 벡터+BM25 융합 점수)와
+  쿼리 용어 겹침 비율(BM25 토큰화 재사용)의 가중합
+- 다양성: MMR(Maximal Marginal Relevance)로 이미 고른 후보와 비슷한 후보에 감점
+- 시간 예산: 초과하면 남은 자리는 관련도 순으로 채움
+"""
+from __future__ import annotations
+
+from typing import List, Sequence, Tuple
+import time
+
+import numpy as np
+
+from .lexical import tokenize
+
+
+def term_overlap(query_text: str, documents: Sequence[str | None]) -> np.ndarray:
+  """문서별로 쿼리 용어 중 문서에 등장하는 비율(0~1)."""
+  terms = set(tokenize(query_text))
+  if not terms:
+    return np.zeros(len(documents), dtype=np.float32)
+  return np.array(
+    [len(terms.intersection(tokenize(doc))) / len(terms) if doc else 0.0 for doc in documents],
+    dtype=np.float32,
+  )
+
+
+def mmr_rerank(
+  query_vec: np.ndarray,
+  candidates: np.ndarray,
+  overlap: np.ndarray,
+  top_k: int,
+  lambda_: float = 0.7,
+  term_weight: float = 0.3,
+  budget_ms: float = 5.0,
+  base_scores: np.ndarray | None = None,
+) -> Tuple[List[int], List[float], bool]:
+  """후보 행 순서를 MMR로 다시 정함.
+
+  - `candidates`: `(n, dim)` 후보 임베딩(임베딩이 없는 행은 0 벡터)
+  - 관련도 `rel = (1 - term_weight) * cos(q, d) + term_weight * overlap`
+  - `base_scores`(0~1, 예: 하이브리드 융합 점수)가 있으면 `cos(q, d)` 대신 사용
+  - 선택 점수 `lambda_ * rel - (1 - lambda_) * max(cos(d, 이미 고른 후보))`
+  - 반환: (선택된 후보 인덱스, 각 관련도, 시간 예산 초과 여부)
+  """
+  started = time.perf_counter()
+  n = len(candidates)
+  k = min(top_k, n)
+  if k <= 0:
+    return [], [], False
+  vecs = np.asarray(candidates, dtype=np.float32).reshape(n, -1)
+  norms = np.linalg.norm(vecs, axis=1)
+  unit = vecs / np.maximum(norms, 1e-12)[:, None]
+  q = np.asarray(query_vec, dtype=np.float32).ravel()
+  q = q / max(float(np.linalg.norm(q)), 1e-12)
+  base = unit @ q if base_scores is None else np.asarray(base_scores, dtype=np.float32)
+  relevance = (1.0 - term_weight) * base + term_weight * overlap
+  max_sim = np.zeros(n, dtype=np.float32)
+  available = np.ones(n, dtype=bool)
+  picked: List[int] = []
+  budget = budget_ms / 1000.0
+  exceeded = False
+  while len(picked) < k:
+    if picked and time.perf_counter() - started > budget:
+      exceeded = True
+      break
+    score = lambda_ * relevance - (1.0 - lambda_) * max_sim
+    score[~available] = -np.inf
+    j = int(np.argmax(score))
+    picked.append(j)
+    available[j] = False
+    np.maximum(max_sim, unit @ unit[j], out=max_sim)
+  if len(picked) < k:
+    rest = [int(i) for i in np.argsort(-relevance, kind="stable") if available[i]]
+    picked.extend(rest[:k - len(picked)])
+  return picked, [float(relevance[i]) for i in picked], exceeded
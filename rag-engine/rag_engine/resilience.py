@@ -0,0 +1,157 @@
+"""Upstream call guards for OpenRouter.
+
+동시 백필 중 외부 LLM 호출을 안정적으로 유지하기 위한 구성 요소입니다.
+
+- `TokenBucket`/`RateLimiter`: 분당 요청 수·토큰 수 토큰 버킷(대기열 순서대로 대기)
+- `retry_delay`: 지터를 준 지수 백오프, `Retry-After` 헤더가 있으면 우선
+- `CircuitBreaker`: 연속 실패가 임계값을 넘으면 일정 시간 호출을 즉시 거절(open),
+  이후 한 건만 시험 호출(half-open)해 성공하면 복구. 시험 호출이 결과 없이 끝나면(취소 등)
+  `release`로 풀고, 끝나지 않은 채 `reset_seconds`가 지나면 새 시험 호출을 허용
+"""
+from __future__ import annotations
+
+from email.utils import parsedate_to_datetime
+from typing import Dict
+import asyncio
+import random
+import time
+
+
+class TokenBucket:
+  """분당 `rate_per_minute` 속도로 채워지는 버킷(용량 = 1분치). 속도 0이면 무제한."""
+
+  def __init__(self, rate_per_minute: float) -> None:
+    self.rate = max(0.0, rate_per_minute) / 60.0
+    self.capacity = max(0.0, rate_per_minute)
+    self._level = self.capacity
+    self._updated = time.monotonic()
+    self._lock = asyncio.Lock()
+
+  @property
+  def unlimited(self) -> bool:
+    return self.rate <= 0
+
+  def _refill(self) -> None:
+    now = time.monotonic()
+    self._level = min(self.capacity, self._level + (now - self._updated) * self.rate)
+    self._updated = now
+
+  async def acquire(self, amount: float = 1.0) -> float:
+    """`amount`만큼 소비(부족하면 채워질 때까지 대기). 대기한 초를 반환."""
+    if self.unlimited:
+      return 0.0
+    amount = min(amount, self.capacity)
+    waited = 0.0
+    # 락을 잡은 채로 기다려 먼저 온 요청이 먼저 나가도록 함
+    async with self._lock:
+      self._refill()
+      while self._level < amount:
+        delay = (amount - self._level) / self.rate
+        await asyncio.sleep(delay)
+        waited += delay
+        self._refill()
+      self._level -= amount
+    return waited
+
+  def adjust(self, delta: float) -> None:
+    """실사용량이 예상과 달랐을 때 보정(양수면 추가 소비, 음수면 환급). 잔량은 음수가 될 수 있음."""
+    if self.unlimited:
+      return
+    self._refill()
+    self._level = min(self.capacity, self._level - delta)
+
+
+class RateLimiter:
+  """요청 수(RPM)와 토큰 수(TPM) 버킷을 함께 적용."""
+
+  def __init__(self, requests_per_minute: float, tokens_per_minute: float) -> None:
+    self.requests = TokenBucket(requests_per_minute)
+    self.tokens = TokenBucket(tokens_per_minute)
+    self.waited_s = 0.0
+
+  async def acquire(self, estimated_tokens: int) -> None:
+    """요청 1건 + 예상 토큰을 확보할 때까지 대기."""
+    waited = await self.requests.acquire(1.0)
+    waited += await self.tokens.acquire(float(estimated_tokens))
+    self.waited_s += waited
+
+  def settle(self, estimated_tokens: int, actual_tokens: int | None) -> None:
+    """응답의 실제 토큰 사용량으로 토큰 버킷 보정."""
+    if actual_tokens is not None:
+      self.tokens.adjust(float(actual_tokens - estimated_tokens))
+
+
+def parse_retry_after(value: str | None) -> float | None:
+  """`Retry-After` 헤더(초 또는 HTTP 날짜) → 대기 초(해석 불가면 None)."""
+  if not value:
+    return None
+  try:
+    return max(0.0, float(value))
+  except ValueError:
+    pass
+  try:
+    return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+  except (TypeError, ValueError):
+    return None
+
+
+def retry_delay(attempt: int, base: float, cap: float, retry_after: float | None = None) -> float:
+  """`attempt`(0부터) 번째 재시도 전 대기 초.
+
+  `Retry-After`가 있으면 그 값(상한 `cap`), 없으면 `[0, min(cap, base * 2^attempt)]` 균등 지터.
+  """
+  if retry_after is not None:
+    return min(cap, retry_after)
+  return random.uniform(0.0, min(cap, base * (2 ** attempt)))
+
+
+class CircuitBreaker:
+  """연속 실패 기반 서킷 브레이커(단일 이벤트 루프에서 사용)."""
+
+  def __init__(self, failure_threshold: int, reset_seconds: float) -> None:
+    self.failure_threshold = max(1, failure_threshold)
+    self.reset_seconds = max(0.0, reset_seconds)
+    self.state = "closed"
+    self.failures = 0
+    self.opened_at = 0.0
+    self.trips = 0
+    self._probing = False
+    self._probe_started = 0.0
+
+  def allow(self) -> bool:
+    """호출 허용 여부. open 상태는 `reset_seconds` 경과 후 시험 호출 1건만 허용.
+
+    시험 호출이 시작된 지 `reset_seconds`가 지나도 결과가 없으면 새 시험 호출을 허용합니다.
+    """
+    if self.state == "closed":
+      return True
+    now = time.monotonic()
+    if self.state == "open" and now - self.opened_at >= self.reset_seconds:
+      self.state = "half_open"
+      self._probing = False
+    if self.state == "half_open" and (not self._probing or now - self._probe_started >= self.reset_seconds):
+      self._probing = True
+      self._probe_started = now
+      return True
+    return False
+
+  def release(self) -> None:
+    """허용받은 호출이 성공/실패 기록 없이 끝났을 때(취소 등) 시험 호출 슬롯을 반환."""
+    self._probing = False
+
+  def record_success(self) -> None:
+    self.state = "closed"
+    self.failures = 0
+    self._probing = False
+
+  def record_failure(self) -> None:
+    self.failures += 1
+    if self.state == "half_open" or self.failures >= self.failure_threshold:
+      if self.state != "open":
+        self.trips += 1
+      self.state = "open"
+      self.opened_at = time.monotonic()
+      self._probing = False
+
+  def stats(self) -> Dict[str, object]:
+    return {"state": self.state, "consecutive_failures": self.failures, "trips": self.trips}
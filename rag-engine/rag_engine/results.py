@@ -0,0 +1,135 @@
+"""Lean query result shaping.
+
+Chroma 형태(쿼리별 중첩 리스트) 결과를 단일 쿼리의 평탄한 hit 목록으로 바꾸고,
+필드 선택/문서 잘라내기(스니펫)/거리 임계값/커서 페이지네이션을 적용합니다.
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, List, Sequence, Tuple
+import base64
+import json
+import re
+
+from .cache import make_cache_key
+
+HIT_FIELDS = ("id", "distance", "document", "metadata")
+# hit 필드 → 스토어 `include` 필드
+_INCLUDE_OF = {"distance": "distances", "document": "documents", "metadata": "metadatas"}
+_ELLIPSIS = "…"
+_TERM_PATTERN = re.compile(r"\w{2,}")
+
+
+def include_for(fields: Sequence[str], need_distance: bool = False) -> List[str]:
+  """선택한 hit 필드에 필요한 스토어 `include` 목록."""
+  include = [_INCLUDE_OF[f] for f in fields if f in _INCLUDE_OF]
+  if need_distance and "distances" not in include:
+    include.append("distances")
+  return include
+
+
+def truncate(text: str, max_chars: int) -> str:
+  """앞에서부터 `max_chars`자로 자르고 잘렸으면 말줄임표 추가."""
+  if max_chars <= 0 or len(text) <= max_chars:
+    return text
+  return text[:max_chars] + _ELLIPSIS
+
+
+def snippet(text: str, query: str, max_chars: int) -> str:
+  """쿼리 단어가 처음 등장하는 위치를 중심으로 `max_chars`자 창을 잘라냄(없으면 앞부분)."""
+  if max_chars <= 0 or len(text) <= max_chars:
+    return text
+  lowered = text.lower()
+  positions = [lowered.find(t) for t in _TERM_PATTERN.findall(query.lower())]
+  positions = [p for p in positions if p >= 0]
+  if not positions:
+    return truncate(text, max_chars)
+  start = max(0, min(min(positions) - max_chars // 4, len(text) - max_chars))
+  end = start + max_chars
+  return (_ELLIPSIS if start > 0 else "") + text[start:end] + (_ELLIPSIS if end < len(text) else "")
+
+
+def to_hits(
+  result: Dict[str, Any],
+  fields: Sequence[str],
+  offset: int = 0,
+  limit: int | None = None,
+  max_distance: float | None = None,
+  max_chars: int = 0,
+  snippet_query: str | None = None,
+  by_distance: bool = True,
+) -> Tuple[List[Dict[str, Any]], bool]:
+  """첫 번째 쿼리 결과를 `[offset:offset+limit]` hit 목록으로 변환.
+
+  - `max_distance`: 거리가 이를 넘는 hit 제외. `by_distance`(결과가 거리 오름차순)면
+    넘는 첫 hit에서 중단하고, 아니면(하이브리드/재정렬) 전체를 걸러낸 목록에서 페이지를 자름.
+    거리가 없는 hit(BM25에만 있는 하이브리드 결과)는 통과
+  - `max_chars`: 문서 길이 상한(`snippet_query`가 있으면 쿼리 단어 주변 스니펫)
+  - 반환: (hit 목록, 다음 페이지가 더 있을 수 있는지)
+  """
+  ids = (result.get("ids") or [[]])[0]
+  columns = {
+    "distance": (result.get("distances") or [None])[0],
+    "document": (result.get("documents") or [None])[0],
+    "metadata": (result.get("metadatas") or [None])[0],
+  }
+  ranks = range(len(ids))
+  if max_distance is not None and columns["distance"] is not None and not by_distance:
+    ranks = [r for r in ranks if columns["distance"][r] is None or columns["distance"][r] <= max_distance]
+  end = len(ranks) if limit is None else min(len(ranks), offset + limit)
+  hits: List[Dict[str, Any]] = []
+  for rank in ranks[offset:end]:
+    distance = columns["distance"][rank] if columns["distance"] is not None else None
+    if max_distance is not None and distance is not None and distance > max_distance:
+      return hits, False
+    hit: Dict[str, Any] = {"id": ids[rank]}
+    for field in fields:
+      column = columns.get(field)
+      if field == "id" or column is None:
+        continue
+      value = column[rank]
+      if field == "document" and value is not None and max_chars > 0:
+        value = snippet(value, snippet_query, max_chars) if snippet_query else truncate(value, max_chars)
+      hit[field] = value
+    hits.append(hit)
+  return hits, limit is not None and len(ranks) > offset + limit
+
+
+def query_key(
+  query_text: str,
+  where: Dict[str, Any] | None = None,
+  where_document: Dict[str, Any] | None = None,
+  mode: str = "vector",
+  rerank: bool = False,
+  max_distance: float | None = None,
+) -> str:
+  """커서가 같은 검색에만 쓰이도록 쿼리/필터/정렬 방식에서 만든 짧은 키.
+
+  `mode`/`rerank`는 설정 기본값을 적용한 값을 넘겨야 합니다(결과 순서와 offset 의미가 달라짐).
+  """
+  return make_cache_key([
+    query_text,
+    json.dumps(where or {}, sort_keys=True, ensure_ascii=False),
+    json.dumps(where_document or {}, sort_keys=True, ensure_ascii=False),
+    mode,
+    str(bool(rerank)),
+    repr(max_distance),
+  ])[:12]
+
+
+def encode_cursor(offset: int, key: str) -> str:
+  """다음 페이지 시작 위치를 불투명 커서 문자열로 인코딩."""
+  raw = json.dumps({"o": offset, "k": key}, separators=(",", ":")).encode("utf-8")
+  return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, key: str) -> int:
+  """커서 → offset. 형식이 잘못됐거나 다른 검색의 커서면 ValueError."""
+  try:
+    raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+    data = json.loads(raw)
+    offset = int(data["o"])
+  except Exception as e:
+    raise ValueError(f"Invalid cursor: {cursor}") from e
+  if data.get("k") != key or offset < 0:
+    raise ValueError("Cursor does not belong to this query")
+  return offset
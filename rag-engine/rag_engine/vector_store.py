@@ -1,65 +1,198 @@
 """Chroma vector store wrapper.
 
 Docker의 Chroma 서버에 HTTP로 우선 연결하고, 실패 시 로컬 영속 경로로
-폴백합니다. 최후 수단은 메모리 클라이언트입니다.
+폴백합니다. 최후 수단은 메모리 클라이언트입니다. `aupsert`/`aquery`는 블로킹
+클라이언트 호출을 전용 스레드 풀에서 실행합니다. `chromadb` 임포트와 연결은
+첫 사용(또는 `connect()` 워밍업) 시점까지 지연됩니다.
 """
 from __future__ import annotations
 
-from typing import List, Dict, Any, Iterable
+from typing import List, Dict, Any, Iterable, Protocol, Union
 from pathlib import Path
+import threading
 
-import chromadb
-from chromadb.errors import InvalidArgumentError, NotFoundError  # type: ignore
+import numpy as np
 
 from .config import RagSettings
+from .executor import BoundedExecutor
+from .metrics import METRICS
+
+# float32 `(n, dim)` 행렬 또는 float 리스트의 리스트
+Embeddings = Union[np.ndarray, List[List[float]]]
+
+# query 기본 반환 필드(Chroma 기본값과 동일)
+DEFAULT_INCLUDE = ("documents", "metadatas", "distances")
+
+
+class VectorStore(Protocol):
+  """파이프라인이 사용하는 벡터 스토어 인터페이스."""
+
+  def connect(self) -> None: ...
+
+  def upsert(self, ids: List[str], embeddings: Embeddings, documents: Iterable[str], metadatas: Iterable[Dict[str, Any]] | None = None) -> None: ...
+
+  def query(
+    self,
+    query_embeddings: Embeddings,
+    top_k: int,
+    include: List[str] | None = None,
+    where: Dict[str, Any] | None = None,
+    where_document: Dict[str, Any] | None = None,
+  ) -> Dict[str, Any]: ...
+
+  def get(
+    self,
+    ids: List[str] | None = None,
+    where: Dict[str, Any] | None = None,
+    where_document: Dict[str, Any] | None = None,
+    include: List[str] | None = None,
+  ) -> Dict[str, Any]: ...
+
+  async def aupsert(self, ids: List[str], embeddings: Embeddings, documents: Iterable[str], metadatas: Iterable[Dict[str, Any]] | None = None) -> None: ...
+
+  async def aquery(
+    self,
+    query_embeddings: Embeddings,
+    top_k: int,
+    include: List[str] | None = None,
+    where: Dict[str, Any] | None = None,
+    where_document: Dict[str, Any] | None = None,
+  ) -> Dict[str, Any]: ...
+
+  def update_metadata(self, ids: List[str], metadatas: List[Dict[str, Any]]) -> None: ...
+
+  async def aupdate_metadata(self, ids: List[str], metadatas: List[Dict[str, Any]]) -> None: ...
+
+  async def aget(
+    self,
+    ids: List[str] | None = None,
+    where: Dict[str, Any] | None = None,
+    where_document: Dict[str, Any] | None = None,
+    include: List[str] | None = None,
+  ) -> Dict[str, Any]: ...
+
+  def close(self) -> None: ...
+
+
+def create_vector_store(settings: RagSettings) -> VectorStore:
+  """`VECTOR_STORE` 설정에 따라 스토어 구현 선택(chroma | local)."""
+  backend = (settings.vector_store or "chroma").lower()
+  if backend == "local":
+    from .local_store import LocalVectorStore
+    return LocalVectorStore(settings)
+  if backend != "chroma":
+    raise ValueError(f"Unknown VECTOR_STORE: {settings.vector_store}")
+  return ChromaVectorStore(settings)
 
 
 class ChromaVectorStore:
   """Chroma 컬렉션 생성/업서트/쿼리를 담당하는 어댑터."""
 
-  def __init__(self, settings: RagSettings) -> None:
-    """클라이언트 초기화 및 컬렉션 준비."""
+  def __init__(self, settings: RagSettings, client: Any = None) -> None:
+    """설정 주입(연결은 첫 사용 시 `connect()`에서 수행).
+
+    `client`를 주면 HTTP/영속 클라이언트 대신 그대로 사용(벤치마크용 in-memory 클라이언트 등).
+    """
     self.settings = settings
-    # Prefer HTTP client to talk to dockerized server
-    try:
-      self.client = chromadb.HttpClient(host=self.settings.chroma_host, port=self.settings.chroma_port)  # type: ignore[attr-defined]
-    except Exception:
-      # Fallback to local persistent client to survive across processes
-      local_path = Path.home() / ".rag_chromadb"
-      local_path.mkdir(parents=True, exist_ok=True)
+    self._client = client
+    self._collection = None
+    self._connect_lock = threading.Lock()
+    self._io = BoundedExecutor(settings.chroma_workers, settings.chroma_workers * 4, kind="thread", name="rag-chroma")
+
+  def connect(self) -> None:
+    """클라이언트 초기화 및 컬렉션 준비(이미 연결되어 있으면 no-op)."""
+    if self._collection is not None:
+      return
+    with self._connect_lock:
+      if self._collection is not None:
+        return
+      if self._client is not None:
+        self._collection = self._get_or_create_collection(self.settings.chroma_collection)
+        return
+      import chromadb  # type: ignore
+      # Prefer HTTP client to talk to dockerized server
       try:
-        self.client = chromadb.PersistentClient(path=str(local_path))  # type: ignore[attr-defined]
+        self._client = chromadb.HttpClient(host=self.settings.chroma_host, port=self.settings.chroma_port)  # type: ignore[attr-defined]
       except Exception:
-        # Final fallback: in-memory
-        self.client = chromadb.Client()  # type: ignore[call-arg]
-    self.collection = self._get_or_create_collection(self.settings.chroma_collection)
+        # Fallback to local persistent client to survive across processes
+        local_path = Path.home() / ".rag_chromadb"
+        local_path.mkdir(parents=True, exist_ok=True)
+        try:
+          self._client = chromadb.PersistentClient(path=str(local_path))  # type: ignore[attr-defined]
+        except Exception:
+          # Final fallback: in-memory
+          self._client = chromadb.Client()  # type: ignore[call-arg]
+      self._collection = self._get_or_create_collection(self.settings.chroma_collection)
+
+  @property
+  def client(self):
+    """Chroma 클라이언트(필요 시 연결)."""
+    self.connect()
+    return self._client
+
+  @property
+  def collection(self):
+    """현재 컬렉션 핸들(필요 시 연결)."""
+    self.connect()
+    return self._collection
+
+  @collection.setter
+  def collection(self, value) -> None:
+    self._collection = value
 
   def _get_or_create_collection(self, name: str):
     """컬렉션이 있으면 가져오고, 없으면 생성."""
     try:
-      return self.client.get_collection(name)
+      return self._client.get_collection(name)
     except Exception:
-      return self.client.create_collection(name=name)
+      return self._client.create_collection(name=name)
 
-  def upsert(self, ids: List[str], embeddings: List[List[float]], documents: Iterable[str], metadatas: Iterable[Dict[str, Any]] | None = None) -> None:
+  def _max_batch_size(self) -> int | None:
+    """서버가 허용하는 최대 업서트 배치 크기(알 수 없으면 None)."""
+    getter = getattr(self.client, "get_max_batch_size", None)
+    if getter is None:
+      return None
+    try:
+      return int(getter())
+    except Exception:
+      return None
+
+  def upsert(self, ids: List[str], embeddings: Embeddings, documents: Iterable[str], metadatas: Iterable[Dict[str, Any]] | None = None) -> None:
     """벡터/문서/메타데이터 업서트.
 
+    - 임베딩은 NumPy 행렬을 그대로 전달(리스트 변환 없음)
+    - 서버 최대 배치 크기를 넘으면 청크 단위로 나누어 순차 업서트
     - 컬렉션이 삭제된 상태(핸들 유효하지 않음) → 재획득 후 재시도
     - 임베딩 차원 불일치(예: 기존 384d 컬렉션) → 컬렉션 삭제 후 재생성 및 재시도
     """
     docs = list(documents)
     metas = list(metadatas) if metadatas is not None else None
+    limit = self._max_batch_size() or len(ids) or 1
+    for start in range(0, len(ids), limit):
+      end = start + limit
+      self._upsert_chunk(
+        ids=ids[start:end],
+        embeddings=embeddings[start:end],
+        docs=docs[start:end],
+        metas=metas[start:end] if metas is not None else None,
+      )
+
+  def _upsert_chunk(self, ids: List[str], embeddings: Embeddings, docs: List[str], metas: List[Dict[str, Any]] | None) -> None:
+    """단일 청크 업서트(컬렉션 재획득/재생성 재시도 포함)."""
+    from chromadb.errors import InvalidArgumentError, NotFoundError  # type: ignore
     try:
       self.collection.upsert(ids=ids, embeddings=embeddings, documents=docs, metadatas=metas)
       return
     except NotFoundError:
       # Refresh handle and retry once
+      METRICS.inc("rag_chroma_retries_total", reason="collection_missing")
       self.collection = self._get_or_create_collection(self.settings.chroma_collection)
       self.collection.upsert(ids=ids, embeddings=embeddings, documents=docs, metadatas=metas)
       return
     except InvalidArgumentError as e:
       # Dimension mismatch; enforce 256d-only by recreating collection
       if "dimension" in str(e).lower():
+        METRICS.inc("rag_chroma_retries_total", reason="dimension_mismatch")
         try:
           self.client.delete_collection(name=self.settings.chroma_collection)
         except Exception:
@@ -69,8 +202,84 @@ class ChromaVectorStore:
         return
       raise
 
-  def query(self, query_embeddings: List[List[float]], top_k: int) -> Dict[str, Any]:
-    """Top-K 유사도 검색 결과 반환."""
-    return self.collection.query(query_embeddings=query_embeddings, n_results=top_k)
+  def query(
+    self,
+    query_embeddings: Embeddings,
+    top_k: int,
+    include: List[str] | None = None,
+    where: Dict[str, Any] | None = None,
+    where_document: Dict[str, Any] | None = None,
+  ) -> Dict[str, Any]:
+    """Top-K 유사도 검색 결과 반환.
+
+    `include`로 반환 필드를 고르고, `where`(메타데이터)/`where_document`(본문)
+    필터는 Chroma에서 검색 전에 적용됩니다.
+    """
+    return self.collection.query(
+      query_embeddings=query_embeddings,
+      n_results=top_k,
+      include=list(include) if include is not None else list(DEFAULT_INCLUDE),
+      where=where or None,
+      where_document=where_document or None,
+    )
+
+  def update_metadata(self, ids: List[str], metadatas: List[Dict[str, Any]]) -> None:
+    """기존 항목 메타데이터에 키 단위로 병합(벡터/문서는 유지)."""
+    if ids:
+      self.collection.update(ids=ids, metadatas=metadatas)
+
+  def get(
+    self,
+    ids: List[str] | None = None,
+    where: Dict[str, Any] | None = None,
+    where_document: Dict[str, Any] | None = None,
+    include: List[str] | None = None,
+  ) -> Dict[str, Any]:
+    """id 목록 또는 메타데이터/본문 조건으로 항목 조회(ids/documents/metadatas).
+
+    `include`에 `embeddings`가 있으면 임베딩도 반환합니다.
+    """
+    embeddings = include is not None and "embeddings" in include
+    if ids is not None and not ids:
+      return {"ids": [], "documents": [], "metadatas": [], **({"embeddings": []} if embeddings else {})}
+    return self.collection.get(
+      ids=ids,
+      where=where or None,
+      where_document=where_document or None,
+      include=["documents", "metadatas", *(["embeddings"] if embeddings else [])],
+    )
+
+  async def aupsert(self, ids: List[str], embeddings: Embeddings, documents: Iterable[str], metadatas: Iterable[Dict[str, Any]] | None = None) -> None:
+    """`upsert`의 비동기 버전(I/O 스레드 풀에서 실행)."""
+    docs = list(documents)
+    metas = list(metadatas) if metadatas is not None else None
+    await self._io.run(self.upsert, ids, embeddings, docs, metas)
+
+  async def aget(
+    self,
+    ids: List[str] | None = None,
+    where: Dict[str, Any] | None = None,
+    where_document: Dict[str, Any] | None = None,
+    include: List[str] | None = None,
+  ) -> Dict[str, Any]:
+    """`get`의 비동기 버전(I/O 스레드 풀에서 실행)."""
+    return await self._io.run(self.get, ids, where, where_document, include)
+
+  async def aquery(
+    self,
+    query_embeddings: Embeddings,
+    top_k: int,
+    include: List[str] | None = None,
+    where: Dict[str, Any] | None = None,
+    where_document: Dict[str, Any] | None = None,
+  ) -> Dict[str, Any]:
+    """`query`의 비동기 버전(I/O 스레드 풀에서 실행)."""
+    return await self._io.run(self.query, query_embeddings, top_k, include, where, where_document)
 
+  async def aupdate_metadata(self, ids: List[str], metadatas: List[Dict[str, Any]]) -> None:
+    """`update_metadata`의 비동기 버전(I/O 스레드 풀에서 실행)."""
+    await self._io.run(self.update_metadata, ids, metadatas)
 
+  def close(self) -> None:
+    """I/O 스레드 풀 종료(다음 비동기 호출 시 재생성)."""
+    self._io.shutdown()
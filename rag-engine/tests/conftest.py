@@ -0,0 +1,37 @@
+"""공용 픽스처: 네트워크/모델 다운로드 없이 로컬 스토어 + 해시 임베더로 파이프라인 구성."""
+from __future__ import annotations
+
+from typing import Any, Callable
+
+import pytest
+
+from rag_engine import pipeline as pipeline_module
+from rag_engine.bench import HashEmbeddingModel
+from rag_engine.config import RagSettings
+
+
+@pytest.fixture
+def settings(tmp_path) -> RagSettings:
+  s = RagSettings()
+  s.openrouter_api_key = None
+  s.preprocess_cache_enabled = False
+  s.preprocess_cache_path = str(tmp_path / "preprocess_cache.sqlite3")
+  s.vector_store = "local"
+  s.local_store_path = str(tmp_path / "local_index")
+  s.lexical_index = True
+  s.lexical_index_path = str(tmp_path / "lexical")
+  s.query_mode = "vector"
+  s.rerank = False
+  return s
+
+
+@pytest.fixture
+def make_pipeline(settings, monkeypatch) -> Callable[..., Any]:
+  monkeypatch.setattr(pipeline_module, "EmbeddingModel", HashEmbeddingModel)
+
+  def _make(**overrides: Any) -> pipeline_module.RagPipeline:
+    for key, value in overrides.items():
+      setattr(settings, key, value)
+    return pipeline_module.RagPipeline(settings)
+
+  return _make
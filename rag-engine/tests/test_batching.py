@@ -0,0 +1,68 @@
+"""임베딩 요청 병합기(`EmbeddingBatcher`)."""
+from __future__ import annotations
+
+import asyncio
+
+import numpy as np
+import pytest
+
+from rag_engine.batching import EmbeddingBatcher
+
+
+async def _embed(texts):
+  await asyncio.sleep(0)
+  return np.arange(len(texts), dtype=np.float32)[:, None]
+
+
+def test_merges_requests_and_splits_rows():
+  async def run():
+    batcher = EmbeddingBatcher(_embed, max_batch_size=8, max_wait_ms=5)
+    a, b = await asyncio.gather(batcher.submit(["x", "y"]), batcher.submit(["z"]))
+    assert a[:, 0].tolist() == [0.0, 1.0]
+    assert b[:, 0].tolist() == [2.0]
+    assert not batcher._tasks
+
+  asyncio.run(run())
+
+
+def test_cancelled_batch_cancels_waiters():
+  async def run():
+    started = asyncio.Event()
+
+    async def hang(texts):
+      started.set()
+      await asyncio.sleep(3600)
+
+    batcher = EmbeddingBatcher(hang, max_batch_size=2, max_wait_ms=1000)
+    waiters = [asyncio.ensure_future(batcher.submit(["x"])), asyncio.ensure_future(batcher.submit(["y"]))]
+    await asyncio.wait_for(started.wait(), 1)
+    assert len(batcher._tasks) == 1
+    next(iter(batcher._tasks)).cancel()
+    for waiter in waiters:
+      with pytest.raises(asyncio.CancelledError):
+        await asyncio.wait_for(waiter, 1)
+
+  asyncio.run(run())
+
+
+def test_aclose_cancels_running_and_queued_requests():
+  async def run():
+    started = asyncio.Event()
+
+    async def hang(texts):
+      started.set()
+      await asyncio.sleep(3600)
+
+    batcher = EmbeddingBatcher(hang, max_batch_size=1, max_wait_ms=1000)
+    running = asyncio.ensure_future(batcher.submit(["x"]))
+    await asyncio.wait_for(started.wait(), 1)
+    batcher.max_batch_size = 8
+    queued = asyncio.ensure_future(batcher.submit(["y"]))
+    await asyncio.sleep(0)
+    await asyncio.wait_for(batcher.aclose(), 1)
+    assert not batcher._tasks
+    for waiter in (running, queued):
+      with pytest.raises(asyncio.CancelledError):
+        await asyncio.wait_for(waiter, 1)
+
+  asyncio.run(run())
@@ -0,0 +1,26 @@
+"""문자 창/턴 청킹."""
+from __future__ import annotations
+
+import pytest
+
+from rag_engine.chunking import char_windows, chunk_text
+
+
+def test_char_windows_overlap():
+  text = "abcdefghij" * 3
+  assert char_windows(text, 10, 2) == [text[0:10], text[8:18], text[16:26], text[24:30]]
+
+
+@pytest.mark.parametrize("overlap", [5, 10, 100])
+def test_char_windows_clamps_overlap_to_half_window(overlap):
+  text = "abcdefghij" * 3
+  windows = char_windows(text, 10, overlap)
+  assert windows == [text[i:i + 10] for i in (0, 5, 10, 15, 20)]
+  assert "".join(w[:5] for w in windows[:-1]) + windows[-1] == text
+
+
+def test_chunk_text_small_window_with_default_overlap():
+  text = "Q: " + "x" * 997
+  chunks = chunk_text(text, "chars", max_chars=50, overlap_chars=100)
+  assert len(chunks) == 39
+  assert all(len(c) <= 50 for c in chunks)
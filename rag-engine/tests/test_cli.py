@@ -0,0 +1,39 @@
+"""배치 입력 파일 읽기(`_read_conversations_from_file`)."""
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from rag_engine import cli
+
+
+def _write(tmp_path, text):
+  path = tmp_path / "input.json"
+  path.write_text(text, encoding="utf-8")
+  return str(path)
+
+
+def test_nested_array_streams_across_chunks(tmp_path, monkeypatch):
+  monkeypatch.setattr(cli, "JSON_READ_CHUNK", 7)
+  convs = [["hi", "A: yo"], ["q2 , ] [", 'a"2'], []]
+  path = _write(tmp_path, json.dumps(convs, ensure_ascii=False))
+  assert list(cli._read_conversations_from_file(path)) == [["Q: hi", "A: yo"], ["Q: q2 , ] [", 'A: a"2'], []]
+
+
+@pytest.mark.parametrize("text,expected", [
+  ('["a", "b"]', [["Q: a", "A: b"]]),
+  ('[{"role": "user", "content": "x"}, {"role": "assistant", "content": "y"}]', [["Q: x", "A: y"]]),
+  ("[]", []),
+  ("hello\n  world\n", [["Q: hello", "A: world"]]),
+])
+def test_single_conversation_formats(tmp_path, text, expected):
+  assert list(cli._read_conversations_from_file(_write(tmp_path, text))) == expected
+
+
+@pytest.mark.parametrize("text,index", [('[["a"], "b", ["c"]]', 1), ('[["a"], ["b"], [oops', 2)])
+def test_invalid_batch_element_reports_index(tmp_path, text, index):
+  read = cli._read_conversations_from_file(_write(tmp_path, text))
+  assert next(read) == ["Q: a"]
+  with pytest.raises(ValueError, match=f"element {index}"):
+    list(read)
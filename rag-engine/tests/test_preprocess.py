@@ -0,0 +1,84 @@
+"""OpenRouter 호출 재시도/서킷 브레이커 집계."""
+from __future__ import annotations
+
+import asyncio
+from typing import Iterable
+
+import httpx
+import pytest
+
+from rag_engine.preprocess import Preprocessor
+
+_OK = {"choices": [{"message": {"content": "Q: hi"}}], "usage": {"total_tokens": 50}}
+
+
+@pytest.fixture
+def openrouter_settings(settings):
+  settings.openrouter_api_key = "test"
+  settings.openrouter_max_retries = 2
+  settings.openrouter_retry_base_delay = 0.0
+  settings.openrouter_retry_max_delay = 0.0
+  settings.openrouter_breaker_threshold = 3
+  settings.openrouter_breaker_reset_s = 60.0
+  settings.openrouter_rpm = 0
+  settings.openrouter_tpm = 0
+  settings.preprocess_pack_size = 1
+  return settings
+
+
+def _preprocessor(settings, statuses: Iterable[int]) -> Preprocessor:
+  """응답 상태 코드를 순서대로 돌려주는(마지막 값 반복) 모의 업스트림."""
+  queue = list(statuses)
+
+  def handler(request):
+    status = queue.pop(0) if len(queue) > 1 else queue[0]
+    return httpx.Response(status, json=_OK) if status == 200 else httpx.Response(status)
+
+  p = Preprocessor(settings)
+  p._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+  return p
+
+
+def _run(p: Preprocessor, calls: int):
+  async def run():
+    try:
+      return [await p.preprocess_with_path([f"Q: 질문 {i}"]) for i in range(calls)]
+    finally:
+      await p.aclose()
+
+  return asyncio.run(run())
+
+
+def test_client_error_does_not_close_half_open_breaker(openrouter_settings):
+  p = _preprocessor(openrouter_settings, [401])
+  p.breaker.state = "half_open"
+  [(_, path)] = _run(p, 1)
+  assert path == "fallback"
+  assert p.breaker.state == "half_open"
+  # 시험 호출 슬롯은 반환되어 다음 호출이 다시 시험할 수 있음
+  assert p.breaker.allow()
+
+
+def test_exhausted_rate_limit_counts_as_failure(openrouter_settings):
+  p = _preprocessor(openrouter_settings, [429])
+  results = _run(p, 5)
+  assert [path for _, path in results] == ["fallback"] * 3 + ["circuit_open"] * 2
+  assert p.breaker.state == "open"
+
+
+def test_rate_limit_does_not_reset_failures_during_outage(openrouter_settings):
+  # 한 호출 안에서 500, 500, 429, 500 → 중간 429가 연속 실패 수를 되돌리지 않아 세 번째 500에서 열림
+  openrouter_settings.openrouter_max_retries = 3
+  p = _preprocessor(openrouter_settings, [500, 500, 429, 500, 200])
+  [(_, path)] = _run(p, 1)
+  assert path == "fallback"
+  assert p.breaker.failures == 3
+  assert p.breaker.state == "open"
+
+
+def test_success_closes_breaker(openrouter_settings):
+  p = _preprocessor(openrouter_settings, [500, 200])
+  [(_, path)] = _run(p, 1)
+  assert path == "openrouter"
+  assert p.breaker.state == "closed"
+  assert p.breaker.failures == 0
@@ -0,0 +1,53 @@
+"""양자화 근사 거리와 로컬 스토어 재채점 검색."""
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from rag_engine import local_store
+from rag_engine.local_store import LocalVectorStore
+from rag_engine.quantization import approx_distances, pack_bits, quantize_int8
+
+
+def _vectors(n=500, dim=32, seed=0):
+  vecs = np.random.default_rng(seed).standard_normal((n, dim)).astype(np.float32)
+  return vecs / np.linalg.norm(vecs, axis=1, keepdims=True)
+
+
+def test_approx_distances_precomputed_inputs_match():
+  vecs, queries = _vectors(), _vectors(4, seed=1)
+  codes, scales = quantize_int8(vecs)
+  sq = np.einsum("ij,ij->i", vecs, vecs)
+  q_norms = np.einsum("ij,ij->i", queries, queries)[:, None]
+  np.testing.assert_allclose(
+    approx_distances("int8", queries, codes, scales, sq),
+    approx_distances("int8", queries, codes, scales, sq, q_norms=q_norms),
+  )
+  bits = pack_bits(vecs)
+  np.testing.assert_array_equal(
+    approx_distances("binary", queries, bits),
+    approx_distances("binary", queries, bits, query_bits=pack_bits(queries)),
+  )
+
+
+@pytest.mark.parametrize("mode", ["int8", "binary"])
+def test_store_scans_with_shared_approx_distances(settings, monkeypatch, mode):
+  calls = []
+  real = local_store.approx_distances
+
+  def spy(*args, **kwargs):
+    calls.append(args[0])
+    return real(*args, **kwargs)
+
+  monkeypatch.setattr(local_store, "approx_distances", spy)
+  settings.local_store_quantization = mode
+  settings.local_store_rescore_factor = 8
+  vecs = _vectors()
+  store = LocalVectorStore(settings)
+  try:
+    store.upsert([f"d{i}" for i in range(len(vecs))], vecs, [""] * len(vecs))
+    result = store.query(vecs[:20], 1, include=["distances"])
+  finally:
+    store.close()
+  assert calls and set(calls) == {mode}
+  assert [ids[0] for ids in result["ids"]] == [f"d{i}" for i in range(20)]
@@ -0,0 +1,79 @@
+"""hit 페이지(`to_hits`)와 커서 키(`query_key`) 동작."""
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from rag_engine.results import decode_cursor, encode_cursor, query_key, to_hits
+
+
+def _result(ids, distances):
+  return {"ids": [ids], "distances": [distances], "documents": None, "metadatas": None}
+
+
+def test_max_distance_stops_at_first_far_hit_when_sorted():
+  hits, has_more = to_hits(_result(["a", "b", "c"], [0.1, 0.5, 0.9]), ["id"], limit=3, max_distance=0.6)
+  assert [h["id"] for h in hits] == ["a", "b"]
+  assert has_more is False
+
+
+def test_max_distance_filters_unsorted_results():
+  # 하이브리드 융합 순서: 거리 오름차순이 아니고 BM25에만 있는 hit는 거리 없음
+  result = _result(["a", "b", "c", "d", "e"], [0.9, 0.2, None, 0.7, 0.3])
+  hits, has_more = to_hits(result, ["id", "distance"], limit=2, max_distance=0.5, by_distance=False)
+  assert [h["id"] for h in hits] == ["b", "c"]
+  assert has_more is True
+  hits, has_more = to_hits(result, ["id"], offset=2, limit=2, max_distance=0.5, by_distance=False)
+  assert [h["id"] for h in hits] == ["e"]
+  assert has_more is False
+
+
+def test_query_key_covers_ordering():
+  base = query_key("배송", {"k": 1})
+  cursor = encode_cursor(5, base)
+  assert decode_cursor(cursor, query_key("배송", {"k": 1})) == 5
+  for other in (
+    query_key("배송", {"k": 1}, mode="hybrid"),
+    query_key("배송", {"k": 1}, rerank=True),
+    query_key("배송", {"k": 1}, max_distance=1.2),
+  ):
+    assert other != base
+    with pytest.raises(ValueError):
+      decode_cursor(cursor, other)
+
+
+def _conversations(n: int = 30):
+  return [
+    [f"Q: 주문 {i}번 배송 일정 문의 상품 SKU-{1000 + i}", f"A: 상품 SKU-{1000 + i}은 {i % 5 + 1}일 후 도착합니다"]
+    for i in range(n)
+  ]
+
+
+def _eligible(result, max_distance):
+  return [
+    doc_id for doc_id, d in zip(result["ids"][0], result["distances"][0])
+    if d is None or d <= max_distance
+  ]
+
+
+@pytest.mark.parametrize("mode,rerank", [("hybrid", False), ("vector", True), ("hybrid", True)])
+def test_search_page_max_distance_with_reordering(make_pipeline, mode, rerank):
+  async def run():
+    p = make_pipeline()
+    try:
+      await p.ingest_conversations(_conversations())
+      query = "SKU-1007 배송 일정"
+      limit = 6
+      full = await p.asimilarity_search(query, limit + 1, include=["distances"], mode=mode, rerank=rerank)
+      distances = sorted(d for d in full["distances"][0] if d is not None)
+      max_distance = distances[len(distances) // 2]
+      eligible = _eligible(full, max_distance)
+      page = await p.asearch_page(query, limit=limit, max_distance=max_distance, mode=mode, rerank=rerank)
+      assert [h["id"] for h in page["hits"]] == eligible[:limit]
+      assert all(h["distance"] is None or h["distance"] <= max_distance for h in page["hits"])
+      assert page["has_more"] == (len(eligible) > limit)
+    finally:
+      await p.aclose()
+
+  asyncio.run(run())